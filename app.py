@@ -1,11 +1,28 @@
+import os
 import streamlit as st
 import pandas as pd
 from datetime import datetime
-from utils import market_data, indicators, visuals, ai_engine
+import utils
+# visuals, ai_engine and screener are lazy: plotly and the model runtime load on first use
+from utils import market_data, indicators, indicator_engine, visuals, ai_engine, screener, singleflight, options, symbols, streaming, telemetry
+
+# Production workers can pay every import (and the model load) up front instead
+if utils.preload_enabled():
+    utils.preload()
 
 # Page Config
 st.set_page_config(layout="wide", page_title="AI Trading Desk", page_icon="📈")
 
+# Time every stage of this render (see the Diagnostics panel); the "Profile a render"
+# button reruns the page once under cProfile
+render_trace = telemetry.start_trace("render")
+profiler = telemetry.Profile() if st.session_state.get("profile_render") else None
+# Prometheus scrape endpoint (/metrics, /metrics.json), started once per process.
+# Bound to localhost unless TELEMETRY_HOST says otherwise (e.g. 0.0.0.0 for a remote scraper)
+if os.environ.get("TELEMETRY_PORT"):
+    telemetry.start_http_server(int(os.environ["TELEMETRY_PORT"]),
+                                host=os.environ.get("TELEMETRY_HOST", "127.0.0.1"))
+
 # Custom CSS for Glassmorphism Credit Badge
 st.markdown("""
 <style>
@@ -74,6 +91,7 @@ with st.sidebar.form("search_form"):
     st.subheader("Settings")
     show_indicators = st.checkbox("Show Technical Indicators", True)
     enable_ai = st.checkbox("Enable AI Forecast", True)
+    forecast_days = st.slider("Forecast Horizon (business days)", 1, 30, 1)
     
     submitted = st.form_submit_button("Search 🔍")
 
@@ -83,16 +101,79 @@ if not submitted and "ticker" not in st.session_state:
     st.session_state["ticker"] = ticker
 elif submitted:
     ticker = market_data.resolve_ticker(user_input)
-    st.session_state["ticker"] = ticker
+    if ticker:
+        st.session_state["ticker"] = ticker
+    else:
+        st.sidebar.error(f"No symbol found for '{user_input}'.")
+        ticker = st.session_state.get("ticker", "NVDA")
 else:
     # Use previous state if just re-running for some other reason (though form prevents most)
     ticker = st.session_state.get("ticker", "NVDA")
 
-# Re-fetch exchange rate based on selection (which is now in form state)
-exchange_rate = market_data.get_exchange_rate(currency)
+# Ranked matches for the search box from the local symbol index (no network);
+# picking one switches the dashboard to it
+def _pick_symbol():
+    choice = st.session_state.get("symbol_match")
+    if choice:
+        st.session_state["ticker"] = choice.split(" · ")[0]
+
+symbol_matches = [f"{m.symbol} · {m.name}" for m in symbols.search(user_input, limit=6)]
+if symbol_matches:
+    st.sidebar.selectbox("Matching symbols", symbol_matches, index=None, placeholder="Pick a match...",
+                         key="symbol_match", on_change=_pick_symbol)
+
+# Live tab: only this fragment reruns on its timer, not the whole page. The stream
+# (and its poller) is shared by every session watching the ticker; each session
+# keeps its own figure and appends the bars it hasn't drawn yet.
+@st.fragment(run_every=streaming.REFRESH_SECONDS)
+def live_panel(ticker, currency, exchange_rate):
+    with telemetry.span("render.live"):
+        session = st.session_state.setdefault("live_session", os.urandom(8).hex())
+        stream = streaming.get_hub().watch(ticker, session)
+        view_key = f"live_view_{ticker}_{currency}"
+        view = st.session_state.get(view_key)
+        if view is None:
+            rows, closed, forming = stream.updates(0)
+            fig = visuals.create_live_chart(rows, ticker, price_scale=exchange_rate,
+                                            price_label=f"Price ({currency})")
+        else:
+            fig, seen, was_forming = view
+            rows, closed, forming = stream.updates(seen)
+            visuals.extend_live_chart(fig, rows, replace_last=was_forming, price_scale=exchange_rate)
+        st.session_state[view_key] = (fig, closed, forming)
+        
+        last = stream.buffer.last() if len(stream.buffer) else None
+        if last is None:
+            st.info("Waiting for the first ticks...")
+            return
+        col1, col2, col3, col4 = st.columns(4)
+        col1.metric(f"Last ({currency})", f"{last['Close'] * exchange_rate:,.2f}")
+        col2.metric("RSI (14 bars)", f"{last['RSI']:.1f}" if last['RSI'] == last['RSI'] else "—")
+        col3.metric("MACD", f"{last['MACD']:.3f}")
+        col4.metric("Watching", f"{streaming.get_hub().watchers(ticker)} session(s)")
+        st.plotly_chart(fig, use_container_width=True, key=f"live_chart_{ticker}")
+
+# Load and warm the shared AI model once per process (no-op on later reruns)
+if enable_ai:
+    try:
+        ai_engine.get_registry().preload(ai_engine.AIEngine().artifact_path)
+    except Exception:
+        pass
+
+# Fetch everything this render needs concurrently (FX, info, metrics, history, options)
+with st.spinner(f"Fetching data for {ticker}..."):
+    page_data = market_data.fetch_dashboard(ticker, currency, period="5y")
+exchange_rate = page_data["exchange_rate"]
 
 # Inputs moved to form above
 
+# Shared-work counters for this server process (all sessions)
+with st.sidebar.expander("⚙️ Server Load"):
+    flights = singleflight.singleflight_stats()
+    st.caption("Identical concurrent requests merged into one fetch / model run")
+    st.dataframe(pd.DataFrame(flights).T[['calls', 'executions', 'coalesced', 'coalesce_rate']],
+                 use_container_width=True)
+
 st.sidebar.markdown("---")
 st.sidebar.markdown(
     """
@@ -104,8 +185,8 @@ st.sidebar.markdown(
     unsafe_allow_html=True
 )
 
-# Fetch Basic Info for Header
-stock_info = market_data.get_stock_info(ticker)
+# Basic Info for Header
+stock_info = page_data["info"]
 company_name = stock_info.get('longName', ticker)
 
 # Robust Summary Fetching
@@ -125,7 +206,7 @@ with st.expander("📝 Company Summary"):
     st.write(summary)
 
 # 1. Real-Time Metrics
-metrics = market_data.get_real_time_metrics(ticker)
+metrics = page_data["metrics"]
 if metrics:
     price = metrics['current_price'] * exchange_rate
     prev_close = metrics['previous_close'] * exchange_rate
@@ -138,26 +219,24 @@ if metrics:
 else:
     st.warning("Real-time data possibly delayed.")
 
-# Fetch Data
-with st.spinner(f"Fetching data for {ticker}..."):
-    stock_df = market_data.get_stock_data(ticker, period="5y") # Fetch enough data
+# Historical Data (5y fetched above, enough for the 200-day SMA and the AI window)
+stock_df = page_data["history"]
     
 if not stock_df.empty:
-    # Convert Data to Selected Currency
-    if currency != "USD":
-        stock_df[['Open', 'High', 'Low', 'Close']] = stock_df[['Open', 'High', 'Low', 'Close']] * exchange_rate
-        
-    stock_df = indicators.add_technical_indicators(stock_df)
+    # Prices, indicators and forecasts all stay in USD (and cached that way);
+    # the selected currency is only applied when values are displayed.
+    # Incremental update: only bars added since the last run are computed
+    stock_df = indicator_engine.update_indicators(ticker, stock_df)
     
     # Tabs
-    tab1, tab2, tab3, tab4 = st.tabs(["📊 Professional Chart", "🧠 AI Analysis", "⛓️ Options Chain", "🏢 Fundamentals"])
+    tab1, tab2, tab3, tab4, tab5, tab6 = st.tabs(["📊 Professional Chart", "🧠 AI Analysis", "⛓️ Options Chain", "🏢 Fundamentals", "🔎 Screener", "⚡ Live"])
     
     with tab1:
         st.subheader("Price Action & Volume")
-        # Update chart logic to accept currency symbol for axis if needed, or just rely on the converted df
-        fig = visuals.create_stock_chart(stock_df, ticker, show_indicators)
-        # Update Y-axis title dynamically
-        fig.update_layout(yaxis_title=f"Price ({currency})")
+        # Only the selected date range is drawn; long ranges are merged into coarser candles
+        fig = visuals.create_stock_chart(stock_df, ticker, show_indicators,
+                                         start=start_date, end=end_date,
+                                         price_label=f"Price ({currency})", price_scale=exchange_rate)
         st.plotly_chart(fig, use_container_width=True)
         
     with tab2:
@@ -166,24 +245,26 @@ if not stock_df.empty:
         
         with col_ai_1:
             if enable_ai:
-                ai = ai_engine.AIEngine()
-                # Note: AI predicts based on original scaled data. 
-                # We should probably predict first, then convert. 
-                # Ideally, train on normalized data, predict normalized, inverse transform to USD, then convert to Target Currency.
-                # Since our model logic is encapsulated:
-                # 1. We pass original USD data (stock_df was converted above! Problem?)
-                # Wait: stock_df is now in Target Currency. 
-                # If model expects USD patterns, this scaling is fine (relative).
-                # But the prediction will be in Target Currency units if input is Target Currency units? Yes, MinMax scaler handles the range.
-                prediction = ai.predict_future(stock_df, days=1)
+                ai = ai_engine.AIEngine.for_ticker(ticker)
+                prediction = ai.predict_future(stock_df, days=forecast_days)
                 
                 if prediction is not None:
-                    # Prediction is already in target currency because stock_df was converted
-                    pred_value = prediction.iloc[0]['Predicted Price']
+                    pred_value = prediction.iloc[0]['Predicted Price'] * exchange_rate
                     
-                    pred_fig = visuals.create_prediction_chart(stock_df, prediction, ticker)
+                    pred_fig = visuals.create_prediction_chart(stock_df, prediction, ticker,
+                                                               price_scale=exchange_rate)
                     st.plotly_chart(pred_fig, use_container_width=True)
                     st.success(f"AI Predicted Next Close: {pred_value:,.2f} {currency}")
+                    if forecast_days > 1:
+                        final_value = prediction.iloc[-1]['Predicted Price'] * exchange_rate
+                        st.info(f"AI Forecast for {prediction.index[-1]:%Y-%m-%d}: {final_value:,.2f} {currency}")
+                    with st.expander("📏 Model Backtest (last 30 days)"):
+                        accuracy = ai.analyze_accuracy(stock_df, days=30)
+                        st.write(f"Direction accuracy: **{accuracy['accuracy']}**")
+                        if "mae" in accuracy:
+                            st.write(f"MAE: {accuracy['mae'] * exchange_rate:,.2f} {currency} · "
+                                     f"RMSE: {accuracy['rmse'] * exchange_rate:,.2f} {currency} · "
+                                     f"MAPE: {accuracy['mape']:.2f}%")
                 else:
                     st.warning("AI Model not trained or data insufficient.")
         
@@ -195,32 +276,49 @@ if not stock_df.empty:
             
     with tab3:
         st.subheader("Options Chain Analysis")
-        # Options logic
-        # Default to nearest
-        chain, dates = market_data.get_options_chain(ticker)
-        if dates:
-            selected_date = st.selectbox("Expiry Date", dates)
-            chain, _ = market_data.get_options_chain(ticker, selected_date)
+        # Every expiry was fetched together (and cached), so switching expiries is local
+        surface = page_data["options"] or options.get_surface(ticker)
+        if surface:
+            analysis = options.analyze(surface)
+            chain = analysis["chain"]
+            expiry_labels = [f"{e:%Y-%m-%d}" for e in sorted(chain['expiry'].unique())]
+            selected_date = st.selectbox("Expiry Date", expiry_labels)
+            expiry = pd.Timestamp(selected_date)
+            expiry_chain = chain[chain['expiry'] == expiry]
+            
+            ratios = analysis["put_call"]
+            col_o1, col_o2, col_o3, col_o4 = st.columns(4)
+            col_o1.metric("P/C Volume (expiry)", f"{ratios.loc[expiry, 'P/C Volume']:.2f}")
+            col_o2.metric("P/C Open Interest (expiry)", f"{ratios.loc[expiry, 'P/C OI']:.2f}")
+            col_o3.metric("P/C Open Interest (all)", f"{analysis['put_call_all']['P/C OI']:.2f}")
+            col_o4.metric(f"Max Pain ({currency})", f"{analysis['max_pain'].get(expiry, float('nan')) * exchange_rate:,.2f}")
+            
+            # Prices are converted on a copy; the cached chain stays in USD
+            columns = ['strike', 'lastPrice', 'bid', 'ask', 'volume', 'openInterest', 'impliedVolatility',
+                       'delta', 'gamma', 'theta', 'vega']
+            money = ['strike', 'lastPrice', 'bid', 'ask', 'theta', 'vega']
+            display = expiry_chain[columns + ['type']].copy()
+            display[money] = display[money] * exchange_rate
             
             st.write(" **Calls** (Betting Price Goes Up)")
-            calls = chain.calls
-            if not calls.empty:
-                calls['lastPrice'] = calls['lastPrice'] * exchange_rate
-                calls['strike'] = calls['strike'] * exchange_rate
-                st.dataframe(calls[['strike', 'lastPrice', 'volume', 'impliedVolatility']].head(10))
+            st.dataframe(display[display['type'] == 'call'][columns], hide_index=True, use_container_width=True)
             
             st.write(" **Puts** (Betting Price Goes Down)")
-            puts = chain.puts
-            if not puts.empty:
-                puts['lastPrice'] = puts['lastPrice'] * exchange_rate
-                puts['strike'] = puts['strike'] * exchange_rate
-                st.dataframe(puts[['strike', 'lastPrice', 'volume', 'impliedVolatility']].head(10))
+            st.dataframe(display[display['type'] == 'put'][columns], hide_index=True, use_container_width=True)
+            
+            st.plotly_chart(visuals.create_iv_smile_chart(expiry_chain, analysis["spot"], selected_date,
+                                                          price_scale=exchange_rate), use_container_width=True)
+            if analysis["iv_surface"].shape[1] > 1:
+                st.plotly_chart(visuals.create_iv_surface_chart(analysis["iv_surface"], ticker,
+                                                                price_scale=exchange_rate), use_container_width=True)
+            with st.expander("Put/Call Ratios by Expiry"):
+                st.dataframe(ratios.join(analysis["max_pain"] * exchange_rate), use_container_width=True)
         else:
             st.info("No options data found for this ticker.")
             
     with tab4:
         st.subheader("Fundamental Data")
-        info = market_data.get_stock_info(ticker)
+        info = stock_info
         if info:
             st.json({
                 "Sector": info.get('sector'),
@@ -233,6 +331,65 @@ if not stock_df.empty:
             })
         else:
             st.warning("Fundamental data unavailable.")
+    
+    with tab5:
+        st.subheader("Watchlist Screener")
+        with st.form("screener_form"):
+            watchlist_text = st.text_area("Watchlist (tickers separated by commas or new lines)",
+                                          st.session_state.get("watchlist", "AAPL, MSFT, NVDA, GOOG, AMZN, META, TSLA, AMD, INTC, NFLX"))
+            lookback_days = st.slider("Signal history (days)", 5, 250, 30)
+            run_screen = st.form_submit_button("Run Screener")
+        
+        if run_screen:
+            st.session_state["watchlist"] = watchlist_text
+            watchlist = list(dict.fromkeys(t.strip().upper() for t in watchlist_text.replace(",", "\n").split() if t.strip()))
+            with st.spinner(f"Scanning {len(watchlist)} tickers..."):
+                frames, dropped = market_data.fetch_universe(watchlist, period="2y")
+                # All tickers are evaluated together as one (ticker x date) array
+                events, state = screener.scan(frames, since=datetime.now() - pd.Timedelta(days=lookback_days))
+            
+            if dropped:
+                reasons = {}
+                for t, reason in dropped.items():
+                    reasons.setdefault(reason, []).append(t)
+                st.warning("Left out of the scan: " + "; ".join(
+                    f"{reason}: {', '.join(sorted(names))}" for reason, names in sorted(reasons.items())))
+            st.markdown("### Current Signals (ranked)")
+            st.dataframe(state, use_container_width=True)
+            st.markdown(f"### Signal Events (last {lookback_days} days)")
+            st.dataframe(events, use_container_width=True, hide_index=True)
+
+    with tab6:
+        st.subheader("Live Intraday Stream")
+        st.caption(f"{streaming.BAR_SECONDS}s bars from one shared poller per symbol; "
+                   "the chart gets new bars appended as they form.")
+        if st.toggle("Stream intraday bars", key="live_stream"):
+            live_panel(ticker, currency, exchange_rate)
 
 else:
     st.error("No data found. Please check the ticker symbol.")
+
+# Diagnostics: where this render's time went, plus process-wide stage latencies,
+# cache hit rates and error counters
+telemetry.finish_trace(render_trace)
+profile_report = profiler.stop() if profiler else None
+if os.environ.get("TELEMETRY_LOG"):
+    telemetry.log_json(os.environ["TELEMETRY_LOG"])
+
+with st.sidebar.expander("🩺 Diagnostics"):
+    st.caption(f"This render: {render_trace.seconds * 1000:,.0f} ms")
+    st.dataframe(pd.DataFrame(render_trace.breakdown(), columns=["Stage", "Seconds", "Calls"]),
+                 use_container_width=True, hide_index=True)
+    diagnostics = telemetry.snapshot()
+    st.caption("All renders (seconds)")
+    st.dataframe(pd.DataFrame(diagnostics["stages"]).T[['count', 'avg', 'p50', 'p95', 'max']],
+                 use_container_width=True)
+    st.caption("Caches")
+    st.dataframe(pd.DataFrame(diagnostics["caches"]).T[['hits', 'stale_hits', 'misses', 'hit_rate', 'size']],
+                 use_container_width=True)
+    if diagnostics["errors"]:
+        st.caption("Errors")
+        st.json(diagnostics["errors"])
+    st.button("Profile a render", key="profile_render")
+    if profile_report:
+        st.code(profile_report)
@@ -0,0 +1,285 @@
+import argparse
+import os
+import queue
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+from utils import market_data, screener
+from utils.ai_engine import AIEngine
+
+# Signal columns taken from the screener for every ticker
+SIGNAL_COLUMNS = ['RSI', 'RSI_Status', 'Trend', 'MACD_Cross', 'Score']
+
+_DONE = object()  # end-of-stream marker between pipeline stages
+
+
+def read_tickers(path):
+    with open(path) as f:
+        return [line.split('#')[0].strip().upper() for line in f if line.split('#')[0].strip()]
+
+
+def fetch_with_retry(ticker, period="2y", retries=3, backoff=1.0):
+    """
+    Price history through the local price store, retrying transient failures
+    (exceptions and empty responses) with exponential backoff.
+    Returns (DataFrame or None, error message or None).
+    """
+    error = None
+    for attempt in range(retries + 1):
+        try:
+            df = market_data.price_store.get(ticker, period=period)
+            if df is not None and not df.empty:
+                return df, None
+            error = "no data"
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+        if attempt < retries:
+            time.sleep(backoff * 2 ** attempt)
+    return None, error
+
+
+class CsvSink:
+    """
+    Appends result batches to a CSV file, writing the header once.
+    """
+    def __init__(self, path):
+        self.path = path
+        self._header = True
+
+    def write(self, df):
+        df.to_csv(self.path, mode="w" if self._header else "a", header=self._header)
+        self._header = False
+
+    def close(self):
+        pass
+
+
+class ParquetSink:
+    """
+    Streams result batches into one Parquet file, one row group per batch.
+    """
+    def __init__(self, path):
+        self.path = path
+        self._writer = None
+        self._schema = None
+
+    def write(self, df):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        table = pa.Table.from_pandas(df, preserve_index=True)
+        if self._writer is None:
+            self._schema = table.schema
+            self._writer = pq.ParquetWriter(self.path, self._schema)
+        self._writer.write_table(table.cast(self._schema))
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+
+
+def open_sink(path):
+    return ParquetSink(path) if path.endswith(".parquet") else CsvSink(path)
+
+
+class Progress:
+    """
+    Periodic one-line progress report on stderr: done/total, failures, rate and ETA.
+    """
+    def __init__(self, total, every=5.0, stream=sys.stderr):
+        self.total = total
+        self.every = every
+        self.stream = stream
+        self.fetched = 0
+        self.written = 0
+        self.failed = 0
+        self.start = time.monotonic()
+        self._last = 0.0
+        self._lock = threading.Lock()
+
+    def add(self, fetched=0, written=0, failed=0):
+        with self._lock:
+            self.fetched += fetched
+            self.written += written
+            self.failed += failed
+            now = time.monotonic()
+            if now - self._last >= self.every:
+                self._last = now
+                self.stream.write(self.line() + "\n")
+                self.stream.flush()
+
+    def line(self):
+        elapsed = time.monotonic() - self.start
+        done = self.written + self.failed
+        rate = done / elapsed if elapsed > 0 else 0.0
+        eta = (self.total - done) / rate if rate > 0 else float("inf")
+        return (f"[{elapsed:7.1f}s] fetched {self.fetched}/{self.total}  written {self.written}  "
+                f"failed {self.failed}  {rate:6.1f} tickers/s  ETA {eta:6.0f}s")
+
+
+def forecast_batch(frames, days, batch_size, engines):
+    """
+    Signals and forecasts for one batch of {ticker: DataFrame}. Tickers are grouped
+    by the model that serves them so each model runs once per batch.
+    """
+    _, state = screener.scan(frames, min_bars=0)
+
+    groups = {}
+    for ticker in frames:
+        engine = AIEngine.for_ticker(ticker)
+        key = engine.artifact_path
+        if key not in engines:
+            engines[key] = engine
+        groups.setdefault(key, []).append(ticker)
+
+    parts = []
+    for key, tickers in groups.items():
+        predicted = engines[key].predict_many({t: frames[t] for t in tickers},
+                                              batch_size=batch_size, days=days)
+        if predicted is not None and not predicted.empty:
+            parts.append(predicted.assign(Model=key))
+    if not parts:
+        return pd.DataFrame()
+    result = pd.concat(parts)
+    return result.join(state[SIGNAL_COLUMNS], how="left")
+
+
+def run(tickers, output, period="2y", days=1, workers=8, batch_size=256, queue_size=512,
+        retries=3, time_limit=None, progress_every=5.0, failures_path=None):
+    """
+    Fetch -> indicators -> batched inference -> output, as a pipeline:
+    'workers' threads fetch into a bounded queue while one compute thread turns
+    full batches into forecasts and streams them to 'output' (.csv or .parquet).
+    Memory stays bounded by queue_size + batch_size frames regardless of universe size.
+    Returns a summary dict.
+    """
+    progress = Progress(len(tickers), every=progress_every)
+    frames_q = queue.Queue(maxsize=queue_size)
+    failures = []
+    failures_lock = threading.Lock()
+    deadline = time.monotonic() + time_limit if time_limit else None
+    stop = threading.Event()
+
+    def fetch(ticker):
+        if stop.is_set() or (deadline and time.monotonic() > deadline):
+            stop.set()
+            return
+        df, error = fetch_with_retry(ticker, period=period, retries=retries)
+        if df is None:
+            with failures_lock:
+                failures.append((ticker, error))
+            progress.add(failed=1)
+            return
+        frames_q.put((ticker, df))
+        progress.add(fetched=1)
+
+    def produce():
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="batch-fetch") as pool:
+            # Submitting lazily keeps at most a few pending tickers per worker
+            pending = []
+            for ticker in tickers:
+                pending.append(pool.submit(fetch, ticker))
+                if len(pending) >= workers * 4:
+                    pending.pop(0).result()
+                if stop.is_set():
+                    break
+            for future in pending:
+                future.result()
+        frames_q.put(_DONE)
+
+    producer = threading.Thread(target=produce, name="batch-producer", daemon=True)
+    producer.start()
+
+    sink = open_sink(output)
+    engines = {}
+    batch = {}
+
+    def flush():
+        if not batch:
+            return
+        try:
+            result = forecast_batch(batch, days, batch_size, engines)
+        except Exception as e:
+            with failures_lock:
+                failures.extend((t, f"forecast failed: {e}") for t in batch)
+            progress.add(failed=len(batch))
+        else:
+            if not result.empty:
+                sink.write(result)
+            skipped = len(batch) - len(result)
+            with failures_lock:
+                failures.extend((t, "not enough history") for t in batch if t not in result.index)
+            progress.add(written=len(result), failed=skipped)
+        batch.clear()
+
+    try:
+        while True:
+            item = frames_q.get()
+            if item is _DONE:
+                break
+            ticker, df = item
+            batch[ticker] = df
+            if len(batch) >= batch_size:
+                flush()
+        flush()
+    except BaseException:
+        # Unblock the fetch workers so the producer can finish
+        stop.set()
+        while producer.is_alive():
+            try:
+                frames_q.get(timeout=0.1)
+            except queue.Empty:
+                pass
+        raise
+    finally:
+        sink.close()
+        producer.join()
+
+    if failures_path and failures:
+        pd.DataFrame(failures, columns=["Ticker", "Error"]).to_csv(failures_path, index=False)
+    print(progress.line(), file=sys.stderr)
+    return {
+        "tickers": len(tickers),
+        "written": progress.written,
+        "failed": len(failures),
+        "stopped_early": stop.is_set(),
+        "seconds": time.monotonic() - progress.start,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Forecast a whole ticker universe without the dashboard.")
+    parser.add_argument("--tickers", nargs="+", help="Tickers to forecast")
+    parser.add_argument("--tickers-file", help="File with one ticker per line")
+    parser.add_argument("--output", default="forecasts.csv", help="Results file (.csv or .parquet)")
+    parser.add_argument("--failures", help="CSV listing tickers that failed and why")
+    parser.add_argument("--period", default="2y", help="History fetched per ticker")
+    parser.add_argument("--days", type=int, default=1, help="Forecast horizon in business days")
+    parser.add_argument("--workers", type=int, default=8, help="Concurrent fetch threads")
+    parser.add_argument("--batch-size", type=int, default=256, help="Tickers per inference batch")
+    parser.add_argument("--queue-size", type=int, default=512, help="Fetched frames buffered ahead of inference")
+    parser.add_argument("--retries", type=int, default=3, help="Retries per ticker on transient fetch errors")
+    parser.add_argument("--time-limit", type=float, help="Stop starting new fetches after this many seconds")
+    parser.add_argument("--progress-every", type=float, default=5.0, help="Seconds between progress lines")
+    args = parser.parse_args()
+
+    tickers = list(args.tickers or [])
+    if args.tickers_file:
+        tickers += read_tickers(args.tickers_file)
+    tickers = [t.upper() for t in dict.fromkeys(tickers)]
+    if not tickers:
+        parser.error("no tickers given (use --tickers or --tickers-file)")
+
+    if os.path.dirname(args.output):
+        os.makedirs(os.path.dirname(args.output), exist_ok=True)
+    summary = run(tickers, args.output, period=args.period, days=args.days, workers=args.workers,
+                  batch_size=args.batch_size, queue_size=args.queue_size, retries=args.retries,
+                  time_limit=args.time_limit, progress_every=args.progress_every,
+                  failures_path=args.failures)
+    print(f"Wrote {summary['written']} forecasts to {args.output} "
+          f"({summary['failed']} failed) in {summary['seconds']:.1f}s")
+    sys.exit(0 if summary["written"] else 1)
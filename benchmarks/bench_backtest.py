@@ -0,0 +1,37 @@
+"""
+Walk-forward backtest throughput (windows scored per second).
+
+    python -m benchmarks.bench_backtest --tickers 50 --days 1260 --batch-size 1024
+"""
+import argparse
+
+from benchmarks.common import synthetic_frames, timed
+from utils import backtest
+from utils.ai_engine import AIEngine, DEFAULT_MODEL_PATH
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--tickers", type=int, default=50)
+    parser.add_argument("--days", type=int, default=1260)
+    parser.add_argument("--batch-size", type=int, default=1024)
+    parser.add_argument("--model", default=DEFAULT_MODEL_PATH)
+    args = parser.parse_args()
+
+    frames = synthetic_frames(args.tickers, args.days)
+    engine = AIEngine(args.model)
+    if not engine.load_ai_model():
+        raise SystemExit(f"Could not load model from {args.model}")
+
+    seconds, results = timed(backtest.walk_forward, engine, frames, batch_size=args.batch_size)
+    score_seconds, per_ticker = timed(backtest.score, results)
+    _, per_year = timed(backtest.score, results, by=None, period="Y")
+
+    print(f"Windows:        {len(results)}")
+    print(f"Inference:      {seconds:8.3f}s  {len(results) / seconds:10.1f} windows/sec")
+    print(f"Scoring:        {score_seconds:8.3f}s")
+    print(per_year.round(3).to_string())
+
+
+if __name__ == "__main__":
+    main()
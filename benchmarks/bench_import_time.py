@@ -0,0 +1,85 @@
+"""
+Cold-start import profile of the app and the training script. Each target is
+imported in a fresh interpreter with `python -X importtime`; the report lists
+total time, the slowest top-level packages and any heavy packages that were
+loaded eagerly. Exits non-zero when a target exceeds its time budget or loads
+a package it must defer, so startup regressions show up in CI.
+
+    python -m benchmarks.bench_import_time --budget 3.0
+"""
+import argparse
+import json
+import subprocess
+import sys
+from collections import defaultdict
+
+# name -> (import statement, packages that must not be imported eagerly)
+TARGETS = {
+    "app": (
+        "import streamlit, pandas; "
+        "from utils import market_data, indicators, indicator_engine, visuals, ai_engine, screener",
+        ("tensorflow", "keras", "sklearn", "yfinance"),
+    ),
+    "ai_engine": ("import utils.ai_engine", ("tensorflow", "keras", "sklearn", "streamlit")),
+    "train_model": ("import train_model", ("tensorflow", "keras", "sklearn")),
+}
+
+
+def profile(statement):
+    """
+    Runs 'statement' under -X importtime. Returns (total seconds, {package: seconds}),
+    where a package's time is the self time of all of its modules.
+    """
+    out = subprocess.run([sys.executable, "-X", "importtime", "-c", statement],
+                         capture_output=True, text=True, check=True)
+    packages = defaultdict(float)
+    total = 0.0
+    for line in out.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        own, cumulative, name = line[len("import time:"):].split("|")
+        name = name.rstrip()[1:]
+        packages[name.strip().split(".")[0]] += int(own) / 1e6
+        # Top-level entries (no nesting) carry the cost of their whole subtree
+        if name == name.lstrip():
+            total += int(cumulative) / 1e6
+    return total, dict(packages)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--targets", nargs="+", choices=sorted(TARGETS), default=sorted(TARGETS))
+    parser.add_argument("--budget", type=float, help="Seconds allowed per target")
+    parser.add_argument("--top", type=int, default=8)
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
+    results, failures = {}, []
+    for name in args.targets:
+        statement, deferred = TARGETS[name]
+        total, packages = profile(statement)
+        eager = sorted(p for p in deferred if p in packages)
+        results[name] = {
+            "seconds": total,
+            "top": sorted(packages.items(), key=lambda item: -item[1])[:args.top],
+            "eager_heavy_imports": eager,
+        }
+        if eager:
+            failures.append(f"{name}: imports {', '.join(eager)} at startup")
+        if args.budget is not None and total > args.budget:
+            failures.append(f"{name}: {total:.2f}s exceeds the {args.budget:.2f}s budget")
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        for name, r in results.items():
+            print(f"{name}: {r['seconds']:.2f}s")
+            for package, seconds in r["top"]:
+                print(f"    {package:<24}{seconds:8.3f}s")
+    for failure in failures:
+        print(f"FAIL {failure}", file=sys.stderr)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
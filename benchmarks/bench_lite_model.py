@@ -0,0 +1,118 @@
+"""
+Keras vs the exported NumPy model (utils.lite_model): parity, import/load time,
+per-call latency and RSS. Each backend runs in its own subprocess so imports
+and memory are measured independently. Exits non-zero if a float32 export
+drifts from Keras by more than --tolerance.
+
+    python -m benchmarks.bench_lite_model --model Latest_stock_price_model.keras
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from utils.lite_model import QUANTIZATIONS
+
+BACKENDS = ("keras",) + QUANTIZATIONS
+
+
+def inputs(batch):
+    return np.random.default_rng(0).random((batch, 100, 1)).astype(np.float32)
+
+
+def run_backend(backend, model, workdir, batch, repeat):
+    start = time.perf_counter()
+    if backend == "keras":
+        from keras.models import load_model
+        net = load_model(model)
+    else:
+        from utils.lite_model import LiteModel
+        net = LiteModel.load(os.path.join(workdir, f"{backend}.npz"))
+    load_seconds = time.perf_counter() - start
+
+    single, batched = inputs(1), inputs(batch)
+    net.predict_on_batch(single)  # warm up
+
+    def latency(x):
+        best = float("inf")
+        for _ in range(repeat):
+            t = time.perf_counter()
+            out = np.asarray(net.predict_on_batch(x))
+            best = min(best, time.perf_counter() - t)
+        return best, out
+
+    single_seconds, _ = latency(single)
+    batch_seconds, out = latency(batched)
+    np.save(os.path.join(workdir, f"{backend}.out.npy"), out)
+    return {
+        "backend": backend,
+        "load_seconds": load_seconds,
+        "single_ms": single_seconds * 1000,
+        "batch_ms": batch_seconds * 1000,
+        "rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "tensorflow_loaded": "tensorflow" in sys.modules,
+    }
+
+
+def export(model, workdir):
+    from keras.models import load_model
+    from utils.lite_model import export_lite_model
+    net = load_model(model)
+    for quantize in QUANTIZATIONS:
+        export_lite_model(net, os.path.join(workdir, f"{quantize}.npz"), quantize=quantize)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--model", default="Latest_stock_price_model.keras")
+    parser.add_argument("--batch", type=int, default=256)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--tolerance", type=float, default=1e-5)
+    parser.add_argument("--backend", choices=BACKENDS + ("export",), help=argparse.SUPPRESS)
+    parser.add_argument("--workdir", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.backend == "export":
+        export(args.model, args.workdir)
+        return
+    if args.backend:
+        print(json.dumps(run_backend(args.backend, args.model, args.workdir, args.batch, args.repeat)))
+        return
+
+    def child(backend, workdir):
+        out = subprocess.run(
+            [sys.executable, "-m", "benchmarks.bench_lite_model", "--backend", backend,
+             "--model", args.model, "--workdir", workdir,
+             "--batch", str(args.batch), "--repeat", str(args.repeat)],
+            capture_output=True, text=True, check=True,
+        )
+        return out.stdout.strip().splitlines()[-1] if out.stdout.strip() else None
+
+    with tempfile.TemporaryDirectory() as workdir:
+        child("export", workdir)
+        print(f"{'backend':<10}{'size MB':>9}{'load s':>9}{'1 win ms':>10}{f'{args.batch} win ms':>12}"
+              f"{'RSS MB':>9}{'max |diff|':>12}  TF")
+        results = [json.loads(child(backend, workdir)) for backend in BACKENDS]
+        reference = np.load(os.path.join(workdir, "keras.out.npy"))
+        failed = False
+        for r in results:
+            out = np.load(os.path.join(workdir, f"{r['backend']}.out.npy"))
+            diff = float(np.abs(out - reference).max())
+            path = args.model if r["backend"] == "keras" else os.path.join(workdir, f"{r['backend']}.npz")
+            print(f"{r['backend']:<10}{os.path.getsize(path) / 1e6:>9.2f}{r['load_seconds']:>9.3f}"
+                  f"{r['single_ms']:>10.2f}{r['batch_ms']:>12.2f}{r['rss_mb']:>9.0f}{diff:>12.2e}"
+                  f"  {'yes' if r['tensorflow_loaded'] else 'no'}")
+            if r["backend"] == "float32" and diff > args.tolerance:
+                failed = True
+    if failed:
+        sys.exit(f"float32 export differs from Keras by more than {args.tolerance}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,34 @@
+"""
+Throughput of AIEngine.predict_many against the per-ticker predict_future loop.
+
+    python -m benchmarks.bench_predict_many --tickers 500 --batch-size 256
+"""
+import argparse
+
+from benchmarks.common import synthetic_frames, timed
+from utils.ai_engine import AIEngine, DEFAULT_MODEL_PATH
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--tickers", type=int, default=500)
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--model", default=DEFAULT_MODEL_PATH)
+    args = parser.parse_args()
+
+    frames = synthetic_frames(args.tickers)
+    engine = AIEngine(args.model)
+    if not engine.load_ai_model():
+        raise SystemExit(f"Could not load model from {args.model}")
+
+    loop_seconds, _ = timed(lambda: [engine.predict_future(df) for df in frames.values()])
+    batch_seconds, result = timed(engine.predict_many, frames, batch_size=args.batch_size, repeat=3)
+
+    print(f"Tickers:           {len(result)}")
+    print(f"Per-ticker loop:   {loop_seconds:8.3f}s  {args.tickers / loop_seconds:10.1f} tickers/sec")
+    print(f"predict_many:      {batch_seconds:8.3f}s  {args.tickers / batch_seconds:10.1f} tickers/sec")
+    print(f"Speed-up:          {loop_seconds / batch_seconds:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
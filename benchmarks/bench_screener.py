@@ -0,0 +1,38 @@
+"""
+Universe screener: per-ticker check_signals/signal_history loop vs one panel scan.
+
+    python -m benchmarks.bench_screener --tickers 500 --days 1260
+"""
+import argparse
+
+from benchmarks.common import synthetic_frames, timed
+from utils import indicators, screener
+
+
+def per_ticker(frames):
+    states, events = {}, 0
+    for ticker, df in frames.items():
+        df = indicators.add_technical_indicators(df)
+        states[ticker] = indicators.check_signals(df)
+        events += (indicators.signal_history(df)['MACD_Cross'] != 'None').sum()
+    return states, events
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--tickers", type=int, default=500)
+    parser.add_argument("--days", type=int, default=1260)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    frames = synthetic_frames(args.tickers, args.days)
+    loop_seconds, _ = timed(per_ticker, frames, repeat=args.repeat)
+    scan_seconds, (events, state) = timed(screener.scan, frames, repeat=args.repeat)
+
+    print(f"Tickers: {args.tickers}  bars: {args.days}  events: {len(events)}")
+    print(f"Per-ticker loop: {loop_seconds:8.3f}s")
+    print(f"Panel scan:      {scan_seconds:8.3f}s  ({loop_seconds / scan_seconds:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
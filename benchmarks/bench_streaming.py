@@ -0,0 +1,74 @@
+"""
+Live streaming cost on the local stand-in feed with a simulated clock: N symbols
+watched by S sessions each, one shared StreamHub against every session polling
+and recomputing indicators itself. Also times a live chart redraw, appending the
+new bar against rebuilding the figure.
+
+    python -m benchmarks.bench_streaming --symbols 50 --sessions 5 --minutes 1
+"""
+import argparse
+import time
+
+from benchmarks.common import timed
+from utils import indicators, providers, streaming, visuals
+
+
+class CountingFeed(streaming.SyntheticFeed):
+    calls = 0
+
+    def ticks(self, ticker):
+        self.calls += 1
+        return super().ticks(ticker)
+
+
+def simulate(symbols, sessions, minutes, poll_seconds, shared):
+    now = [1_735_650_000.0]
+    feeds = [CountingFeed(providers.SyntheticProvider(end="2024-12-31"), clock=lambda: now[0])
+             for _ in range(1 if shared else sessions)]
+    hubs = [streaming.StreamHub(feed, poll_seconds=poll_seconds, bar_seconds=60) for feed in feeds]
+    tickers = [f"L{i:03d}" for i in range(symbols)]
+    for hub in hubs:
+        hub._thread = object()  # polled by hand below, on the simulated clock
+    watched = [[hub.watch(t, s) for t in tickers] for s, hub in enumerate(hubs * (sessions if shared else 1))]
+
+    start = time.process_time()
+    for _ in range(int(minutes * 60 / poll_seconds)):
+        now[0] += poll_seconds
+        for hub in hubs:
+            hub.poll_once()
+        if not shared:
+            # Without shared incremental state every session recomputes its indicators
+            for streams in watched:
+                for stream in streams:
+                    indicators.add_technical_indicators(stream.frame()[streaming.OHLCV])
+    cpu = time.process_time() - start
+    return cpu, sum(feed.calls for feed in feeds), sum(s.closed for s in watched[0])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--symbols", type=int, default=50)
+    parser.add_argument("--sessions", type=int, default=5)
+    parser.add_argument("--minutes", type=float, default=1)
+    parser.add_argument("--poll-seconds", type=float, default=2.0)
+    args = parser.parse_args()
+
+    print(f"{args.symbols} symbols x {args.sessions} sessions, {args.minutes:g} simulated minutes, "
+          f"poll every {args.poll_seconds:g}s")
+    for label, shared in (("shared hub", True), ("per session", False)):
+        cpu, calls, bars = simulate(args.symbols, args.sessions, args.minutes, args.poll_seconds, shared)
+        print(f"{label:<12} CPU {cpu / args.minutes * 1000:9.1f} ms per market minute   "
+              f"feed calls {calls:8,}   bars closed (all symbols) {bars:,}")
+
+    hub = streaming.StreamHub(streaming.SyntheticFeed(clock=lambda: 1_735_650_000.0))
+    hub._thread = object()
+    stream = hub.watch("LIVE")
+    rows, closed, _ = stream.updates(0)
+    fig = visuals.create_live_chart(rows[:-1], "LIVE")
+    rebuild, _ = timed(visuals.create_live_chart, rows, "LIVE", repeat=5)
+    append, _ = timed(lambda: visuals.extend_live_chart(fig, rows[-1:], replace_last=True), repeat=5)
+    print(f"chart redraw ({len(rows)} bars): rebuild {rebuild * 1000:.1f} ms, append {append * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
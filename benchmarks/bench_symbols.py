@@ -0,0 +1,89 @@
+"""
+Symbol resolver over a synthetic universe the size of the US listings: index build,
+load from the saved .npz, and search latency against the old linear substring scan.
+
+    python -m benchmarks.bench_symbols --symbols 30000
+"""
+import argparse
+import os
+import tempfile
+
+import numpy as np
+
+from benchmarks.common import timed
+from utils import symbols
+
+SYLLABLES = ["al", "bio", "cor", "dyn", "en", "fin", "gen", "har", "in", "tek", "lum", "mar",
+             "nov", "or", "pac", "quan", "ro", "sol", "tri", "uni", "vec", "wav", "xen", "zen"]
+SUFFIXES = ["Inc.", "Corporation", "Holdings Inc.", "Group plc", "Technologies Inc.", "Therapeutics Inc."]
+
+
+def synthetic_rows(count, seed=0):
+    rng = np.random.default_rng(seed)
+    rows, seen = [], set()
+    while len(rows) < count:
+        words = ["".join(rng.choice(SYLLABLES, rng.integers(2, 4))).title() for _ in range(rng.integers(1, 3))]
+        symbol = "".join(w[0] for w in words).upper() + "".join(rng.choice(list("ABCDEFGHIJKLMNOPQRSTUVWXYZ"), 3))
+        if symbol in seen:
+            continue
+        seen.add(symbol)
+        rows.append((symbol, f"{' '.join(words)} {rng.choice(SUFFIXES)}", "NASDAQ"))
+    return rows
+
+
+def linear_scan(rows, query):
+    # The old resolve_ticker approach, over the whole universe
+    query = query.upper()
+    for symbol, name, _ in rows:
+        name = name.upper()
+        if query in name or name in query:
+            return symbol
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--symbols", type=int, default=30000)
+    parser.add_argument("--queries", type=int, default=2000)
+    args = parser.parse_args()
+
+    rows = symbols.read_symbols(symbols.SYMBOLS_CSV) + synthetic_rows(args.symbols)
+    build_seconds, index = timed(symbols.SymbolIndex.build, rows)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "symbols.npz")
+        index.save(path)
+        size = os.path.getsize(path)
+        load_seconds, index = timed(symbols.SymbolIndex.load, path, repeat=5)
+
+    rng = np.random.default_rng(1)
+    picks = rng.integers(0, len(rows), args.queries)
+    queries = []
+    for i, pick in enumerate(picks):
+        symbol, name, _ = rows[pick]
+        kind = i % 4
+        if kind == 0:
+            queries.append(symbol)
+        elif kind == 1:
+            queries.append(name.split()[0][:4])  # prefix of the first word
+        elif kind == 2:
+            core = " ".join(name.split()[:-1]) or name
+            cut = len(core) // 2
+            queries.append(core[:cut] + core[cut + 1:])  # one letter dropped
+        else:
+            queries.append(name)
+
+    search_seconds, _ = timed(lambda: [index.search(q, 8) for q in queries], repeat=3)
+    scan_seconds, _ = timed(lambda: [linear_scan(rows, q) for q in queries[:200]])
+
+    exact = sum(index.search(rows[p][0], 1)[0].symbol == rows[p][0] for p in picks[:500])
+    fuzzy = sum(rows[p][0] in [m.symbol for m in index.search(q, 8)]
+                for p, q in zip(picks[2::4], queries[2::4]))
+    print(f"Symbols: {len(index)}  keys: {len(index.keys)}  index file: {size / 1e6:.1f} MB")
+    print(f"build: {build_seconds * 1000:8.1f} ms   load: {load_seconds * 1000:6.1f} ms")
+    print(f"search (top 8): {search_seconds / len(queries) * 1e6:8.1f} us/query")
+    print(f"linear scan:    {scan_seconds / 200 * 1e6:8.1f} us/query")
+    print(f"exact symbol hits: {exact}/500  typo query finds target in top 8: {fuzzy}/{len(queries[2::4])}")
+
+
+if __name__ == "__main__":
+    main()
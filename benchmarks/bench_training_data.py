@@ -0,0 +1,97 @@
+"""
+Training input: materialised window arrays (what model.fit got before) against
+the streaming pipeline in utils.training_data, on synthetic tickers. Each mode
+runs one epoch of batches in its own subprocess so peak RSS is measured
+independently.
+
+    python -m benchmarks.bench_training_data --tickers 20 --features indicators
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from utils import market_data, providers, training_data
+from utils.scaling import MinMaxScaling
+from utils.windows import make_windows
+
+MODES = ("arrays", "stream")
+
+
+def run_mode(mode, tickers, features, batch_size, root):
+    market_data.set_provider(providers.SyntheticProvider(end="2024-12-31"), store_dir=os.path.join(root, "store"))
+    names = [f"T{i:04d}" for i in range(tickers)]
+    # Pack built (and prices stored) before measuring: both modes start from the same files
+    pack = training_data.build_feature_pack(names, features, root=os.path.join(root, "features"))
+    base_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    start = time.perf_counter()
+    samples = 0
+    if mode == "arrays":
+        xs, ys = [], []
+        for i in range(len(pack)):
+            rows = np.array(pack.rows(i))
+            scaler = MinMaxScaling.fit(rows)
+            x, y = make_windows(scaler.transform(rows, out=rows), window=100)
+            xs.append(np.ascontiguousarray(x))
+            ys.append(np.ascontiguousarray(y))
+        x_all, y_all = np.concatenate(xs), np.concatenate(ys)
+        del xs, ys
+        order = np.random.default_rng(0).permutation(len(x_all))
+        for i in range(0, len(order), batch_size):
+            picks = order[i:i + batch_size]
+            x, y = x_all[picks], y_all[picks]
+            samples += len(x)
+    else:
+        data = training_data.TrainingData(pack, val_fraction=0.0)
+        for x, y in data.train(batch_size=batch_size):
+            samples += len(x)
+    seconds = time.perf_counter() - start
+
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return {
+        "mode": mode,
+        "samples": samples,
+        "seconds": seconds,
+        "samples_per_sec": samples / seconds,
+        "pack_mb": pack.nbytes() / 1e6,
+        "extra_rss_mb": (peak_rss - base_rss) / 1024,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--tickers", type=int, default=20)
+    parser.add_argument("--features", default="indicators")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--mode", choices=MODES, help=argparse.SUPPRESS)
+    parser.add_argument("--root", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        print(json.dumps(run_mode(args.mode, args.tickers, args.features, args.batch_size, args.root)))
+        return
+
+    with tempfile.TemporaryDirectory() as root:
+        print(f"{args.tickers} synthetic tickers, features '{args.features}', batch {args.batch_size}")
+        print(f"{'mode':<10}{'samples':>10}{'seconds':>10}{'samples/s':>12}{'extra RSS MB':>15}")
+        for mode in MODES:
+            out = subprocess.run(
+                [sys.executable, "-m", "benchmarks.bench_training_data", "--mode", mode, "--root", root,
+                 "--tickers", str(args.tickers), "--features", args.features, "--batch-size", str(args.batch_size)],
+                capture_output=True, text=True, check=True,
+            )
+            r = json.loads(out.stdout.strip().splitlines()[-1])
+            print(f"{r['mode']:<10}{r['samples']:>10}{r['seconds']:>10.2f}{r['samples_per_sec']:>12,.0f}"
+                  f"{r['extra_rss_mb']:>15.1f}")
+        print(f"feature pack on disk: {r['pack_mb']:.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Build time and peak memory of the training window builder: the old Python
+append loop against the strided views in utils.windows. Each mode runs in
+its own subprocess so peak RSS is measured independently.
+
+    python -m benchmarks.bench_windows --tickers 20 --years 20
+"""
+import argparse
+import json
+import resource
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+from utils.windows import WindowDataset, make_windows
+
+MODES = ("loop", "views", "dataset")
+
+
+def loop_windows(series, window=100):
+    # Previous train_model.preprocess_data implementation
+    x_data, y_data = [], []
+    for i in range(window, len(series)):
+        x_data.append(series[i - window:i])
+        y_data.append(series[i])
+    return np.array(x_data), np.array(y_data)
+
+
+def run_mode(mode, tickers, days):
+    rng = np.random.default_rng(0)
+    series = [rng.random((days, 1)) for _ in range(tickers)]
+    base_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    start = time.perf_counter()
+    if mode == "loop":
+        built = [loop_windows(s) for s in series]
+        windows = sum(len(x) for x, _ in built)
+    elif mode == "views":
+        built = [make_windows(s) for s in series]
+        windows = sum(len(x) for x, _ in built)
+    else:
+        built = WindowDataset(series)
+        windows = len(built)
+    seconds = time.perf_counter() - start
+
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return {
+        "mode": mode,
+        "windows": int(windows),
+        "seconds": seconds,
+        "raw_mb": tickers * days * 8 / 1e6,
+        "peak_rss_mb": peak_rss / 1024,
+        "extra_rss_mb": (peak_rss - base_rss) / 1024,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--tickers", type=int, default=20)
+    parser.add_argument("--years", type=int, default=20)
+    parser.add_argument("--mode", choices=MODES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    days = args.years * 252
+
+    if args.mode:
+        print(json.dumps(run_mode(args.mode, args.tickers, days)))
+        return
+
+    print(f"{args.tickers} tickers x {days} days ({args.tickers * days * 8 / 1e6:.1f} MB raw float64)")
+    print(f"{'mode':<10}{'windows':>10}{'seconds':>10}{'extra RSS MB':>15}")
+    for mode in MODES:
+        out = subprocess.run(
+            [sys.executable, "-m", "benchmarks.bench_windows", "--mode", mode,
+             "--tickers", str(args.tickers), "--years", str(args.years)],
+            capture_output=True, text=True, check=True,
+        )
+        r = json.loads(out.stdout)
+        print(f"{r['mode']:<10}{r['windows']:>10}{r['seconds']:>10.3f}{r['extra_rss_mb']:>15.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,37 @@
+import time
+
+import numpy as np
+import pandas as pd
+
+
+def synthetic_frame(days=1260, seed=0, start_price=100.0):
+    """
+    Random-walk OHLCV frame on business days, deterministic for a given seed.
+    """
+    rng = np.random.default_rng(seed)
+    close = start_price * np.exp(np.cumsum(rng.normal(0.0003, 0.02, days)))
+    open_ = close * (1 + rng.normal(0, 0.005, days))
+    index = pd.bdate_range(end="2024-12-31", periods=days, name="Date")
+    return pd.DataFrame({
+        "Open": open_,
+        "High": np.maximum(open_, close) * 1.01,
+        "Low": np.minimum(open_, close) * 0.99,
+        "Close": close,
+        "Volume": rng.integers(1_000_000, 10_000_000, days).astype(float),
+    }, index=index)
+
+
+def synthetic_frames(tickers=500, days=1260, seed=0):
+    return {f"T{i:04d}": synthetic_frame(days, seed=seed + i) for i in range(tickers)}
+
+
+def timed(fn, *args, repeat=1, **kwargs):
+    """
+    Runs fn 'repeat' times, returns (best seconds, last result).
+    """
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(*args, **kwargs)
+        best = min(best, time.perf_counter() - start)
+    return best, result
@@ -0,0 +1,259 @@
+"""
+Offline benchmark suite: the dashboard's hot paths at several history lengths, on
+deterministic synthetic data (no network). Writes machine-readable results and
+compares them with a stored baseline.
+
+    python -m benchmarks.run                       # run, compare with benchmarks/baseline.json
+    python -m benchmarks.run --sizes 250 1260 --repeat 10 --cases indicators
+    python -m benchmarks.run --update-baseline     # accept the current numbers
+
+Cases are compared on their fastest run (least disturbed by other load); exits
+with status 1 when one is slower than its baseline by more than --tolerance.
+"""
+import argparse
+import gc
+import json
+import math
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from utils import market_data, providers
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BASELINE_PATH = os.path.join(BENCH_DIR, "baseline.json")
+RESULTS_PATH = os.path.join(BENCH_DIR, "results", "latest.json")
+
+SIZES = (250, 1260, 5000)
+TICKER = "BENCH"
+# Fixed end date so every run sees exactly the same bars
+END_DATE = "2024-12-31"
+# Differences below this are timer noise, never regressions (seconds)
+MIN_DELTA = 0.0005
+# Times a suspected regression is measured again before it is reported
+RECHECKS = 2
+
+
+def _indicators(df):
+    from utils import indicators
+    return lambda: indicators.add_technical_indicators(df)
+
+
+def _signals(df):
+    from utils import indicators
+    with_indicators = indicators.add_technical_indicators(df)
+    return lambda: indicators.check_signals(with_indicators)
+
+
+def _preprocess(df):
+    import train_model
+    return lambda: train_model.preprocess_data(df, ticker=TICKER)
+
+
+def _predict(df):
+    from utils import ai_engine
+    engine = ai_engine.AIEngine()
+    if not engine.load_ai_model():
+        return None
+
+    def run():
+        ai_engine._forecasts.clear()  # measure inference, not the forecast cache
+        return engine.predict_future(df, days=1)
+    return run
+
+
+def _chart(df):
+    from utils import indicators, visuals
+    with_indicators = indicators.add_technical_indicators(df)
+
+    def run():
+        visuals._figure_cache.clear()  # measure building, not the figure cache
+        return visuals.create_stock_chart(with_indicators, TICKER)
+    return run
+
+
+# name -> setup(df) returning the callable to time (or None to skip the case)
+CASES = {
+    "indicators.add_technical_indicators": _indicators,
+    "indicators.check_signals": _signals,
+    "train_model.preprocess_data": _preprocess,
+    "ai_engine.predict_future": _predict,
+    "visuals.create_stock_chart": _chart,
+}
+
+
+def measure(fn, repeat=7, warmup=1, min_sample=0.05):
+    """
+    Seconds per call of fn: like timeit, each of 'repeat' samples loops fn enough
+    times to last at least 'min_sample' seconds, with garbage collection paused.
+    """
+    for _ in range(warmup):
+        start = time.perf_counter()
+        fn()
+        first = time.perf_counter() - start
+    number = max(1, math.ceil(min_sample / max(first, 1e-9)))
+
+    times = []
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            for _ in range(number):
+                fn()
+            times.append((time.perf_counter() - start) / number)
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+    return {
+        "min": min(times),
+        "median": statistics.median(times),
+        "mean": statistics.fmean(times),
+        "repeat": repeat,
+        "number": number,
+    }
+
+
+def environment():
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+    }
+
+
+def run_suite(sizes=SIZES, repeat=7, cases=None, seed=0, keys=None):
+    """
+    Runs every case (or those whose name contains one of 'cases', or exactly the
+    'case[size]' keys given) at every size.
+    Returns {"environment": ..., "results": {"case[size]": {...}}}.
+    """
+    provider = providers.SyntheticProvider(seed=seed, end=END_DATE)
+    results = {}
+    with tempfile.TemporaryDirectory() as store_dir:
+        market_data.set_provider(provider, store_dir=store_dir)
+        history = provider.history(TICKER)
+        for name, setup in CASES.items():
+            if cases and not any(c in name for c in cases):
+                continue
+            for size in sizes:
+                key = f"{name}[{size}]"
+                if keys is not None and key not in keys:
+                    continue
+                df = history.tail(size)
+                if len(df) < size:
+                    results[key] = {"status": "skipped", "reason": f"only {len(df)} bars"}
+                    continue
+                try:
+                    fn = setup(df)
+                except Exception as e:
+                    fn, reason = None, f"{type(e).__name__}: {e}"
+                else:
+                    reason = "unavailable (no model?)"
+                if fn is None:
+                    results[key] = {"status": "skipped", "reason": reason}
+                    continue
+                results[key] = dict(measure(fn, repeat=repeat), status="ok", case=name, size=size)
+                print(f"{key:50s} {results[key]['min'] * 1000:10.3f} ms", file=sys.stderr)
+    return {"environment": environment(), "seed": seed, "results": results}
+
+
+def compare(current, baseline, tolerance=0.25, min_delta=MIN_DELTA):
+    """
+    Rows of (case, baseline best, current best, ratio, verdict). A case regresses
+    when its fastest run is more than 'tolerance' slower and the gap exceeds 'min_delta'.
+    """
+    rows = []
+    for key, result in current["results"].items():
+        base = baseline.get("results", {}).get(key)
+        if result.get("status") != "ok" or not base or base.get("status") != "ok":
+            rows.append((key, None, result.get("min"), None, result.get("status", "new")
+                         if not base else "not comparable"))
+            continue
+        old, new = base["min"], result["min"]
+        ratio = new / old if old else float("inf")
+        if ratio > 1 + tolerance and new - old > min_delta:
+            verdict = "REGRESSION"
+        elif ratio < 1 - tolerance and old - new > min_delta:
+            verdict = "faster"
+        else:
+            verdict = "ok"
+        rows.append((key, old, new, ratio, verdict))
+    return rows
+
+
+def _ms(seconds):
+    return f"{seconds * 1000:10.3f}" if seconds is not None else f"{'-':>10s}"
+
+
+def write_json(data, path):
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(SIZES), help="History lengths in bars")
+    parser.add_argument("--repeat", type=int, default=7, help="Timed runs per case (the fastest is compared)")
+    parser.add_argument("--cases", nargs="+", help="Only cases whose name contains one of these")
+    parser.add_argument("--seed", type=int, default=0, help="Synthetic market seed")
+    parser.add_argument("--output", default=RESULTS_PATH, help="Where to write this run's JSON results")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="Baseline JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.5, help="Allowed slowdown before flagging (0.5 = 50%%)")
+    parser.add_argument("--update-baseline", action="store_true", help="Save this run as the new baseline")
+    args = parser.parse_args()
+
+    current = run_suite(args.sizes, args.repeat, args.cases, args.seed)
+    write_json(current, args.output)
+    print(f"Results written to {args.output}")
+
+    if args.update_baseline:
+        write_json(current, args.baseline)
+        print(f"Baseline updated: {args.baseline}")
+        return 0
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --update-baseline to create one.")
+        return 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    rows = compare(current, baseline, args.tolerance)
+
+    # A slowdown has to survive re-measuring: shared machines have noisy phases
+    for _ in range(RECHECKS):
+        suspects = {row[0] for row in rows if row[4] == "REGRESSION"}
+        if not suspects:
+            break
+        print(f"Re-measuring {len(suspects)} suspected regression(s)...")
+        again = run_suite(args.sizes, args.repeat, seed=args.seed, keys=suspects)["results"]
+        for key, result in again.items():
+            if result.get("status") == "ok" and result["min"] < current["results"][key]["min"]:
+                current["results"][key] = result
+        rows = compare(current, baseline, args.tolerance)
+    write_json(current, args.output)
+    print(f"\n{'case':50s} {'base ms':>10s} {'now ms':>10s} {'ratio':>7s}  verdict")
+    for key, old, new, ratio, verdict in rows:
+        ratio_text = f"{ratio:7.2f}" if ratio is not None else f"{'-':>7s}"
+        print(f"{key:50s} {_ms(old)} {_ms(new)} {ratio_text}  {verdict}")
+    regressions = [row for row in rows if row[4] == "REGRESSION"]
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) beyond {args.tolerance:.0%} "
+              f"(baseline from {baseline.get('environment', {}).get('time', '?')})")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
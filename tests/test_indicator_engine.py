@@ -0,0 +1,61 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.indicator_engine import IndicatorEngine
+from utils.indicators import INDICATOR_COLUMNS, add_technical_indicators
+
+
+def prices(n=1600, seed=0):
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.02, n)))
+    return pd.DataFrame({"Close": close}, index=pd.bdate_range("2015-01-01", periods=n, name="Date"))
+
+
+def assert_matches_batch(out, df):
+    expected = add_technical_indicators(df)
+    assert out.index.equals(df.index)
+    for column in INDICATOR_COLUMNS:
+        np.testing.assert_allclose(out[column].to_numpy(), expected[column].to_numpy(),
+                                   rtol=1e-9, atol=1e-9, err_msg=column)
+
+
+def test_new_bars_match_batch(tmp_path):
+    full = prices()
+    engine = IndicatorEngine(root=str(tmp_path))
+    for end in range(1200, 1210):
+        df = full.iloc[:end]
+        assert_matches_batch(engine.update("TEST", df), df)
+
+
+@pytest.mark.parametrize("rows", [1258, 400])
+def test_moving_window_matches_batch(tmp_path, rows):
+    # The dashboard's period view: the first date moves forward with every new bar
+    full = prices()
+    engine = IndicatorEngine(root=str(tmp_path))
+    for end in range(1400, 1406):
+        df = full.iloc[end - rows:end]
+        assert_matches_batch(engine.update("TEST", df), df)
+
+
+def test_reloaded_state_matches_batch(tmp_path):
+    full = prices()
+    IndicatorEngine(root=str(tmp_path)).update("TEST", full.iloc[:1300])
+    df = full.iloc[20:1305]
+    assert_matches_batch(IndicatorEngine(root=str(tmp_path)).update("TEST", df), df)
+
+
+def test_moving_window_stays_incremental(tmp_path, monkeypatch):
+    full = prices()
+    engine = IndicatorEngine(root=str(tmp_path))
+    engine.update("TEST", full.iloc[:1258])
+
+    calls = []
+    from utils import indicator_engine
+    batch = indicator_engine.add_technical_indicators
+    monkeypatch.setattr(indicator_engine, "add_technical_indicators",
+                        lambda df, *a, **k: calls.append(len(df)) or batch(df, *a, **k))
+    for end in range(1259, 1264):
+        engine.update("TEST", full.iloc[end - 1258:end])
+    # Only the warm-up head is recomputed, never the whole history
+    assert calls and max(calls) <= IndicatorEngine.WARMUP_ROWS
@@ -0,0 +1,80 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.price_store import PriceStore
+
+
+class StandIn:
+    """
+    Stand-in for the data provider: serves 'bars' (editable between calls) and
+    records every fetch as "tail" or "full".
+    """
+    def __init__(self, bars):
+        self.bars = bars
+        self.calls = []
+
+    def __call__(self, ticker, interval="1d", start=None, period=None):
+        self.calls.append("tail" if start is not None else "full")
+        return self.bars[self.bars.index >= start] if start is not None else self.bars
+
+    def add_bar(self, close, dividend=0.0):
+        ts = self.bars.index[-1] + pd.offsets.BDay()
+        self.bars.loc[ts] = [close, dividend, 0.0]
+
+
+def bars(n=300):
+    index = pd.bdate_range("2023-01-02", periods=n, name="Date")
+    return pd.DataFrame({"Close": np.linspace(100, 130, n), "Dividends": 0.0, "Stock Splits": 0.0}, index=index)
+
+
+@pytest.fixture
+def store(tmp_path):
+    source = StandIn(bars())
+    # refresh_seconds=0: every get() after the first checks for new bars
+    return PriceStore(source, root=str(tmp_path), refresh_seconds=0), source
+
+
+def test_new_tail_is_merged(store):
+    store, source = store
+    store.get("TEST", period="5y")
+    source.add_bar(131.0)
+    source.add_bar(132.0)
+    df = store.get("TEST", period="5y")
+
+    assert source.calls == ["full", "tail"]
+    np.testing.assert_array_equal(df["Close"].to_numpy(), source.bars["Close"].to_numpy())
+    assert list(df.index) == list(source.bars.index)
+    pd.testing.assert_frame_equal(store.load("TEST"), df, check_freq=False)
+
+
+def test_unchanged_history_is_not_refetched(store):
+    store, source = store
+    store.get("TEST", period="5y")
+    # An ex-dividend day already stored must not force a full refetch on every refresh
+    source.bars.iloc[-1, source.bars.columns.get_loc("Dividends")] = 0.5
+    store.get("TEST", period="5y")
+    source.calls.clear()
+    store.get("TEST", period="5y")
+    store.get("TEST", period="2y")
+
+    assert source.calls == ["tail", "tail"]
+
+
+def test_new_corporate_action_forces_full_refetch(store):
+    store, source = store
+    store.get("TEST", period="5y")
+    source.add_bar(131.0, dividend=0.8)
+    store.get("TEST", period="5y")
+
+    assert source.calls == ["full", "tail", "full"]
+
+
+def test_back_adjusted_history_forces_full_refetch(store):
+    store, source = store
+    store.get("TEST", period="5y")
+    source.bars["Close"] *= 0.5  # e.g. a split applied to all past prices
+    df = store.get("TEST", period="5y")
+
+    assert source.calls == ["full", "tail", "full"]
+    assert df["Close"].iloc[0] == pytest.approx(50.0)
@@ -1,37 +1,46 @@
+import argparse
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
 import numpy as np
 import pandas as pd
-import yfinance as yf
 from datetime import datetime
-from sklearn.preprocessing import MinMaxScaler
-from keras.models import Sequential
-from keras.layers import Dense, LSTM, Bidirectional, Dropout
-from keras.callbacks import EarlyStopping
+
+from utils import market_data, training_data
+from utils.lite_model import QUANTIZATIONS, export_lite_model, lite_path
+from utils.model_store import DEFAULT_REGISTRY_DIR, ModelStore, data_fingerprint
+from utils.scaling import MinMaxScaling, scaler_path
+from utils.windows import make_windows
 
 def download_data(stock_symbol):
+    # Through the configured data provider, so DATA_PROVIDER=synthetic trains offline
     end = datetime.now()
     start = datetime(end.year - 20, end.month, end.day)
-    data = yf.download(stock_symbol, start, end)
-    return data
+    return market_data.get_provider().history(stock_symbol, start=start)
 
-def preprocess_data(data):
+def preprocess_data(data, horizon=1, ticker=None):
     # Use only Close price
-    close_data = data[['Close']]
-    
-    scaler = MinMaxScaler(feature_range=(0, 1))
-    scaled_data = scaler.fit_transform(close_data)
+    # A copy: it is scaled in place, and pandas may hand out a read-only view
+    close_data = data[['Close']].to_numpy(dtype=np.float64, copy=True)
     
-    x_data = []
-    y_data = []
+    # Saved with the model so inference scales exactly like training did
+    scaler = MinMaxScaling.fit(close_data, feature_range=(0, 1), ticker=ticker)
+    scaled_data = scaler.transform(close_data, out=close_data)
     
-    # Create sequences of 100 days
-    for i in range(100, len(scaled_data)):
-        x_data.append(scaled_data[i-100:i])
-        y_data.append(scaled_data[i])
-        
-    x_data, y_data = np.array(x_data), np.array(y_data)
+    # Sequences of 100 days, each labelled with the next 'horizon' closes.
+    # These are strided views of scaled_data, not copies.
+    x_data, y_data = make_windows(scaled_data, window=100, horizon=horizon)
     return x_data, y_data, scaler
 
-def build_model(input_shape):
+def build_model(input_shape, horizon=1):
+    """
+    horizon > 1 builds a direct multi-horizon head that predicts every step in one pass.
+    """
+    # Keras is imported here so data prep workers and --help don't load TensorFlow
+    from keras.models import Sequential
+    from keras.layers import Dense, LSTM, Bidirectional, Dropout
+    
     model = Sequential()
     
     # Layer 1: Bidirectional LSTM with Dropout
@@ -45,39 +54,326 @@ def build_model(input_shape):
     # Dense Layers
     model.add(Dense(units=50, activation='relu'))
     model.add(Dense(units=25, activation='relu'))
-    model.add(Dense(units=1))
+    model.add(Dense(units=horizon))
     
     model.compile(optimizer='adam', loss='mean_squared_error')
     return model
 
-def train_and_save_model(stock_symbol="GOOG"):
-    print(f"Downloading data for {stock_symbol}...")
-    data = download_data(stock_symbol)
-    
-    print("Preprocessing data...")
-    x_data, y_data, scaler = preprocess_data(data)
+def scaler_params(scaler):
+    """
+    Fitted scaling parameters as plain JSON-friendly values.
+    """
+    return scaler.to_dict()
+
+def save_model_files(model, model_path, export_lite=None):
+    """
+    Saves the Keras model, plus the lightweight .npz next to it when 'export_lite'
+    names a weight format (float32, float16 or int8).
+    """
+    model.save(model_path)
+    if export_lite:
+        export_lite_model(model, lite_path(model_path), quantize=export_lite)
+
+def convert_model(model_path, export_lite="float32"):
+    """
+    Exports an already trained Keras model for CPU-only serving without retraining.
+    """
+    from keras.models import load_model
+    path = export_lite_model(load_model(model_path), lite_path(model_path), quantize=export_lite)
+    print(f"Exported '{model_path}' to '{path}' ({export_lite})")
+    return path
+
+def fit_stream(train, val, horizon=1, epochs=50, verbose=1):
+    """
+    Trains on streamed data: 'train' and 'val' are training_data.WindowStream
+    batches read from disk, so nothing is materialised however many tickers and
+    features there are. Returns the model, its metrics (scaled units, plus the
+    input pipeline's throughput and memory report) and the validation
+    (predictions, targets).
+    """
+    from keras.callbacks import EarlyStopping
     
-    # Split into train and test
-    splitting_len = int(len(x_data) * 0.7)
-    x_train, y_train = x_data[:splitting_len], y_data[:splitting_len]
-    x_test, y_test = x_data[splitting_len:], y_data[splitting_len:]
+    model = build_model((train.window, train.n_features), horizon=horizon)
+    early_stop = EarlyStopping(monitor='val_loss', patience=5, restore_best_weights=True)
+    history = model.fit(train.to_tf_dataset(),
+                        epochs=epochs,
+                        validation_data=val.to_tf_dataset(),
+                        callbacks=[early_stop],
+                        verbose=verbose)
     
-    print("Building model...")
-    model = build_model((x_train.shape[1], 1))
+    preds, targets = [], []
+    for x, y in val.epoch():
+        preds.append(np.asarray(model.predict_on_batch(x)))
+        targets.append(y)
+    pred = np.concatenate(preds) if preds else np.empty((0, horizon), dtype=np.float32)
+    y_val = np.concatenate(targets) if targets else np.empty((0, horizon), dtype=np.float32)
+    metrics = {
+        "epochs": len(history.history['loss']),
+        "train_loss": float(min(history.history['loss'])),
+        "val_loss": float(min(history.history['val_loss'])),
+        "val_samples": int(len(y_val)),
+        "input": train.report(),
+    }
+    return model, metrics, (pred, y_val)
+
+def stream_data(tickers, horizon=1, features="close", batch_size=32, shuffle_buffer=training_data.SHUFFLE_BUFFER,
+                prefetch=training_data.PREFETCH, val_start=None, feature_dir=training_data.DEFAULT_FEATURE_DIR,
+                rebuild_features=False):
+    """
+    Feature pack, split and (train, validation) streams for 'tickers'.
+    """
+    pack = training_data.build_feature_pack(tickers, features, root=feature_dir, rebuild=rebuild_features)
+    data = training_data.TrainingData(pack, window=100, horizon=horizon, val_start=val_start)
+    train = data.train(batch_size=batch_size, shuffle_buffer=shuffle_buffer, prefetch=prefetch)
+    val = data.validation(batch_size=batch_size, prefetch=prefetch)
+    print(f"{len(pack)} ticker(s), features {pack.features}: "
+          f"{train.samples:,} training / {val.samples:,} validation windows")
+    return data, train, val
+
+def train_and_save_model(stock_symbol="GOOG", horizon=1, model_path="Latest_stock_price_model.keras",
+                         export_lite=None, epochs=50, **stream_options):
+    """
+    Trains on one ticker's windows streamed from the feature pack (see stream_data
+    for the options) and saves the model with the ticker's training-period scaling.
+    """
+    print(f"Loading data and features for {stock_symbol}...")
+    data, train, val = stream_data([stock_symbol], horizon=horizon, **stream_options)
     
     print("Training model...")
-    # Add EarlyStopping
-    early_stop = EarlyStopping(monitor='val_loss', patience=5, restore_best_weights=True)
-    
-    model.fit(x_train, y_train, 
-              batch_size=32, 
-              epochs=50,  # Increased epochs, early stopping will handle it
-              validation_data=(x_test, y_test),
-              callbacks=[early_stop])
+    model, metrics, _ = fit_stream(train, val, horizon=horizon, epochs=epochs)
+    print(f"Validation loss: {metrics['val_loss']:.6f}")
+    print(f"Input pipeline: {training_data.format_report(metrics['input'])}")
     
     print("Saving model...")
-    model.save("Latest_stock_price_model.keras")
-    print("Model saved as 'Latest_stock_price_model.keras'")
+    save_model_files(model, model_path, export_lite)
+    data.scaler(stock_symbol).save(scaler_path(model_path))
+    print(f"Model saved as '{model_path}' (scaling in '{scaler_path(model_path)}')")
+
+def train_pooled(tickers, horizon=1, model_path="Latest_stock_price_model.keras", export_lite=None,
+                 epochs=50, **stream_options):
+    """
+    One model over the windows of every ticker, streamed and shuffled across tickers.
+    Each ticker is scaled on its own training range, so no single scaling is saved:
+    inference scales each series on its own range instead.
+    """
+    print(f"Loading data and features for {len(tickers)} tickers...")
+    _, train, val = stream_data(tickers, horizon=horizon, **stream_options)
+    
+    print("Training pooled model...")
+    model, metrics, _ = fit_stream(train, val, horizon=horizon, epochs=epochs)
+    print(f"Validation loss: {metrics['val_loss']:.6f}")
+    print(f"Input pipeline: {training_data.format_report(metrics['input'])}")
+    
+    save_model_files(model, model_path, export_lite)
+    if os.path.exists(scaler_path(model_path)):
+        os.remove(scaler_path(model_path))  # a previous single-ticker scaling would be wrong here
+    print(f"Model saved as '{model_path}'")
+
+def benchmark_input(tickers, horizon=1, epochs=1, **stream_options):
+    """
+    Runs the training stream without a model: how fast windows can be delivered.
+    """
+    _, train, _ = stream_data(tickers, horizon=horizon, **stream_options)
+    for _ in range(epochs):
+        for _ in train.epoch():
+            pass
+    print(f"Input pipeline: {training_data.format_report(train.report())}")
+    return train.report()
+
+# Multi-ticker training into the per-ticker model store
+
+# Shortest history a per-ticker model is trained on
+MIN_ROWS = 200
+
+def prepare_ticker(stock_symbol):
+    """
+    Data prep worker: downloads one ticker's history and fingerprints it.
+    """
+    data = download_data(stock_symbol)
+    close = np.asarray(data['Close'], dtype=np.float64).reshape(-1)
+    keep = np.isfinite(close)
+    dates = np.asarray(data.index.values)[keep]
+    close = close[keep]
+    return {
+        "ticker": stock_symbol,
+        "dates": dates,
+        "close": close,
+        "fingerprint": data_fingerprint(dates, close),
+    }
+
+class JobHistory:
+    """
+    Serves a prepared job's history to build_feature_pack in place of the price
+    store, so the worker trains on exactly the data that was fingerprinted.
+    """
+    def __init__(self, job):
+        self.job = job
+
+    def get(self, ticker, period=None):
+        return pd.DataFrame({'Close': self.job["close"]}, index=pd.DatetimeIndex(self.job["dates"]))
+
+def train_ticker(job, registry_dir, horizon=1, epochs=50, threads=None, export_lite=None,
+                 batch_size=32, shuffle_buffer=training_data.SHUFFLE_BUFFER, prefetch=training_data.PREFETCH,
+                 val_start=None, feature_dir=training_data.DEFAULT_FEATURE_DIR, rebuild_features=False):
+    """
+    Training worker: fits one ticker on windows streamed from its feature pack,
+    scaled on the training split only (as train_and_save_model does), and writes
+    a new artifact version.
+    """
+    if threads:
+        import tensorflow as tf
+        tf.config.threading.set_intra_op_parallelism_threads(threads)
+        tf.config.threading.set_inter_op_parallelism_threads(1)
+
+    ticker = job["ticker"]
+    pack = training_data.build_feature_pack([ticker], "close", root=feature_dir, store=JobHistory(job),
+                                            rebuild=rebuild_features, min_rows=MIN_ROWS)
+    data = training_data.TrainingData(pack, window=100, horizon=horizon, val_start=val_start)
+    scaler = data.scaler(ticker)
+    if scaler is None:
+        raise ValueError(f"no training windows before {val_start}")
+    train = data.train(batch_size=batch_size, shuffle_buffer=shuffle_buffer, prefetch=prefetch)
+    val = data.validation(batch_size=batch_size, prefetch=prefetch)
+    model, metrics, (pred, y_val) = fit_stream(train, val, horizon=horizon, epochs=epochs, verbose=0)
+
+    # Validation error in price units
+    error = (pred - y_val) * scaler.span
+    metrics["val_rmse"] = float(np.sqrt(np.mean(error ** 2)))
+    metrics["val_mae"] = float(np.mean(np.abs(error)))
+
+    dates = pd.DatetimeIndex(job["dates"])
+    meta = {
+        "window": 100,
+        "horizon": horizon,
+        "features": ["Close"],
+        "rows": int(len(dates)),
+        "data_start": str(dates[0].date()),
+        "data_end": str(dates[-1].date()),
+        "data_fingerprint": job["fingerprint"],
+        "metrics": metrics,
+    }
+    version = ModelStore(registry_dir).save(ticker, lambda path: save_model_files(model, path, export_lite),
+                                            scaler_params(scaler), meta)
+    return ticker, version, metrics
+
+def train_many(tickers, registry_dir=DEFAULT_REGISTRY_DIR, horizon=1, epochs=50,
+               prep_workers=4, train_workers=2, force=False, export_lite=None, **stream_options):
+    """
+    Downloads tickers in a process pool, then trains them on at most 'train_workers'
+    processes (see train_ticker for the stream options). Tickers whose data is
+    unchanged since their last artifact are skipped, so an interrupted run can
+    simply be started again.
+    """
+    store = ModelStore(registry_dir)
+    ctx = multiprocessing.get_context("spawn")  # TensorFlow is not fork-safe
+    
+    print(f"Preparing data for {len(tickers)} tickers...")
+    jobs = []
+    with ProcessPoolExecutor(max_workers=prep_workers, mp_context=ctx) as pool:
+        futures = {pool.submit(prepare_ticker, t): t for t in tickers}
+        for future in as_completed(futures):
+            ticker = futures[future]
+            try:
+                job = future.result()
+            except Exception as e:
+                print(f"[{ticker}] data prep failed: {e}")
+                continue
+            if len(job["close"]) < MIN_ROWS:
+                print(f"[{ticker}] not enough history ({len(job['close'])} rows), skipping")
+            elif not force and store.is_current(ticker, job["fingerprint"]):
+                print(f"[{ticker}] data unchanged since last artifact, skipping")
+            else:
+                jobs.append(job)
+    
+    results = {}
+    if not jobs:
+        return results
+    
+    threads = max(1, (os.cpu_count() or 1) // train_workers)
+    print(f"Training {len(jobs)} models on {train_workers} workers ({threads} threads each)...")
+    with ProcessPoolExecutor(max_workers=train_workers, mp_context=ctx) as pool:
+        futures = {
+            pool.submit(train_ticker, job, registry_dir, horizon, epochs, threads, export_lite,
+                        **stream_options): job["ticker"]
+            for job in jobs
+        }
+        for future in as_completed(futures):
+            ticker = futures[future]
+            try:
+                _, version, metrics = future.result()
+            except Exception as e:
+                print(f"[{ticker}] training failed: {e}")
+                continue
+            results[ticker] = version
+            print(f"[{ticker}] saved {version} (val RMSE {metrics['val_rmse']:.4f})")
+    return results
+
+def read_tickers(path):
+    with open(path) as f:
+        return [line.split('#')[0].strip().upper() for line in f if line.split('#')[0].strip()]
 
 if __name__ == "__main__":
-    train_and_save_model()
+    parser = argparse.ArgumentParser(description="Train the LSTM price model.")
+    parser.add_argument("--symbol", default="GOOG")
+    parser.add_argument("--horizon", type=int, default=1,
+                        help="Days predicted per pass (>1 trains a direct multi-horizon head)")
+    parser.add_argument("--output", default="Latest_stock_price_model.keras")
+    parser.add_argument("--tickers", nargs="+", help="Train one model per ticker into the model registry")
+    parser.add_argument("--tickers-file", help="File with one ticker per line")
+    parser.add_argument("--registry", default=DEFAULT_REGISTRY_DIR, help="Model registry directory")
+    parser.add_argument("--epochs", type=int, default=50)
+    parser.add_argument("--prep-workers", type=int, default=4)
+    parser.add_argument("--train-workers", type=int, default=2)
+    parser.add_argument("--force", action="store_true", help="Retrain even if data is unchanged")
+    parser.add_argument("--export-lite", choices=QUANTIZATIONS,
+                        help="Also export a TensorFlow-free .npz artifact with weights in this format")
+    parser.add_argument("--convert-only", action="store_true",
+                        help="Export the existing --output model with --export-lite instead of training")
+    parser.add_argument("--pooled", action="store_true",
+                        help="Train one model on all --tickers (to --output) instead of one per ticker")
+    parser.add_argument("--features", default="close",
+                        help=f"Feature set ({', '.join(training_data.FEATURE_SETS)}) or comma separated columns; "
+                             "the dashboard serves Close-only models")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--shuffle-buffer", type=int, default=training_data.SHUFFLE_BUFFER,
+                        help="Windows held for shuffling (bounds memory)")
+    parser.add_argument("--prefetch", type=int, default=training_data.PREFETCH,
+                        help="Batches prepared ahead of the model (0 = none)")
+    parser.add_argument("--val-start", help="Validate on targets from this date on (default: last 30%% of each ticker)")
+    parser.add_argument("--feature-cache", default=training_data.DEFAULT_FEATURE_DIR,
+                        help="Directory of precomputed feature packs")
+    parser.add_argument("--rebuild-features", action="store_true", help="Recompute the feature pack")
+    parser.add_argument("--benchmark-input", action="store_true",
+                        help="Only run the input pipeline for --epochs and report throughput and memory")
+    args = parser.parse_args()
+    
+    stream_options = dict(features=args.features, batch_size=args.batch_size, shuffle_buffer=args.shuffle_buffer,
+                          prefetch=args.prefetch, val_start=args.val_start, feature_dir=args.feature_cache,
+                          rebuild_features=args.rebuild_features)
+    
+    tickers = list(args.tickers or [])
+    if args.tickers_file:
+        tickers += read_tickers(args.tickers_file)
+    
+    if training_data.resolve_features(args.features) != ["Close"] and not args.benchmark_input:
+        # AIEngine feeds (N, 100, 1) Close windows, so richer models must not replace the dashboard's
+        if tickers and not args.pooled:
+            parser.error("--features needs a single --symbol or --pooled; per-ticker models use Close")
+        if args.output == parser.get_default("output"):
+            parser.error("models with extra features can't be served by the dashboard; pass --output")
+    
+    if args.convert_only:
+        convert_model(args.output, args.export_lite or "float32")
+    elif args.benchmark_input:
+        benchmark_input(tickers or [args.symbol], horizon=args.horizon, epochs=args.epochs, **stream_options)
+    elif tickers and args.pooled:
+        train_pooled([t.upper() for t in dict.fromkeys(tickers)], horizon=args.horizon, model_path=args.output,
+                     export_lite=args.export_lite, epochs=args.epochs, **stream_options)
+    elif tickers:
+        train_many([t.upper() for t in dict.fromkeys(tickers)], args.registry, horizon=args.horizon,
+                   epochs=args.epochs, prep_workers=args.prep_workers,
+                   train_workers=args.train_workers, force=args.force, export_lite=args.export_lite,
+                   **{k: v for k, v in stream_options.items() if k != "features"})
+    else:
+        train_and_save_model(args.symbol, horizon=args.horizon, model_path=args.output,
+                             export_lite=args.export_lite, epochs=args.epochs, **stream_options)
@@ -0,0 +1,75 @@
+import importlib
+import os
+import threading
+import types
+
+# Submodules that pull in heavy dependencies (plotly figures, the model runtime)
+# and are only needed once their tab or feature is used. `from utils import visuals`
+# hands out a placeholder that imports the real module on first attribute access.
+LAZY_SUBMODULES = ("ai_engine", "visuals", "screener", "backtest")
+
+
+class LazyModule(types.ModuleType):
+    """
+    Stand-in for a module that is imported on first attribute access (thread-safe).
+    """
+    def __init__(self, name):
+        super().__init__(name)
+        self.__dict__["_module"] = None
+        self.__dict__["_lock"] = threading.Lock()
+
+    def _load(self):
+        module = self.__dict__["_module"]
+        if module is None:
+            with self.__dict__["_lock"]:
+                module = self.__dict__["_module"]
+                if module is None:
+                    module = importlib.import_module(self.__name__)
+                    self.__dict__["_module"] = module
+        return module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __dir__(self):
+        return dir(self._load())
+
+
+def __getattr__(name):
+    if name in LAZY_SUBMODULES:
+        return LazyModule(f"{__name__}.{name}")
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+_preloaded = False
+_preload_lock = threading.Lock()
+
+
+def preload(model=True):
+    """
+    Imports everything the app can need up front, so the first user of a fresh
+    worker doesn't pay for it. Enabled in app.py with APP_PRELOAD=1; a no-op after
+    the first call.
+    """
+    global _preloaded
+    with _preload_lock:
+        if _preloaded:
+            return
+        importlib.import_module("yfinance")
+        import plotly.graph_objects as go
+        for name in LAZY_SUBMODULES:
+            importlib.import_module(f"{__name__}.{name}")
+
+        # plotly loads its trace validators the first time a figure is built
+        go.Figure(go.Candlestick())
+        if model:
+            ai_engine = importlib.import_module(f"{__name__}.ai_engine")
+            try:
+                ai_engine.get_registry().preload(ai_engine.AIEngine().artifact_path)
+            except Exception:
+                pass
+        _preloaded = True
+
+
+def preload_enabled():
+    return os.environ.get("APP_PRELOAD", "").lower() in ("1", "true", "yes")
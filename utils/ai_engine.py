@@ -1,59 +1,408 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
 import numpy as np
 import pandas as pd
-from keras.models import load_model
-from sklearn.preprocessing import MinMaxScaler
-import streamlit as st
+
+from utils import backtest, scaling
+from utils.cache import TTLCache
+from utils.lite_model import LiteModel, lite_path
+from utils.model_store import ModelStore
+from utils.singleflight import get_group
+from utils.telemetry import span, traced
+
+DEFAULT_MODEL_PATH = "Latest_stock_price_model.keras"
+
+# "auto" serves an exported '<model>.npz' (see train_model.py --export-lite) when
+# one sits next to the model, "keras" always loads the Keras file
+MODEL_BACKEND = os.environ.get("MODEL_BACKEND", "auto")
+
+
+def load_model(path):
+    """
+    Loads a Keras model, or an exported .npz through LiteModel (TensorFlow is
+    only imported for the former).
+    """
+    if path.endswith(".npz"):
+        return LiteModel.load(path)
+    from keras.models import load_model as load_keras_model
+    return load_keras_model(path)
+
+
+class ModelRegistry:
+    """
+    Process-wide cache of loaded models, shared by every Streamlit session.
+    Each model is loaded once, warmed with a dummy inference and evicted
+    (least recently used first) when max_models or memory_budget is exceeded.
+    """
+    def __init__(self, max_models=4, memory_budget=None, loader=None):
+        self.max_models = max_models
+        self.memory_budget = memory_budget  # bytes, None = no limit
+        self.loader = loader or load_model
+        self._models = OrderedDict()  # path -> (model, size_bytes)
+        self._lock = threading.Lock()
+        self._load_locks = {}
+        self.metrics = {
+            "hits": 0,
+            "misses": 0,
+            "evictions": 0,
+            "cold_load_seconds": {},
+            "warmup_seconds": {},
+            "last_warm_get_seconds": 0.0,
+        }
+
+    def get(self, path=DEFAULT_MODEL_PATH):
+        """
+        Returns the loaded model for 'path', loading and warming it on first use.
+        """
+        start = time.perf_counter()
+        with self._lock:
+            if path in self._models:
+                self._models.move_to_end(path)
+                self.metrics["hits"] += 1
+                model = self._models[path][0]
+                self.metrics["last_warm_get_seconds"] = time.perf_counter() - start
+                return model
+            load_lock = self._load_locks.setdefault(path, threading.Lock())
+
+        # Only one thread loads a given file, the others wait and reuse it
+        with load_lock:
+            with self._lock:
+                if path in self._models:
+                    self._models.move_to_end(path)
+                    self.metrics["hits"] += 1
+                    return self._models[path][0]
+
+            with span("model.load"):
+                model = self.loader(path)
+                loaded = time.perf_counter()
+                self._warm_up(model)
+                warmed = time.perf_counter()
+
+            with self._lock:
+                self.metrics["misses"] += 1
+                self.metrics["cold_load_seconds"][path] = warmed - start
+                self.metrics["warmup_seconds"][path] = warmed - loaded
+                self._models[path] = (model, self._estimate_size(model, path))
+                self._evict()
+            return model
+
+    def preload(self, *paths):
+        """
+        Loads and warms models ahead of the first request (e.g. at app startup).
+        """
+        for path in paths or (DEFAULT_MODEL_PATH,):
+            self.get(path)
+
+    def evict(self, path):
+        with self._lock:
+            self._models.pop(path, None)
+
+    def clear(self):
+        with self._lock:
+            self._models.clear()
+
+    def loaded(self):
+        with self._lock:
+            return list(self._models.keys())
+
+    def memory_usage(self):
+        with self._lock:
+            return sum(size for _, size in self._models.values())
+
+    def stats(self):
+        """
+        Snapshot of cache metrics: hits/misses/evictions, cold load and warm-up times per model.
+        """
+        with self._lock:
+            stats = dict(self.metrics)
+            stats["cold_load_seconds"] = dict(self.metrics["cold_load_seconds"])
+            stats["warmup_seconds"] = dict(self.metrics["warmup_seconds"])
+            stats["loaded"] = list(self._models.keys())
+            stats["memory_bytes"] = sum(size for _, size in self._models.values())
+            return stats
+
+    def _evict(self):
+        # Caller holds self._lock. The newest model is never evicted.
+        def over_budget():
+            if len(self._models) > self.max_models:
+                return True
+            if self.memory_budget is not None:
+                return sum(size for _, size in self._models.values()) > self.memory_budget
+            return False
+
+        while len(self._models) > 1 and over_budget():
+            self._models.popitem(last=False)
+            self.metrics["evictions"] += 1
+
+    @staticmethod
+    def _warm_up(model):
+        # Build the predict function once so concurrent sessions never race on it
+        shape = getattr(model, "input_shape", None) or (None, 100, 1)
+        shape = [1] + [dim if dim else default for dim, default in zip(shape[1:], (100, 1))]
+        model.predict(np.zeros(shape, dtype=np.float32), verbose=0)
+
+    @staticmethod
+    def _estimate_size(model, path):
+        try:
+            return int(model.count_params()) * 4
+        except Exception:
+            return os.path.getsize(path) if os.path.exists(path) else 0
+
+
+_registry = ModelRegistry()
+
+
+# Identical forecasts requested by concurrent sessions run the model once
+_inference = get_group("inference", clone=np.copy)
+
+# Finished forecasts and backtests in the base currency (USD), keyed by model file and
+# the input closes, so a rerun with the same data (e.g. a currency switch) skips the model
+_forecasts = TTLCache(ttl=15 * 60, max_entries=512, name="forecasts")
+
+
+def get_registry():
+    """
+    Returns the process-wide model registry.
+    """
+    return _registry
+
+
+def future_business_days(last_date, days):
+    """
+    The next 'days' business days after last_date (weekends skipped).
+    """
+    return pd.bdate_range(start=last_date + pd.offsets.BDay(1), periods=days)
+
 
 class AIEngine:
-    def __init__(self, model_path="Latest_stock_price_model.keras"):
+    WINDOW = 100
+
+    def __init__(self, model_path=DEFAULT_MODEL_PATH, registry=None, ticker=None, backend=None):
         self.model_path = model_path
+        self.registry = registry or get_registry()
+        self.ticker = ticker
+        self.backend = backend or MODEL_BACKEND
         self.model = None
-        self.scaler = MinMaxScaler(feature_range=(0, 1))
-        
+        self.scaler = None
+
+    @classmethod
+    def for_ticker(cls, ticker, store=None, registry=None):
+        """
+        Engine for the latest model trained on 'ticker' in the model store,
+        falling back to the shared default model.
+        """
+        path = (store or ModelStore()).model_path(ticker) if ticker else None
+        if not path or not (os.path.exists(path) or os.path.exists(lite_path(path))):
+            path = DEFAULT_MODEL_PATH
+        return cls(path, registry=registry, ticker=ticker)
+
+    @property
+    def artifact_path(self):
+        """
+        File actually served: the exported .npz or the Keras model, depending on backend.
+        """
+        lite = lite_path(self.model_path)
+        if self.backend != "keras" and os.path.exists(lite):
+            return lite
+        return self.model_path
+
+    def _artifact_key(self):
+        path = self.artifact_path
+        try:
+            return path, os.path.getmtime(path)
+        except OSError:
+            return path, None
+
     def load_ai_model(self):
         try:
-            self.model = load_model(self.model_path)
-            return True
-        except:
+            self.model = self.registry.get(self.artifact_path)
+        except Exception:
             return False
+        # Scaling fitted at training time, saved with the artifact (None for older models)
+        self.scaler = scaling.load_for_model(self.model_path)
+        return True
 
-    def predict_future(self, data, days=1):
+    @property
+    def horizon(self):
         """
-        Predicts the next 'days' closing prices.
+        Number of steps the model predicts per pass (1 unless trained with a direct multi-horizon head).
+        """
+        shape = getattr(self.model, "output_shape", None)
+        return int(shape[-1]) if shape and shape[-1] else 1
+
+    @traced("inference.predict")
+    def predict_future(self, data, days=1, method="auto"):
+        """
+        Predicts the next 'days' closing prices on business-day dates.
+        method="recursive" feeds each prediction back into the window one step at a time,
+        "direct" uses every output of a multi-horizon model per pass, "auto" picks direct
+        when the loaded model has a multi-horizon head.
         Requires at least 100 days of historical data.
         """
         if self.model is None:
             if not self.load_ai_model():
                 return None
-        
-        if len(data) < 100:
+
+        if len(data) < self.WINDOW:
             return None
-            
-        # Prepare data
-        input_data = data[['Close']].values
-        self.scaler.fit(input_data)
-        scaled_data = self.scaler.transform(input_data)
-        
-        # Get last 100 days
-        x_input = scaled_data[-100:].reshape(1, 100, 1)
-        
-        # Make prediction (Single step for now, can be looped for multi-step)
-        prediction = self.model.predict(x_input)
-        inv_prediction = self.scaler.inverse_transform(prediction)
-        
-        # Generate future date index
-        last_date = data.index[-1]
-        future_dates = pd.date_range(start=last_date, periods=days + 1)[1:]
-        
-        return pd.DataFrame({'Predicted Price': inv_prediction.flatten()}, index=future_dates)
-
-    def analyze_accuracy(self, data):
-        """
-        Runs a quick backtest on the last 30 days to see how well the model would have done.
-        """
-        # Simplified placeholder logic for backtest
-        if self.model is None or len(data) < 150:
+
+        # Prepare data: only the last 100 closes are scaled
+        close = data['Close'].to_numpy(dtype=np.float64)
+        window, low, price_span = self._scale_window(close, self.WINDOW, self._scaler_for(self.ticker))
+
+        # Roll the forecast forward from the last 100 days. The scaled window fully
+        # determines the output, so it keys the cache and the coalescing of identical requests.
+        key = (self._artifact_key(), window.tobytes(), days, method)
+        scaled_pred = _forecasts.get_or_load(
+            key, lambda: _inference.do(key, lambda: self._forecast(window[np.newaxis, :], days, method=method)))
+        predicted = scaled_pred[0] * price_span + low
+
+        future_dates = future_business_days(data.index[-1], days)
+        return pd.DataFrame({'Predicted Price': predicted}, index=future_dates)
+
+    @traced("inference.batch")
+    def predict_many(self, frames, batch_size=256, days=1, method="auto"):
+        """
+        Scores a whole watchlist in batched forward passes.
+        'frames' maps ticker -> DataFrame with a 'Close' column. Each series is scaled
+        with the model's saved scaling if it was fitted on that ticker, otherwise on
+        its own range. The last 100 days are stacked into one (N, 100, 1) tensor and run
+        through the model 'batch_size' windows at a time.
+        Returns one row per ticker with the price forecast 'days' business days ahead;
+        tickers with under 100 days of data are skipped.
+        """
+        if self.model is None:
+            if not self.load_ai_model():
+                return None
+
+        tickers, last_dates, last_close = [], [], []
+        windows, lows, spans = [], [], []
+        for ticker, df in frames.items():
+            if df is None or len(df) < self.WINDOW:
+                continue
+            close = df['Close'].to_numpy(dtype=np.float64)
+            window, low, price_span = self._scale_window(close, self.WINDOW, self._scaler_for(ticker))
+            if not np.isfinite(window).all():
+                continue
+            tickers.append(ticker)
+            last_dates.append(df.index[-1])
+            last_close.append(close[-1])
+            windows.append(window)
+            lows.append(low)
+            spans.append(price_span)
+
+        columns = ['Last Date', 'Last Close', 'Forecast Date', 'Predicted Price', 'Change %']
+        if not tickers:
+            return pd.DataFrame(columns=columns, index=pd.Index([], name='Ticker'))
+
+        scaled_pred = self._forecast(np.stack(windows), days, batch_size=batch_size, method=method)
+        predicted = scaled_pred[:, -1] * np.array(spans) + np.array(lows)
+        last_close = np.array(last_close)
+
+        return pd.DataFrame({
+            'Last Date': last_dates,
+            'Last Close': last_close,
+            'Forecast Date': [future_business_days(d, days)[-1] for d in last_dates],
+            'Predicted Price': predicted,
+            'Change %': (predicted - last_close) / last_close * 100,
+        }, index=pd.Index(tickers, name='Ticker'))
+
+    @traced("inference.model")
+    def _forecast(self, windows, days, batch_size=256, method="auto"):
+        """
+        Multi-step forecast for a batch of scaled (N, 100) windows, returns (N, days).
+        The windows are copied once into a preallocated (N, 100 + days) buffer; each
+        pass reads the latest 100 columns as a view and writes its predictions after them.
+        """
+        window = windows.shape[1]
+        step = self.horizon
+        if method == "recursive":
+            step = 1
+        elif method == "direct" and step == 1:
+            raise ValueError("Direct forecasting needs a model trained with horizon > 1")
+
+        buffer = np.empty((len(windows), window + days), dtype=np.float32)
+        buffer[:, :window] = windows
+        t = 0
+        while t < days:
+            out = self._predict_batches(buffer[:, t:t + window, np.newaxis], batch_size)
+            k = min(step, days - t)
+            buffer[:, window + t:window + t + k] = out[:, :k]
+            t += k
+        return buffer[:, window:]
+
+    def _predict_batches(self, x_input, batch_size=256):
+        # predict_on_batch skips the per-call dataset setup that model.predict does
+        outputs = [
+            np.asarray(self.model.predict_on_batch(x_input[i:i + batch_size]))
+            for i in range(0, len(x_input), batch_size)
+        ]
+        return np.concatenate(outputs, axis=0)
+
+    def history_scaling(self, close, ticker=None):
+        """
+        (low, span) arrays predict_future would have used after each bar: the saved
+        scaling if it applies to 'ticker', otherwise fitted on the closes up to and
+        including that bar.
+        """
+        scaler = self._scaler_for(ticker)
+        if scaler is not None:
+            return np.full(len(close), scaler.low), np.full(len(close), scaler.span)
+        low = np.minimum.accumulate(close)
+        high = np.maximum.accumulate(close)
+        return low, np.where(high > low, high - low, 1.0)
+
+    def _scaler_for(self, ticker):
+        # A model's saved scaling only fits the ticker it was trained on
+        if self.scaler is None:
+            return None
+        if self.scaler.ticker and (ticker or self.ticker or "").upper() != self.scaler.ticker.upper():
+            return None
+        return self.scaler
+
+    @staticmethod
+    def _scale_window(close, window=100, scaler=None):
+        """
+        Scaled copy of the last 'window' closes, plus the (low, span) to undo it.
+        Without saved scaling, falls back to min/max of the whole series (the old
+        per-request fit).
+        """
+        x = np.array(close[-window:], dtype=np.float64)
+        if scaler is not None:
+            return scaler.transform(x, out=x), scaler.low, scaler.span
+        low, high = close.min(), close.max()
+        price_span = high - low if high > low else 1.0
+        x -= low
+        x /= price_span
+        return x, low, price_span
+
+    @traced("inference.backtest")
+    def analyze_accuracy(self, data, days=30):
+        """
+        Walk-forward backtest over the last 'days' bars: each day is predicted from
+        the 100 days before it, as predict_future would have done at the time.
+        """
+        if self.model is None and not self.load_ai_model():
+            return {"accuracy": "N/A", "mse": 0}
+        if len(data) < self.WINDOW + days:
             return {"accuracy": "N/A", "mse": 0}
-            
-        # Implementation skipped for brevity, focused on forward prediction
-        return {"accuracy": "85% (Estimated)", "mse": 0.002}
+
+        close = data['Close'].to_numpy(dtype=np.float64)
+        key = ("accuracy", self._artifact_key(), self.ticker, days, len(close),
+               close[-(self.WINDOW + days):].tobytes())
+        return dict(_forecasts.get_or_load(key, lambda: self._accuracy(data, days)))
+
+    def _accuracy(self, data, days):
+        results = backtest.walk_forward(self, {self.ticker or "data": data}, last=days)
+        metrics = backtest.score(results).iloc[0]
+        return {
+            "accuracy": f"{metrics['Hit_Rate']:.0f}% directional",
+            "mse": float(metrics['MSE']),
+            "mae": float(metrics['MAE']),
+            "rmse": float(metrics['RMSE']),
+            "mape": float(metrics['MAPE']),
+            "windows": int(metrics['Windows']),
+        }
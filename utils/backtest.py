@@ -0,0 +1,128 @@
+import numpy as np
+import pandas as pd
+
+from utils.indicators import signal_history
+from utils.telemetry import traced
+from utils.windows import WindowDataset
+
+WINDOW = 100
+
+
+@traced("backtest.walk_forward")
+def walk_forward(engine, frames, batch_size=1024, last=None):
+    """
+    Replays the model over history: every 100-day window of every ticker predicts
+    the close that followed it. Windows from all tickers are scored together in
+    chunks of 'batch_size'. Each window is scaled the way predict_future would have
+    scaled it on that day (only data up to the window's end), so nothing leaks.
+    'last' limits each ticker to its most recent N windows.
+    Returns one row per window: Ticker, Date, Prev Close, Actual, Predicted.
+    """
+    if engine.model is None and not engine.load_ai_model():
+        return None
+
+    tickers, closes, dates, lows, spans = [], [], [], [], []
+    for ticker, df in frames.items():
+        if df is None or len(df) <= WINDOW:
+            continue
+        close = df['Close'].to_numpy(dtype=np.float64)
+        if not np.isfinite(close).all():
+            continue
+        low, span = engine.history_scaling(close, ticker)
+        tickers.append(ticker)
+        closes.append(close)
+        dates.append(df.index.to_numpy())
+        lows.append(low)
+        spans.append(span)
+
+    columns = ['Ticker', 'Date', 'Prev Close', 'Actual', 'Predicted']
+    if not tickers:
+        return pd.DataFrame(columns=columns)
+
+    dataset = WindowDataset(closes, window=WINDOW, horizon=1, dtype=np.float64)
+    lows, spans, dates = np.concatenate(lows), np.concatenate(spans), np.concatenate(dates)
+
+    indices = np.arange(len(dataset))
+    if last is not None:
+        # Position of each window counted from the end of its ticker
+        counts = np.bincount(dataset.ticker_ids, minlength=len(tickers))
+        first = np.concatenate([[0], np.cumsum(counts)[:-1]])
+        from_end = counts[dataset.ticker_ids] - (indices - first[dataset.ticker_ids])
+        indices = indices[from_end <= last]
+
+    ends = dataset.starts[indices] + WINDOW - 1  # last bar of each window in the packed data
+    predicted = np.empty(len(indices))
+    for i in range(0, len(indices), batch_size):
+        chunk = indices[i:i + batch_size]
+        x, _ = dataset.gather(chunk)
+        low = lows[ends[i:i + batch_size]][:, np.newaxis]
+        span = spans[ends[i:i + batch_size]][:, np.newaxis]
+        x_input = ((x[:, :, 0] - low) / span)[:, :, np.newaxis].astype(np.float32)
+        out = engine._predict_batches(x_input, batch_size)[:, 0]
+        predicted[i:i + batch_size] = out * span[:, 0] + low[:, 0]
+
+    return pd.DataFrame({
+        'Ticker': np.array(tickers, dtype=object)[dataset.ticker_ids[indices]],
+        'Date': dates[ends + 1],
+        'Prev Close': dataset.data[ends, 0],
+        'Actual': dataset.data[ends + 1, 0],
+        'Predicted': predicted,
+    }, columns=columns)
+
+
+def score(results, by='Ticker', period=None):
+    """
+    MAE, RMSE, MAPE and directional hit rate of walk_forward results,
+    per ticker and optionally per calendar period ('Y', 'Q', 'M').
+    """
+    err = results['Predicted'] - results['Actual']
+    moved = np.sign(results['Actual'] - results['Prev Close'])
+    called = np.sign(results['Predicted'] - results['Prev Close'])
+    frame = pd.DataFrame({
+        'abs_err': err.abs(),
+        'sq_err': err ** 2,
+        'ape': (err / results['Actual']).abs() * 100,
+        'hit': (moved == called) * 100.0,
+    })
+
+    keys = [results[by]] if by else []
+    if period:
+        dates = pd.DatetimeIndex(results['Date'])
+        if dates.tz is not None:
+            dates = dates.tz_localize(None)
+        keys.append(pd.Series(dates.to_period(period).astype(str), index=results.index, name='Period'))
+    if not keys:
+        keys = [np.zeros(len(frame), dtype=int)]
+
+    grouped = frame.groupby(keys)
+    out = grouped.agg(Windows=('abs_err', 'size'), MAE=('abs_err', 'mean'),
+                      MSE=('sq_err', 'mean'), MAPE=('ape', 'mean'), Hit_Rate=('hit', 'mean'))
+    out['RMSE'] = np.sqrt(out['MSE'])
+    return out[['Windows', 'MAE', 'RMSE', 'MSE', 'MAPE', 'Hit_Rate']]
+
+
+def strategy_backtest(df, periods_per_year=252):
+    """
+    Trades the check_signals rules over history: go long on a bullish MACD crossover
+    or oversold RSI, go flat on a bearish crossover or overbought RSI. Positions are
+    taken on the next bar. df needs the add_technical_indicators columns.
+    """
+    signals = signal_history(df)
+    entry = (signals['MACD_Cross'] == 'Bullish Crossover') | signals['RSI_Status'].str.startswith('Oversold')
+    leave = (signals['MACD_Cross'] == 'Bearish Crossover') | signals['RSI_Status'].str.startswith('Overbought')
+    position = pd.Series(np.select([leave, entry], [0.0, 1.0], np.nan), index=df.index).ffill().fillna(0.0)
+
+    market = df['Close'].pct_change().fillna(0.0)
+    returns = position.shift(1).fillna(0.0) * market
+    equity = (1 + returns).cumprod()
+    drawdown = equity / equity.cummax() - 1
+
+    std = returns.std()
+    return {
+        'Total Return %': float(equity.iloc[-1] - 1) * 100,
+        'Buy & Hold %': float((1 + market).prod() - 1) * 100,
+        'Sharpe': float(returns.mean() / std * np.sqrt(periods_per_year)) if std > 0 else 0.0,
+        'Max Drawdown %': float(drawdown.min()) * 100,
+        'Trades': int((position.diff() > 0).sum()),
+        'Exposure %': float(position.mean()) * 100,
+    }
@@ -0,0 +1,196 @@
+import functools
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+# Background refreshes for stale entries
+_refresh_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="cache-refresh")
+
+# Every named cache (tiers and module-level ones like figures), for cache_stats()
+_named_caches = weakref.WeakValueDictionary()
+
+
+class TTLCache:
+    """
+    Thread-safe LRU cache with a time-to-live and stale-while-revalidate.
+    Within 'ttl' seconds an entry is served as is. For 'stale_ttl' seconds after
+    that it is still served immediately while a background refresh runs; older
+    entries are reloaded synchronously. 'ttl' may be a callable returning seconds
+    (e.g. shorter during market hours). Results rejected by 'cache_if' (failed
+    fetches returning empty values) are returned but not stored.
+    Works the same inside Streamlit and in batch jobs.
+    """
+    def __init__(self, ttl, stale_ttl=0, max_entries=256, cache_if=None, name=None):
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.max_entries = max_entries
+        self.cache_if = cache_if
+        self.name = name
+        self._data = OrderedDict()  # key -> (value, stored_at)
+        self._refreshing = set()
+        self._lock = threading.Lock()
+        self._counters = {
+            "hits": 0, "stale_hits": 0, "misses": 0, "refreshes": 0,
+            "evictions": 0, "errors": 0, "load_seconds": 0.0, "max_load_seconds": 0.0,
+        }
+        if name:
+            _named_caches[name] = self
+
+    def get_or_load(self, key, loader):
+        """
+        Cached value for 'key', calling loader() on a miss.
+        """
+        now = time.monotonic()
+        ttl = self.ttl() if callable(self.ttl) else self.ttl
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                value, stored_at = entry
+                age = now - stored_at
+                if age <= ttl:
+                    self._data.move_to_end(key)
+                    self._counters["hits"] += 1
+                    return value
+                if age <= ttl + self.stale_ttl:
+                    self._data.move_to_end(key)
+                    self._counters["stale_hits"] += 1
+                    if key not in self._refreshing:
+                        self._refreshing.add(key)
+                        _refresh_pool.submit(self._refresh, key, loader)
+                    return value
+            self._counters["misses"] += 1
+        return self._load(key, loader)
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            return default if entry is None else entry[0]
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (value, time.monotonic())
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self._counters["evictions"] += 1
+
+    def invalidate(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._data)
+
+    def stats(self):
+        """
+        Hit/miss/stale counters, hit rate and load latency.
+        """
+        with self._lock:
+            stats = dict(self._counters, size=len(self._data), name=self.name)
+        loads = stats["misses"] + stats["refreshes"]
+        lookups = stats["hits"] + stats["stale_hits"] + stats["misses"]
+        stats["hit_rate"] = (stats["hits"] + stats["stale_hits"]) / lookups if lookups else 0.0
+        stats["avg_load_seconds"] = stats["load_seconds"] / loads if loads else 0.0
+        return stats
+
+    def _load(self, key, loader):
+        start = time.perf_counter()
+        try:
+            value = loader()
+        except Exception:
+            with self._lock:
+                self._counters["errors"] += 1
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self._counters["load_seconds"] += elapsed
+                self._counters["max_load_seconds"] = max(self._counters["max_load_seconds"], elapsed)
+        if self.cache_if is None or self.cache_if(value):
+            self.set(key, value)
+        return value
+
+    def _refresh(self, key, loader):
+        try:
+            self._load(key, loader)
+            with self._lock:
+                self._counters["refreshes"] += 1
+        except Exception:
+            pass
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+
+def us_market_open(now=None):
+    """
+    Rough check for regular US trading hours (Mon-Fri 9:30-16:00 New York time, holidays ignored).
+    """
+    local = (now or pd.Timestamp.now(tz="UTC")).tz_convert("America/New_York")
+    if local.weekday() >= 5:
+        return False
+    minutes = local.hour * 60 + local.minute
+    return 9 * 60 + 30 <= minutes < 16 * 60
+
+
+def _options_ttl():
+    return 5 if us_market_open() else 15 * 60
+
+
+# One cache per data type, sized for a desk's worth of tickers
+CACHE_TIERS = {
+    "fundamentals": TTLCache(ttl=24 * 3600, stale_ttl=6 * 3600, max_entries=1024,
+                             cache_if=bool, name="fundamentals"),
+    # get_exchange_rate falls back to 1.0 when the lookup fails, so never cache that
+    "fx": TTLCache(ttl=60, stale_ttl=10 * 60, max_entries=64,
+                   cache_if=lambda rate: rate is not None and rate != 1.0, name="fx"),
+    # Listed expiry dates change at most daily
+    "option_expiries": TTLCache(ttl=3600, stale_ttl=10 * 60, max_entries=256, cache_if=bool,
+                                name="option_expiries"),
+    "options": TTLCache(ttl=_options_ttl, stale_ttl=30, max_entries=256,
+                        cache_if=lambda result: bool(result and result[1]), name="options"),
+    # Whole multi-expiry chains (utils.options), same freshness as single expiries
+    "option_surface": TTLCache(ttl=_options_ttl, stale_ttl=30, max_entries=64,
+                               cache_if=lambda surface: surface is not None, name="option_surface"),
+}
+
+
+def get_cache(tier):
+    return CACHE_TIERS[tier]
+
+
+def cached(tier):
+    """
+    Decorator caching a function's results in one of the CACHE_TIERS.
+    The undecorated function stays available as fn.uncached.
+    """
+    def decorator(fn):
+        cache = CACHE_TIERS[tier]
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            key = (fn.__name__, args, tuple(sorted(kwargs.items())))
+            return cache.get_or_load(key, lambda: fn(*args, **kwargs))
+
+        wrapper.cache = cache
+        wrapper.uncached = fn
+        return wrapper
+    return decorator
+
+
+def cache_stats():
+    """
+    Stats of every named cache: the tiers plus module caches (figures, forecasts, ...).
+    """
+    caches = dict(_named_caches)
+    caches.update(CACHE_TIERS)
+    return {name: cache.stats() for name, cache in sorted(caches.items())}
@@ -0,0 +1,368 @@
+import json
+import math
+import os
+import threading
+from collections import OrderedDict, deque
+
+import numpy as np
+import pandas as pd
+
+from utils.indicators import INDICATOR_COLUMNS, add_technical_indicators
+from utils.price_store import DEFAULT_STORE_DIR, store_path
+from utils.telemetry import traced
+
+
+def _ewm_step(previous, value, alpha):
+    # Same arithmetic as pandas ewm(adjust=False) so results match the batch path exactly
+    if previous is None:
+        return value
+    if previous == value:
+        return previous
+    old_wt = 1.0 - alpha
+    return (old_wt * previous + alpha * value) / (old_wt + alpha)
+
+
+class IndicatorState:
+    """
+    Running state for every indicator of one price series.
+    update() consumes one close in O(1): moving sums for the SMAs/Bollinger bands,
+    gain/loss sums for RSI and the last value of each EMA.
+    """
+    SMA_WINDOWS = (20, 50, 200)
+    BB_WINDOW = 20
+    RSI_WINDOW = 14
+    # Moving sums are recomputed exactly this often to stop floating point drift
+    RESYNC_EVERY = 1000
+
+    def __init__(self):
+        self.count = 0
+        self.last_ts = None
+        self.prev_close = None
+        self.closes = deque(maxlen=max(self.SMA_WINDOWS))
+        self.gains = deque(maxlen=self.RSI_WINDOW)
+        self.losses = deque(maxlen=self.RSI_WINDOW)
+        self.ema_12 = None
+        self.ema_26 = None
+        self.signal = None
+        self._resync()
+
+    def update(self, close, ts=None):
+        """
+        Adds one bar and returns the indicator values for it.
+        """
+        x = float(close)
+        if self.count == 0:
+            self.ref = x
+
+        # Moving sums (kept relative to 'ref' to limit cancellation in the variance)
+        for w in self.SMA_WINDOWS:
+            if len(self.closes) >= w:
+                self.sums[w] -= self.closes[-w] - self.ref
+        if len(self.closes) >= self.BB_WINDOW:
+            self.sumsq -= (self.closes[-self.BB_WINDOW] - self.ref) ** 2
+        self.closes.append(x)
+        for w in self.SMA_WINDOWS:
+            self.sums[w] += x - self.ref
+        self.sumsq += (x - self.ref) ** 2
+
+        # RSI gains/losses (the first bar counts as zero change, as in the batch path)
+        delta = x - self.prev_close if self.prev_close is not None else 0.0
+        gain, loss = max(delta, 0.0), max(-delta, 0.0)
+        if len(self.gains) == self.RSI_WINDOW:
+            self.gain_sum -= self.gains[0]
+            self.loss_sum -= self.losses[0]
+            self.gain_nonzero -= self.gains[0] > 0
+            self.loss_nonzero -= self.losses[0] > 0
+        self.gains.append(gain)
+        self.losses.append(loss)
+        self.gain_sum += gain
+        self.loss_sum += loss
+        self.gain_nonzero += gain > 0
+        self.loss_nonzero += loss > 0
+
+        # EMAs and MACD
+        self.ema_12 = _ewm_step(self.ema_12, x, 2 / 13)
+        self.ema_26 = _ewm_step(self.ema_26, x, 2 / 27)
+        self.signal = _ewm_step(self.signal, self.ema_12 - self.ema_26, 2 / 10)
+
+        self.prev_close = x
+        self.last_ts = ts
+        self.count += 1
+        self._since_resync += 1
+        if self._since_resync >= self.RESYNC_EVERY:
+            self._resync()
+        return self.values()
+
+    def values(self):
+        """
+        Indicator values for the latest bar (NaN until enough bars are seen).
+        """
+        out = dict.fromkeys(INDICATOR_COLUMNS, np.nan)
+        if self.count == 0:
+            return out
+        n = self.count
+        for w in self.SMA_WINDOWS:
+            if n >= w:
+                out[f'SMA_{w}'] = self.sums[w] / w + self.ref
+
+        out['EMA_12'] = self.ema_12
+        out['EMA_26'] = self.ema_26
+        out['MACD'] = self.ema_12 - self.ema_26
+        out['Signal_Line'] = self.signal
+
+        if n >= self.RSI_WINDOW:
+            gain = self.gain_sum / self.RSI_WINDOW if self.gain_nonzero else 0.0
+            loss = self.loss_sum / self.RSI_WINDOW if self.loss_nonzero else 0.0
+            with np.errstate(divide='ignore', invalid='ignore'):
+                rs = np.float64(gain) / np.float64(loss)
+                out['RSI'] = float(100 - (100 / (1 + rs)))
+
+        if n >= self.BB_WINDOW:
+            w = self.BB_WINDOW
+            mean = out['SMA_20']
+            var = max((self.sumsq - self.sums[w] ** 2 / w) / (w - 1), 0.0)
+            std = math.sqrt(var)
+            out['BB_Middle'] = mean
+            out['BB_Std'] = std
+            out['BB_Upper'] = mean + 2 * std
+            out['BB_Lower'] = mean - 2 * std
+        return out
+
+    def copy(self):
+        return IndicatorState.from_dict(self.to_dict())
+
+    def _resync(self):
+        closes = list(self.closes)
+        self.ref = closes[-1] if closes else 0.0
+        self.sums = {w: math.fsum(c - self.ref for c in closes[-w:]) for w in self.SMA_WINDOWS}
+        self.sumsq = math.fsum((c - self.ref) ** 2 for c in closes[-self.BB_WINDOW:])
+        self.gain_sum = math.fsum(self.gains)
+        self.loss_sum = math.fsum(self.losses)
+        self.gain_nonzero = sum(g > 0 for g in self.gains)
+        self.loss_nonzero = sum(l > 0 for l in self.losses)
+        self._since_resync = 0
+
+    @classmethod
+    def from_history(cls, close, indicators, last_ts=None):
+        """
+        Seeds a state from a close series and its batch-computed indicators,
+        without replaying every bar.
+        """
+        state = cls()
+        close = np.asarray(close, dtype=np.float64)
+        if len(close) == 0:
+            return state
+        state.count = len(close)
+        state.closes.extend(close[-state.closes.maxlen:].tolist())
+        delta = np.diff(close[-(cls.RSI_WINDOW + 1):])
+        if len(close) <= cls.RSI_WINDOW:
+            delta = np.concatenate([[0.0], delta])
+        state.gains.extend(np.maximum(delta, 0.0).tolist())
+        state.losses.extend(np.maximum(-delta, 0.0).tolist())
+        last = indicators.iloc[-1]
+        state.ema_12 = float(last['EMA_12'])
+        state.ema_26 = float(last['EMA_26'])
+        state.signal = float(last['Signal_Line'])
+        state.prev_close = float(close[-1])
+        state.last_ts = last_ts
+        state._resync()
+        return state
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "last_ts": None if self.last_ts is None else pd.Timestamp(self.last_ts).isoformat(),
+            "prev_close": self.prev_close,
+            "closes": list(self.closes),
+            "gains": list(self.gains),
+            "losses": list(self.losses),
+            "ema_12": self.ema_12,
+            "ema_26": self.ema_26,
+            "signal": self.signal,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        state = cls()
+        state.count = data["count"]
+        state.last_ts = pd.Timestamp(data["last_ts"]) if data.get("last_ts") else None
+        state.prev_close = data["prev_close"]
+        state.closes.extend(data["closes"])
+        state.gains.extend(data["gains"])
+        state.losses.extend(data["losses"])
+        state.ema_12 = data["ema_12"]
+        state.ema_26 = data["ema_26"]
+        state.signal = data["signal"]
+        state._resync()
+        return state
+
+
+class IndicatorEngine:
+    """
+    Keeps an IndicatorState per ticker/interval, persisted next to the cached
+    price history, so each rerun only pays for the bars added since last time.
+    The latest bar is treated as still forming: it is evaluated on a copy of the
+    state and only committed once a newer bar arrives.
+    Falls back to add_technical_indicators (the reference batch path) whenever the
+    stored state doesn't line up with the given history. Output matches the batch
+    path on the same df, whether or not the stored history starts earlier.
+    """
+    STATE_FILE = "indicator_state.json"
+    VALUES_FILE = "indicators.npy"
+    # Rows after which values no longer depend on bars before the first one:
+    # SMA_200's window, and EMA_26's weight on older bars ((25/27)^600 ~ 1e-20)
+    WARMUP_ROWS = 600
+
+    def __init__(self, root=DEFAULT_STORE_DIR, max_cached=64, persist=True):
+        self.root = root
+        self.max_cached = max_cached
+        self.persist = persist
+        self._cache = OrderedDict()  # (ticker, interval) -> (state, committed indicator frame)
+        self._lock = threading.Lock()
+        self._locks = {}
+
+    def update(self, ticker, df, interval="1d"):
+        """
+        Returns a copy of df with the indicator columns added.
+        """
+        if df.empty or df['Close'].isna().any():
+            return add_technical_indicators(df)
+        key = (ticker.upper(), interval)
+        with self._key_lock(key):
+            cached = self._get_cached(key)
+            close = df['Close']
+            overlap = self._overlap(cached, df) if cached is not None else None
+            if overlap is not None:
+                state, frame = cached
+                pos = overlap - 1
+                new_rows = []
+                for ts, value in close.iloc[pos + 1:-1].items():
+                    new_rows.append(state.update(value, ts))
+                if new_rows:
+                    appended = pd.DataFrame(new_rows, index=df.index[pos + 1:-1], columns=INDICATOR_COLUMNS)
+                    frame = pd.concat([frame, appended])
+                    self._store(key, state, frame, save=True)
+                # The stored frame may start before df (a period-limited view moves forward
+                # every day). Its first rows were then warmed on older bars, so they are
+                # recomputed from df alone, like the batch path would
+                if len(frame) > len(df) - 1:
+                    frame = frame.iloc[len(frame) - (len(df) - 1):]
+                    if len(df) <= self.WARMUP_ROWS:
+                        return add_technical_indicators(df)
+                    head = add_technical_indicators(df.iloc[:self.WARMUP_ROWS])[INDICATOR_COLUMNS]
+                    frame = pd.concat([head, frame.iloc[self.WARMUP_ROWS:]])
+            else:
+                frame = add_technical_indicators(df)[INDICATOR_COLUMNS].iloc[:-1]
+                state = IndicatorState.from_history(close.iloc[:-1].to_numpy(), frame,
+                                                    last_ts=df.index[-2] if len(df) > 1 else None)
+                self._store(key, state, frame, save=True)
+
+            # Forming bar, evaluated without committing it
+            last = state.copy().update(close.iloc[-1], df.index[-1])
+
+        out = df.copy()
+        values = np.vstack([frame.to_numpy(), [[last[c] for c in INDICATOR_COLUMNS]]])
+        for i, column in enumerate(INDICATOR_COLUMNS):
+            out[column] = values[:, i]
+        return out
+
+    def reset(self, ticker, interval="1d"):
+        key = (ticker.upper(), interval)
+        with self._lock:
+            self._cache.pop(key, None)
+        folder = store_path(self.root, *key)
+        for name in (self.STATE_FILE, self.VALUES_FILE):
+            path = os.path.join(folder, name)
+            if os.path.exists(path):
+                os.remove(path)
+
+    @staticmethod
+    def _overlap(cached, df):
+        """
+        Number of df rows already covered by the cached frame, or None when the
+        two don't line up. The cached frame may start earlier than df; only the
+        overlapping suffix has to match.
+        """
+        state, frame = cached
+        if state.last_ts is None or len(frame) == 0 or state.last_ts not in df.index:
+            return None
+        pos = df.index.get_loc(state.last_ts)
+        if not isinstance(pos, int) or pos >= len(df) - 1 or pos >= len(frame):
+            return None
+        if not frame.index[len(frame) - pos - 1:].equals(df.index[:pos + 1]):
+            return None
+        # Re-adjusted history (splits/dividends) changes past closes
+        if not np.isclose(df['Close'].iloc[pos], state.prev_close, rtol=1e-9, atol=0):
+            return None
+        return pos + 1
+
+    def _get_cached(self, key):
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                return self._cache[key]
+        loaded = self._load(key) if self.persist else None
+        if loaded is not None:
+            self._store(key, *loaded, save=False)
+        return loaded
+
+    def _store(self, key, state, frame, save):
+        with self._lock:
+            self._cache[key] = (state, frame)
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.max_cached:
+                self._cache.popitem(last=False)
+        if save and self.persist:
+            self._save(key, state, frame)
+
+    def _load(self, key):
+        folder = store_path(self.root, *key)
+        try:
+            with open(os.path.join(folder, self.STATE_FILE)) as f:
+                data = json.load(f)
+            values = np.load(os.path.join(folder, self.VALUES_FILE))
+        except (OSError, ValueError):
+            return None
+        index = pd.DatetimeIndex(values["ts"], name=data.get("index_name"))
+        if data.get("tz"):
+            index = index.tz_localize("UTC").tz_convert(data["tz"])
+        frame = pd.DataFrame({c: values[c] for c in INDICATOR_COLUMNS}, index=index)
+        state = IndicatorState.from_dict(data["state"])
+        if state.last_ts is not None and index.tz is not None:
+            state.last_ts = state.last_ts.tz_convert(index.tz)
+        return state, frame
+
+    def _save(self, key, state, frame):
+        folder = store_path(self.root, *key)
+        os.makedirs(folder, exist_ok=True)
+        index = frame.index
+        tz = str(index.tz) if index.tz is not None else None
+        if tz:
+            index = index.tz_convert("UTC").tz_localize(None)
+        values = np.empty(len(frame), dtype=[("ts", "<M8[ns]")] + [(c, "<f8") for c in INDICATOR_COLUMNS])
+        values["ts"] = index.values.astype("datetime64[ns]")
+        for c in INDICATOR_COLUMNS:
+            values[c] = frame[c].to_numpy(dtype=np.float64)
+
+        tmp = os.path.join(folder, f"indicators.{os.getpid()}.{threading.get_ident()}.tmp.npy")
+        np.save(tmp, values)
+        os.replace(tmp, os.path.join(folder, self.VALUES_FILE))
+        tmp = os.path.join(folder, f"indicator_state.{os.getpid()}.{threading.get_ident()}.tmp")
+        with open(tmp, "w") as f:
+            json.dump({"state": state.to_dict(), "tz": tz, "index_name": frame.index.name}, f)
+        os.replace(tmp, os.path.join(folder, self.STATE_FILE))
+
+    def _key_lock(self, key):
+        with self._lock:
+            return self._locks.setdefault(key, threading.Lock())
+
+
+engine = IndicatorEngine()
+
+
+@traced("indicators.update")
+def update_indicators(ticker, df, interval="1d"):
+    """
+    Incremental equivalent of indicators.add_technical_indicators for a ticker's history.
+    """
+    return engine.update(ticker, df, interval)
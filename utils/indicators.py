@@ -1,9 +1,38 @@
 import pandas as pd
 import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
 
-def add_technical_indicators(df):
+from utils.telemetry import traced
+
+# Columns added by add_technical_indicators, in order
+INDICATOR_COLUMNS = [
+    'SMA_20', 'SMA_50', 'SMA_200', 'EMA_12', 'EMA_26', 'RSI',
+    'MACD', 'Signal_Line', 'BB_Middle', 'BB_Std', 'BB_Upper', 'BB_Lower',
+]
+
+@traced("indicators.compute")
+def add_technical_indicators(df, dtype=None):
     """
     Adds SMA, EMA, RSI, MACD, and Bollinger Bands to the DataFrame.
+    Uses the fused NumPy kernel; pass dtype=np.float32 for compact columns.
+    """
+    if df.empty:
+        return df
+    
+    # The kernel's running sums need gap-free closes
+    if df['Close'].isna().any():
+        df = add_technical_indicators_pandas(df)
+        if dtype is not None:
+            df[INDICATOR_COLUMNS] = df[INDICATOR_COLUMNS].astype(dtype)
+        return df
+    
+    df = df.copy()
+    compute_indicators(df['Close'].to_numpy(dtype=np.float64), dtype=dtype or np.float64, out=df)
+    return df
+
+def add_technical_indicators_pandas(df):
+    """
+    Reference pandas implementation of add_technical_indicators.
     """
     if df.empty:
         return df
@@ -38,6 +67,127 @@ def add_technical_indicators(df):
     
     return df
 
+def _rolling_mean(csum, window):
+    # Trailing mean from a cumulative sum with a leading zero column; NaN until 'window' values
+    out = np.full(csum[..., 1:].shape, np.nan)
+    if csum.shape[-1] > window:
+        out[..., window - 1:] = (csum[..., window:] - csum[..., :-window]) / window
+    return out
+
+def _ewm(x, span, block=None):
+    """
+    ewm(span, adjust=False).mean() along the last axis, vectorised over rows.
+    Within a block y[s+k] = d^k * (y[s] + a * sum_j d^-j x[s+j]), so each block is
+    a cumsum; blocks are kept short enough that d^-k can't overflow.
+    """
+    alpha = 2.0 / (span + 1)
+    decay = 1.0 - alpha
+    if block is None:
+        block = max(1, int(50 / -np.log(decay)))
+    out = np.empty_like(x)
+    out[..., 0] = x[..., 0]
+    carry = x[..., :1]
+    t = 1
+    while t < x.shape[-1]:
+        k = np.arange(1, min(block, x.shape[-1] - t) + 1)
+        chunk = x[..., t:t + len(k)]
+        acc = np.cumsum(chunk * decay ** -k, axis=-1)
+        out[..., t:t + len(k)] = decay ** k * (carry + alpha * acc)
+        carry = out[..., t + len(k) - 1:t + len(k)]
+        t += len(k)
+    return out
+
+def _snap_zero(values, scale, ulps=16):
+    # Zeroes values that are only rounding error relative to 'scale'
+    values[np.abs(values) <= ulps * np.finfo(np.float64).eps * np.abs(scale)] = 0.0
+    return values
+
+def _rolling_std(x, window, max_elements=1 << 23):
+    # Sample std (ddof=1) over sliding views, processed in row chunks to bound memory
+    out = np.full(x.shape, np.nan)
+    if x.shape[-1] < window:
+        return out
+    rows = x.reshape(-1, x.shape[-1])
+    flat_out = out.reshape(-1, x.shape[-1])
+    step = max(1, max_elements // (x.shape[-1] * window))
+    for i in range(0, len(rows), step):
+        views = sliding_window_view(rows[i:i + step], window, axis=-1)
+        flat_out[i:i + step, window - 1:] = views.std(axis=-1, ddof=1)
+    return out
+
+def compute_indicators(close, dtype=np.float64, out=None):
+    """
+    Fused NumPy kernel for every column in INDICATOR_COLUMNS.
+    close: (T,) array or (tickers, T) array. All rolling means come from one shared
+    cumulative sum, and SMA_20 doubles as BB_Middle. Work is done in float64; the
+    results are cast to 'dtype'.
+    Returns a dict of arrays (struct-of-arrays) shaped like 'close', or writes the
+    columns into 'out' (a DataFrame or a dict of preallocated arrays) and returns it.
+    """
+    x = np.asarray(close, dtype=np.float64)
+    if x.shape[-1] == 0:
+        result = {c: np.empty(x.shape, dtype=dtype) for c in INDICATOR_COLUMNS}
+        return _write(result, out)
+
+    zero = np.zeros(x.shape[:-1] + (1,))
+
+    # Shared cumulative sum of closes, shifted by the first close to keep it small
+    ref = x[..., :1]
+    csum = np.concatenate([zero, np.cumsum(x - ref, axis=-1)], axis=-1)
+    sma_20 = _rolling_mean(csum, 20) + ref
+    sma_50 = _rolling_mean(csum, 50) + ref
+    sma_200 = _rolling_mean(csum, 200) + ref
+    del csum
+
+    # EMAs of closes relative to the first one: a flat series gives exactly zero MACD,
+    # as in pandas. What's left within a few ulps of the price is rounding, and is
+    # zeroed so crossover sign tests don't fire on it
+    ema_12 = _ewm(x - ref, 12)
+    ema_26 = _ewm(x - ref, 26)
+    macd = _snap_zero(ema_12 - ema_26, x)
+    signal = _snap_zero(_ewm(macd, 9), x)
+    ema_12 += ref
+    ema_26 += ref
+
+    # RSI: the first bar counts as zero change, like delta.where(delta > 0, 0)
+    delta = np.diff(x, axis=-1, prepend=x[..., :1])
+    gain = _rolling_mean(np.concatenate([zero, np.cumsum(np.maximum(delta, 0.0), axis=-1)], axis=-1), 14)
+    loss = _rolling_mean(np.concatenate([zero, np.cumsum(np.maximum(-delta, 0.0), axis=-1)], axis=-1), 14)
+    del delta
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rsi = 100 - (100 / (1 + gain / loss))
+    del gain, loss
+
+    bb_std = _rolling_std(x, 20)
+
+    result = {
+        'SMA_20': sma_20,
+        'SMA_50': sma_50,
+        'SMA_200': sma_200,
+        'EMA_12': ema_12,
+        'EMA_26': ema_26,
+        'RSI': rsi,
+        'MACD': macd,
+        'Signal_Line': signal,
+        'BB_Middle': sma_20,
+        'BB_Std': bb_std,
+        'BB_Upper': sma_20 + 2 * bb_std,
+        'BB_Lower': sma_20 - 2 * bb_std,
+    }
+    if np.dtype(dtype) != np.float64:
+        result = {c: v.astype(dtype) for c, v in result.items()}
+    return _write(result, out)
+
+def _write(result, out):
+    if out is None:
+        return result
+    for column in INDICATOR_COLUMNS:
+        if isinstance(out, pd.DataFrame):
+            out[column] = result[column]
+        else:
+            out[column][...] = result[column]
+    return out
+
 def check_signals(df):
     """
     Generates Basic Buy/Sell signals based on latest data.
@@ -74,3 +224,28 @@ def check_signals(df):
         signals['MACD_Cross'] = 'Bearish Crossover'
         
     return signals
+
+def signal_history(df):
+    """
+    The check_signals rules evaluated on every row at once.
+    Returns a DataFrame with RSI_Status, Trend and MACD_Cross per date.
+    """
+    if df.empty:
+        return pd.DataFrame(columns=['RSI_Status', 'Trend', 'MACD_Cross'], index=df.index)
+    
+    rsi = df['RSI'].to_numpy()
+    macd = df['MACD'].to_numpy()
+    signal = df['Signal_Line'].to_numpy()
+    prev_macd = np.concatenate([[np.nan], macd[:-1]])
+    prev_signal = np.concatenate([[np.nan], signal[:-1]])
+    
+    rsi_status = np.select([rsi > 70, rsi < 30],
+                           ['Overbought (Potential Sell)', 'Oversold (Potential Buy)'], 'Neutral')
+    trend = np.where(df['SMA_50'].to_numpy() > df['SMA_200'].to_numpy(),
+                     'Bullish (Golden Cross Area)', 'Bearish')
+    macd_cross = np.select([(macd > signal) & (prev_macd <= prev_signal),
+                            (macd < signal) & (prev_macd >= prev_signal)],
+                           ['Bullish Crossover', 'Bearish Crossover'], 'None')
+    
+    return pd.DataFrame({'RSI_Status': rsi_status, 'Trend': trend, 'MACD_Cross': macd_cross},
+                        index=df.index)
@@ -0,0 +1,201 @@
+import json
+import os
+
+import numpy as np
+
+# Weight storage formats for export_lite_model
+QUANTIZATIONS = ("float32", "float16", "int8")
+
+
+def lite_path(model_path):
+    """
+    Where the exported lightweight artifact of a Keras model lives ('<model>.npz').
+    """
+    return os.path.splitext(model_path)[0] + ".npz"
+
+
+def _quantize(name, w, quantize, arrays):
+    if quantize == "float16":
+        arrays[name] = w.astype(np.float16)
+    elif quantize == "int8":
+        # Symmetric per-output-column scale, dequantized to float32 when loaded
+        scale = np.abs(w).max(axis=0) / 127.0
+        scale[scale == 0] = 1.0
+        arrays[name] = np.round(w / scale).astype(np.int8)
+        arrays[name + ".scale"] = scale.astype(np.float32)
+    else:
+        arrays[name] = w.astype(np.float32)
+
+
+def export_lite_model(model, path, quantize="float32"):
+    """
+    Writes a Keras model built from (Bidirectional) LSTM, Dense and Dropout layers
+    as plain weight arrays in an .npz, runnable by LiteModel without TensorFlow.
+    quantize="float16" or "int8" stores kernels at reduced precision (biases stay
+    float32); computation is always float32.
+    """
+    if quantize not in QUANTIZATIONS:
+        raise ValueError(f"quantize must be one of {QUANTIZATIONS}")
+
+    arrays, layers = {}, []
+
+    def add_lstm(prefix, lstm):
+        config = lstm.get_config()
+        if config.get("activation") != "tanh" or config.get("recurrent_activation") != "sigmoid":
+            raise ValueError(f"{lstm.name}: only tanh/sigmoid LSTMs can be exported")
+        kernel, recurrent, bias = lstm.get_weights()
+        _quantize(f"{prefix}.kernel", kernel, quantize, arrays)
+        _quantize(f"{prefix}.recurrent", recurrent, quantize, arrays)
+        arrays[f"{prefix}.bias"] = bias.astype(np.float32)
+        return config
+
+    for i, layer in enumerate(model.layers):
+        kind = type(layer).__name__
+        prefix = f"{i}"
+        if kind == "Dropout":
+            continue
+        if kind == "Bidirectional":
+            if layer.merge_mode != "concat":
+                raise ValueError(f"{layer.name}: only merge_mode='concat' is supported")
+            config = add_lstm(prefix + ".fw", layer.forward_layer)
+            add_lstm(prefix + ".bw", layer.backward_layer)
+            layers.append({"type": "bilstm", "prefix": prefix, "units": config["units"],
+                           "return_sequences": config["return_sequences"]})
+        elif kind == "LSTM":
+            config = add_lstm(prefix, layer)
+            layers.append({"type": "lstm", "prefix": prefix, "units": config["units"],
+                           "return_sequences": config["return_sequences"]})
+        elif kind == "Dense":
+            kernel, bias = layer.get_weights()
+            _quantize(f"{prefix}.kernel", kernel, quantize, arrays)
+            arrays[f"{prefix}.bias"] = bias.astype(np.float32)
+            layers.append({"type": "dense", "prefix": prefix,
+                           "activation": layer.get_config()["activation"]})
+        else:
+            raise ValueError(f"{layer.name}: {kind} layers can't be exported")
+
+    spec = {
+        "layers": layers,
+        "input_shape": list(model.input_shape),
+        "output_shape": list(model.output_shape),
+        "quantize": quantize,
+    }
+    arrays["__spec__"] = np.frombuffer(json.dumps(spec).encode(), dtype=np.uint8)
+    tmp = f"{path}.{os.getpid()}.tmp.npz"
+    np.savez(tmp, **arrays)
+    os.replace(tmp, path)
+    return path
+
+
+def _sigmoid(x):
+    # Same as 1 / (1 + exp(-x)) without overflow warnings
+    return 0.5 * (1.0 + np.tanh(0.5 * x))
+
+
+class LiteModel:
+    """
+    Pure-NumPy inference for models exported with export_lite_model.
+    Has the parts of the Keras model API the app uses (predict, predict_on_batch,
+    input_shape, output_shape, count_params), so the ModelRegistry and AIEngine
+    treat it like any other model.
+    """
+    ACTIVATIONS = {
+        "linear": lambda x: x,
+        "relu": lambda x: np.maximum(x, 0, out=x),
+        "tanh": np.tanh,
+        "sigmoid": _sigmoid,
+    }
+
+    def __init__(self, spec, weights):
+        self.spec = spec
+        self.weights = weights
+        self.input_shape = tuple(spec["input_shape"])
+        self.output_shape = tuple(spec["output_shape"])
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            spec = json.loads(data["__spec__"].tobytes().decode())
+            raw = {k: data[k] for k in data.files if k != "__spec__"}
+        weights = {}
+        for name, w in raw.items():
+            if name.endswith(".scale"):
+                continue
+            if name + ".scale" in raw:
+                w = w.astype(np.float32) * raw[name + ".scale"]
+            weights[name] = np.ascontiguousarray(w, dtype=np.float32)
+
+        # Both directions of a bidirectional layer are stacked so they run in one loop
+        for layer in spec["layers"]:
+            if layer["type"] == "bilstm":
+                p = layer["prefix"]
+                for part in ("kernel", "recurrent", "bias"):
+                    weights[f"{p}.{part}"] = np.stack([weights.pop(f"{p}.fw.{part}"),
+                                                      weights.pop(f"{p}.bw.{part}")])
+        return cls(spec, weights)
+
+    def count_params(self):
+        return int(sum(w.size for w in self.weights.values()))
+
+    def predict(self, x, batch_size=256, verbose=0):
+        x = np.asarray(x, dtype=np.float32)
+        return np.concatenate([self.predict_on_batch(x[i:i + batch_size])
+                               for i in range(0, len(x), batch_size)], axis=0)
+
+    def predict_on_batch(self, x):
+        h = np.asarray(x, dtype=np.float32)
+        for layer in self.spec["layers"]:
+            p = layer["prefix"]
+            if layer["type"] == "dense":
+                h = h @ self.weights[f"{p}.kernel"] + self.weights[f"{p}.bias"]
+                h = self.ACTIVATIONS[layer["activation"]](h)
+            elif layer["type"] == "bilstm":
+                h = self._bilstm(h, p, layer["units"], layer["return_sequences"])
+            else:
+                h = self._lstm(h, p, layer["units"], layer["return_sequences"])
+        return h
+
+    def _bilstm(self, x, prefix, units, return_sequences):
+        # Direction 0 reads the sequence forwards, direction 1 backwards
+        xs = np.stack([x, x[:, ::-1]])
+        out = self._run(xs, self.weights[f"{prefix}.kernel"], self.weights[f"{prefix}.recurrent"],
+                        self.weights[f"{prefix}.bias"], units, return_sequences)
+        if return_sequences:
+            # Backward outputs are re-aligned with the input time steps, as Keras does
+            return np.concatenate([out[0], out[1][:, ::-1]], axis=-1)
+        return np.concatenate([out[0], out[1]], axis=-1)
+
+    def _lstm(self, x, prefix, units, return_sequences):
+        out = self._run(x[np.newaxis], self.weights[f"{prefix}.kernel"][np.newaxis],
+                        self.weights[f"{prefix}.recurrent"][np.newaxis],
+                        self.weights[f"{prefix}.bias"][np.newaxis], units, return_sequences)
+        return out[0]
+
+    @staticmethod
+    def _run(xs, kernel, recurrent, bias, units, return_sequences):
+        """
+        LSTM over (directions, batch, time, features) inputs with Keras' gate order
+        (input, forget, cell, output). The input projection of every time step is one
+        matmul up front; the loop only does the recurrent part.
+        """
+        d, n, steps, _ = xs.shape
+        projected = xs @ kernel[:, np.newaxis] + bias[:, np.newaxis, np.newaxis]
+        h = np.zeros((d, n, units), dtype=np.float32)
+        c = np.zeros((d, n, units), dtype=np.float32)
+        seq = np.empty((d, n, steps, units), dtype=np.float32) if return_sequences else None
+        for t in range(steps):
+            z = projected[:, :, t] + h @ recurrent
+            g = np.tanh(z[..., 2 * units:3 * units])
+            # One sigmoid pass over all gates (the cell slice is simply ignored)
+            z *= 0.5
+            np.tanh(z, out=z)
+            z += 1.0
+            z *= 0.5
+            c *= z[..., units:2 * units]
+            g *= z[..., :units]
+            c += g
+            h = np.tanh(c)
+            h *= z[..., 3 * units:]
+            if return_sequences:
+                seq[:, :, t] = h
+        return seq if return_sequences else h
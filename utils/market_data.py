@@ -1,82 +1,124 @@
-import yfinance as yf
+import contextvars
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
 import pandas as pd
 from datetime import datetime
 
+from utils import providers, symbols, telemetry
+from utils.cache import CACHE_TIERS, cached
+from utils.price_store import DEFAULT_STORE_DIR, PriceStore
+from utils.singleflight import singleflight
 
-# Common Name to Ticker Mapping (Extend as needed)
-SYMBOL_MAP = {
-    "NVIDIA": "NVDA",
-    "GOOGLE": "GOOG",
-    "APPLE": "AAPL",
-    "TESLA": "TSLA",
-    "MICROSOFT": "MSFT",
-    "AMAZON": "AMZN",
-    "META": "META",
-    "NETFLIX": "NFLX",
-    "FACEBOOK": "META",
-    "AMD": "AMD",
-    "INTEL": "INTC"
-}
 
 def resolve_ticker(query):
     """
-    Tries to resolve a user query (Name or Ticker) to a valid Ticker Symbol.
+    Tries to resolve a user query (Name or Ticker) to a valid Ticker Symbol,
+    using the local symbol index (no network). Returns None when nothing matches
+    and the query doesn't look like a ticker either.
     """
-    query = query.strip().upper()
-    # Check if direct match in map
-    if query in SYMBOL_MAP:
-        return SYMBOL_MAP[query]
-    
-    # Check if any key contains the query (e.g. "NVIDIA CORP" -> "NVDA")
-    # Simple fuzzy-ish match
-    for name, ticker in SYMBOL_MAP.items():
-        if query in name or name in query:
-            return ticker
-            
-    # Default: Assume it's a ticker
-    return query
+    return symbols.resolve(query)
+
+# Where data comes from: Yahoo unless DATA_PROVIDER says otherwise (e.g. "synthetic" for offline runs)
+_provider = providers.make_provider(os.environ.get("DATA_PROVIDER", "yahoo"))
+
+
+def get_provider():
+    return _provider
+
+
+@telemetry.traced("provider.history")
+def fetch_history(ticker, interval="1d", start=None, period=None):
+    """
+    Downloads bars from the data provider, either from 'start' onwards or for a whole 'period'.
+    """
+    return _provider.history(ticker, interval=interval, start=start, period=period)
+
+
+def _store_dir(provider):
+    # Non-Yahoo data gets its own store so it never mixes with real history
+    if provider.name == "yahoo":
+        return DEFAULT_STORE_DIR
+    return os.path.join(DEFAULT_STORE_DIR, f"_{provider.name}")
+
+
+# Local OHLCV cache: history is downloaded once, later calls only fetch new bars
+price_store = PriceStore(fetch=fetch_history, root=_store_dir(_provider))
 
+
+def set_provider(provider, store_dir=None):
+    """
+    Switches every fetch to 'provider' (e.g. providers.SyntheticProvider() for
+    benchmarks and offline runs). Cached results from the previous provider are
+    dropped and the price store moves to 'store_dir' (default: a folder per provider).
+    """
+    global _provider, price_store
+    _provider = provider
+    price_store = PriceStore(fetch=fetch_history, root=store_dir or _store_dir(provider))
+    for cache in CACHE_TIERS.values():
+        cache.clear()
+
+
+# Concurrent sessions asking for the same ticker share one fetch; each gets its own copy
+@telemetry.traced("fetch.history")
+@singleflight("history", clone=lambda df: df.copy())
 def get_stock_data(ticker, period="2y", interval="1d"):
     """
-    Fetches historical stock data.
+    Fetches historical stock data (served from the local price store).
     """
     try:
-        stock = yf.Ticker(ticker)
-        df = stock.history(period=period, interval=interval)
-        return df
+        return price_store.get(ticker, period=period, interval=interval)
     except Exception as e:
+        telemetry.record_error("fetch.history", e)
         return pd.DataFrame()
 
+@telemetry.traced("fetch.info")
+@cached("fundamentals")
 def get_stock_info(ticker):
     """
     Fetches fundamental data (P/E, Market Cap, Sector).
     """
     try:
-        stock = yf.Ticker(ticker)
-        # Force fetch
-        info = stock.info
-        return info if info else {}
+        return _provider.info(ticker) or {}
     except Exception as e:
-        # st.error(f"Error fetching info: {e}") # Optional debugging
+        telemetry.record_error("fetch.info", e)
         return {}
 
+@telemetry.traced("fetch.option_expiries")
+@cached("option_expiries")
+def get_option_expiries(ticker):
+    """
+    Listed option expiry dates ('YYYY-MM-DD', nearest first), or () if there are none.
+    """
+    try:
+        return tuple(_provider.option_expiries(ticker))
+    except Exception as e:
+        telemetry.record_error("fetch.option_expiries", e)
+        return ()
+
+@telemetry.traced("fetch.options")
+@cached("options")
 def get_options_chain(ticker, date=None):
     """
     Fetches options chain for a specific expiry date.
     If no date provided, uses the nearest expiry.
     """
     try:
-        stock = yf.Ticker(ticker)
-        dates = stock.options
+        dates = get_option_expiries(ticker)
         if not dates:
             return None, []
         
         target_date = date if date in dates else dates[0]
-        opt = stock.option_chain(target_date)
+        opt = _provider.option_chain(ticker, target_date)
         return opt, dates
     except Exception as e:
+        telemetry.record_error("fetch.options", e)
         return None, []
 
+@telemetry.traced("fetch.fx")
+@cached("fx")
 def get_exchange_rate(target_currency):
     """
     Fetches the exchange rate from USD to target_currency.
@@ -86,29 +128,157 @@ def get_exchange_rate(target_currency):
         return 1.0
     
     try:
-        # Yahoo Finance symbols for currency are like 'EUR=X', 'INR=X'
-        pair = f"{target_currency}=X"
-        ticker = yf.Ticker(pair)
-        # fast_info is reliable for currencies
-        rate = ticker.fast_info.last_price
-        return rate
-    except:
+        return _provider.exchange_rate(target_currency)
+    except Exception as e:
+        telemetry.record_error("fetch.fx", e)
         return 1.0
 
+@telemetry.traced("fetch.metrics")
+@singleflight("metrics", clone=lambda metrics: dict(metrics) if metrics else metrics)
 def get_real_time_metrics(ticker):
     """
     Simulates real-time metrics (Price, Change, Volume) 
     using the latest available fast data.
     """
     try:
-        stock = yf.Ticker(ticker)
-        fast_info = stock.fast_info
+        quote = _provider.quote(ticker)
         return {
-            "current_price": fast_info.last_price,
-            "previous_close": fast_info.previous_close,
-            "volume": fast_info.last_volume,
-            "day_change_pct": ((fast_info.last_price - fast_info.previous_close) / fast_info.previous_close) * 100
+            "current_price": quote["last_price"],
+            "previous_close": quote["previous_close"],
+            "volume": quote["last_volume"],
+            "day_change_pct": ((quote["last_price"] - quote["previous_close"]) / quote["previous_close"]) * 100
         }
-    except:
-        # Fallback for some tickers
+    except Exception as e:
+        # Some tickers have no quote; the dashboard shows a 'delayed' notice
+        telemetry.record_error("fetch.metrics", e)
         return None
+
+
+class _Call:
+    # One coordinated call; its deadline is set when it starts running
+    def __init__(self, timeout):
+        self.timeout = timeout
+        self.future = None
+        self.started_at = None
+        self._started = threading.Event()
+
+    def run(self, fn, *args, **kwargs):
+        self.started_at = time.monotonic()
+        self._started.set()
+        return fn(*args, **kwargs)
+
+    def remaining(self):
+        # Waits (unbounded) for a worker to pick the call up, then for the rest of its timeout
+        self._started.wait()
+        return max(0.0, self.started_at + self.timeout - time.monotonic())
+
+
+class FetchCoordinator:
+    """
+    Runs the independent data-provider calls of one page render concurrently.
+    Identical calls are only made once, every call for a symbol shares one
+    yf.Ticker (Yahoo provider), and each call has its own timeout so a slow endpoint only
+    costs its own panel. Render time ends up close to the slowest call
+    instead of the sum of all of them.
+    """
+    def __init__(self, max_workers=8, timeout=10):
+        self.timeout = timeout
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="fetch")
+        self._calls = {}  # key -> (future, deadline)
+        self._lock = threading.Lock()
+        self._shared = ({}, threading.Lock())
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def submit(self, fn, *args, timeout=None, **kwargs):
+        """
+        Starts fn(*args, **kwargs) in the background (once per identical call).
+        Its timeout runs from when a worker picks it up, not from submission, so
+        calls queued behind a full pool still get their whole allowance.
+        """
+        key = (fn.__name__, args, tuple(sorted(kwargs.items())))
+        with self._lock:
+            if key not in self._calls:
+                ctx = contextvars.copy_context()
+                ctx.run(providers.render_tickers.set, self._shared)
+                call = _Call(self.timeout if timeout is None else timeout)
+                call.future = self._pool.submit(ctx.run, call.run, fn, *args, **kwargs)
+                self._calls[key] = call
+            return self._calls[key]
+
+    def result(self, fn, *args, default=None, timeout=None, **kwargs):
+        """
+        Result of fn(*args, **kwargs), or 'default' if it failed or missed its deadline.
+        """
+        call = self.submit(fn, *args, timeout=timeout, **kwargs)
+        try:
+            return call.future.result(timeout=call.remaining())
+        except FutureTimeout as e:
+            telemetry.record_error(f"timeout.{fn.__name__}", e)
+            return default
+        except Exception as e:
+            telemetry.record_error(f"coordinator.{fn.__name__}", e)
+            return default
+
+    def status(self, fn, *args, **kwargs):
+        """
+        "ok", "failed" or "timeout" for a submitted call (after result() was asked for it).
+        """
+        call = self._calls[(fn.__name__, args, tuple(sorted(kwargs.items())))]
+        if not call.future.done():
+            return "timeout"
+        return "failed" if call.future.exception() is not None else "ok"
+
+    def close(self):
+        # Calls that timed out keep running in the background; don't wait for them
+        self._pool.shutdown(wait=False)
+
+
+@telemetry.traced("fetch.dashboard")
+def fetch_dashboard(ticker, currency="USD", period="5y", timeout=10):
+    """
+    Fetches everything one dashboard render needs, concurrently.
+    Returns a dict with exchange_rate, info, metrics, history and options (the
+    multi-expiry surface from utils.options, or None).
+    """
+    from utils.options import get_surface  # utils.options builds on this module
+    
+    with FetchCoordinator(timeout=timeout) as fetcher:
+        fetcher.submit(get_exchange_rate, currency)
+        fetcher.submit(get_stock_info, ticker)
+        fetcher.submit(get_real_time_metrics, ticker)
+        fetcher.submit(get_stock_data, ticker, period=period)
+        fetcher.submit(get_surface, ticker)
+        return {
+            "exchange_rate": fetcher.result(get_exchange_rate, currency, default=1.0),
+            "info": fetcher.result(get_stock_info, ticker, default={}),
+            "metrics": fetcher.result(get_real_time_metrics, ticker),
+            "history": fetcher.result(get_stock_data, ticker, period=period, default=pd.DataFrame()),
+            "options": fetcher.result(get_surface, ticker),
+        }
+
+
+@telemetry.traced("fetch.universe")
+def fetch_universe(tickers, period="2y", max_workers=16, timeout=60):
+    """
+    Price history for many tickers at once (through the price store, so only
+    new bars are downloaded). Each ticker gets 'timeout' seconds from when its
+    download starts. Returns ({ticker: DataFrame}, {ticker: reason}) where the
+    second dict lists the tickers left out: "timeout", "failed" or "no data".
+    """
+    frames, dropped = {}, {}
+    with FetchCoordinator(max_workers=max_workers, timeout=timeout) as fetcher:
+        for ticker in tickers:
+            fetcher.submit(get_stock_data, ticker, period=period)
+        for ticker in tickers:
+            df = fetcher.result(get_stock_data, ticker, period=period)
+            if df is not None and not df.empty:
+                frames[ticker] = df
+            else:
+                status = fetcher.status(get_stock_data, ticker, period=period)
+                dropped[ticker] = "no data" if status == "ok" else status
+    return frames, dropped
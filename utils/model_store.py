@@ -0,0 +1,121 @@
+import hashlib
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+
+DEFAULT_REGISTRY_DIR = os.environ.get("MODEL_REGISTRY_DIR", "models")
+
+
+def data_fingerprint(dates, close):
+    """
+    Short hash of a price history, used to skip retraining when nothing changed.
+    """
+    digest = hashlib.sha1()
+    digest.update(np.asarray(dates, dtype="datetime64[ns]").tobytes())
+    digest.update(np.round(np.asarray(close, dtype=np.float64), 6).tobytes())
+    return digest.hexdigest()[:16]
+
+
+class ModelStore:
+    """
+    Versioned per-ticker model artifacts on disk:
+
+        <root>/<TICKER>/<version>/model.keras   trained model
+        <root>/<TICKER>/<version>/scaler.json   fitted scaling parameters
+        <root>/<TICKER>/<version>/meta.json     training window, data range, metrics
+        <root>/<TICKER>/LATEST                  name of the current version
+
+    A version only becomes visible once all of its files are written, so an
+    interrupted run never leaves a half-written artifact behind.
+    """
+    MODEL_FILE = "model.keras"
+    SCALER_FILE = "scaler.json"
+    META_FILE = "meta.json"
+
+    def __init__(self, root=DEFAULT_REGISTRY_DIR):
+        self.root = root
+
+    def ticker_dir(self, ticker):
+        safe = "".join(c if c.isalnum() or c in "-_." else "_" for c in ticker.upper())
+        return os.path.join(self.root, safe)
+
+    def tickers(self):
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(t for t in os.listdir(self.root) if self.latest_version(t))
+
+    def versions(self, ticker):
+        folder = self.ticker_dir(ticker)
+        if not os.path.isdir(folder):
+            return []
+        return sorted(v for v in os.listdir(folder)
+                      if os.path.exists(os.path.join(folder, v, self.META_FILE)))
+
+    def latest_version(self, ticker):
+        try:
+            with open(os.path.join(self.ticker_dir(ticker), "LATEST")) as f:
+                return f.read().strip() or None
+        except OSError:
+            return None
+
+    def latest(self, ticker):
+        """
+        Metadata of the current artifact for 'ticker' (with file paths), or None.
+        """
+        version = self.latest_version(ticker)
+        if not version:
+            return None
+        folder = os.path.join(self.ticker_dir(ticker), version)
+        try:
+            with open(os.path.join(folder, self.META_FILE)) as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+        meta["model_path"] = os.path.join(folder, self.MODEL_FILE)
+        meta["scaler_path"] = os.path.join(folder, self.SCALER_FILE)
+        return meta
+
+    def model_path(self, ticker):
+        meta = self.latest(ticker)
+        return meta["model_path"] if meta else None
+
+    def is_current(self, ticker, fingerprint):
+        meta = self.latest(ticker)
+        return bool(meta) and meta.get("data_fingerprint") == fingerprint
+
+    def save(self, ticker, save_model, scaler, meta):
+        """
+        Writes a new version. 'save_model' is called with the target model path;
+        'scaler' is a dict of scaling parameters.
+        """
+        folder = self.ticker_dir(ticker)
+        os.makedirs(folder, exist_ok=True)
+        version = time.strftime("%Y%m%d-%H%M%S")
+        existing = self.versions(ticker)
+        suffix = 1
+        while version in existing or os.path.exists(os.path.join(folder, version)):
+            version = f"{time.strftime('%Y%m%d-%H%M%S')}-{suffix}"
+            suffix += 1
+
+        tmp = os.path.join(folder, f".{version}.tmp")
+        os.makedirs(tmp, exist_ok=True)
+        try:
+            save_model(os.path.join(tmp, self.MODEL_FILE))
+            with open(os.path.join(tmp, self.SCALER_FILE), "w") as f:
+                json.dump(scaler, f, indent=2)
+            meta = dict(meta, ticker=ticker.upper(), version=version, created_at=time.time())
+            with open(os.path.join(tmp, self.META_FILE), "w") as f:
+                json.dump(meta, f, indent=2)
+            os.replace(tmp, os.path.join(folder, version))
+        except Exception:
+            shutil.rmtree(tmp, ignore_errors=True)
+            raise
+
+        latest_tmp = os.path.join(folder, f".LATEST.{os.getpid()}")
+        with open(latest_tmp, "w") as f:
+            f.write(version)
+        os.replace(latest_tmp, os.path.join(folder, "LATEST"))
+        return version
@@ -0,0 +1,258 @@
+import numpy as np
+import pandas as pd
+
+from utils import market_data
+from utils.cache import cached
+from utils.singleflight import singleflight
+from utils.telemetry import traced
+
+# Annual risk-free rate used for the Greeks (continuous compounding, no dividends)
+RISK_FREE_RATE = 0.045
+
+# Shortest time to expiry used in the maths, so same-day contracts stay finite (1 hour)
+MIN_YEARS = 1.0 / (365 * 24)
+
+CHAIN_COLUMNS = [
+    'contractSymbol', 'type', 'expiry', 'strike', 'lastPrice', 'bid', 'ask',
+    'volume', 'openInterest', 'impliedVolatility', 'inTheMoney',
+]
+
+
+@traced("fetch.option_surface")
+@cached("option_surface")
+@singleflight("option_surface")
+def get_surface(ticker, max_expiries=None, timeout=20):
+    """
+    Every expiry of a ticker's option chain, fetched concurrently and cached as one
+    'surface'. Returns a dict with ticker, spot, expiries (list of 'YYYY-MM-DD')
+    and chain (one DataFrame with a 'type' and 'expiry' column), or None.
+    """
+    # Expiry list only (cached), so each chain below is downloaded exactly once
+    expiries = market_data.get_option_expiries(ticker)
+    if not expiries:
+        return None
+    expiries = list(expiries[:max_expiries] if max_expiries else expiries)
+
+    with market_data.FetchCoordinator(max_workers=min(16, len(expiries)), timeout=timeout) as fetcher:
+        fetcher.submit(market_data.get_real_time_metrics, ticker)
+        for expiry in expiries:
+            fetcher.submit(market_data.get_options_chain, ticker, expiry)
+        chains = {e: fetcher.result(market_data.get_options_chain, ticker, e, default=(None, []))[0]
+                  for e in expiries}
+        metrics = fetcher.result(market_data.get_real_time_metrics, ticker)
+
+    parts = []
+    for expiry, chain in chains.items():
+        if chain is None:
+            continue
+        for kind, frame in (("call", chain.calls), ("put", chain.puts)):
+            if frame is not None and not frame.empty:
+                parts.append(frame.assign(type=kind, expiry=pd.Timestamp(expiry)))
+    if not parts:
+        return None
+
+    chain = pd.concat(parts, ignore_index=True).reindex(columns=CHAIN_COLUMNS)
+    for column in ('volume', 'openInterest'):
+        chain[column] = chain[column].fillna(0.0)
+    return {
+        "ticker": ticker,
+        "spot": metrics["current_price"] if metrics else np.nan,
+        "expiries": [e for e in expiries if chains.get(e) is not None],
+        "chain": chain,
+        "fetched_at": pd.Timestamp.now(tz="UTC"),
+    }
+
+
+def norm_cdf(x):
+    """
+    Standard normal CDF from the Chebyshev erfc approximation (Numerical Recipes),
+    relative error below 1.2e-7. Vectorised, no SciPy needed.
+    """
+    z = np.abs(x) / np.sqrt(2.0)
+    t = 1.0 / (1.0 + 0.5 * z)
+    poly = (-z * z - 1.26551223 + t * (1.00002368 + t * (0.37409196 + t * (0.09678418 +
+            t * (-0.18628806 + t * (0.27886807 + t * (-1.13520398 + t * (1.48851587 +
+            t * (-0.82215223 + t * 0.17087277)))))))))
+    erfc = t * np.exp(poly)
+    return np.where(x >= 0, 1.0 - 0.5 * erfc, 0.5 * erfc)
+
+
+def norm_pdf(x):
+    return np.exp(-0.5 * x * x) / np.sqrt(2.0 * np.pi)
+
+
+def years_to_expiry(expiry, now=None):
+    """
+    Years from 'now' to 16:00 New York time on each expiry date (at least MIN_YEARS).
+    """
+    now = now or pd.Timestamp.now(tz="UTC")
+    close = (pd.DatetimeIndex(expiry).tz_localize("America/New_York") + pd.Timedelta(hours=16))
+    seconds = (close.tz_convert("UTC") - now).total_seconds().to_numpy()
+    return np.maximum(seconds / (365.0 * 24 * 3600), MIN_YEARS)
+
+
+def black_scholes(spot, strike, years, vol, is_call, rate=RISK_FREE_RATE):
+    """
+    Black-Scholes price and Greeks for arrays of contracts, in one vectorised pass.
+    Theta is per calendar day, vega and rho per 1 percentage point.
+    """
+    strike = np.asarray(strike, dtype=np.float64)
+    vol = np.maximum(np.asarray(vol, dtype=np.float64), 1e-4)
+    years = np.asarray(years, dtype=np.float64)
+    sign = np.where(is_call, 1.0, -1.0)
+
+    sqrt_t = np.sqrt(years)
+    d1 = (np.log(spot / strike) + (rate + 0.5 * vol * vol) * years) / (vol * sqrt_t)
+    d2 = d1 - vol * sqrt_t
+    discount = np.exp(-rate * years)
+    pdf_d1 = norm_pdf(d1)
+    nd1, nd2 = norm_cdf(sign * d1), norm_cdf(sign * d2)
+
+    return {
+        'theoPrice': sign * (spot * nd1 - strike * discount * nd2),
+        'delta': sign * nd1,
+        'gamma': pdf_d1 / (spot * vol * sqrt_t),
+        'theta': (-spot * pdf_d1 * vol / (2 * sqrt_t) - sign * rate * strike * discount * nd2) / 365.0,
+        'vega': spot * pdf_d1 * sqrt_t / 100.0,
+        'rho': sign * strike * years * discount * nd2 / 100.0,
+    }
+
+
+def add_greeks(chain, spot, rate=RISK_FREE_RATE, now=None):
+    """
+    Copy of 'chain' with days to expiry, moneyness and Black-Scholes Greeks
+    (from each contract's implied volatility) added as columns.
+    """
+    chain = chain.copy()
+    years = years_to_expiry(chain['expiry'], now)
+    chain['daysToExpiry'] = years * 365.0
+    chain['moneyness'] = chain['strike'].to_numpy() / spot
+    greeks = black_scholes(spot, chain['strike'].to_numpy(), years,
+                           chain['impliedVolatility'].to_numpy(), chain['type'].to_numpy() == 'call', rate)
+    for name, values in greeks.items():
+        chain[name] = values
+    return chain
+
+
+def put_call_ratios(chain):
+    """
+    Put/call ratios of volume and open interest per expiry (indexed by expiry
+    Timestamp) and over every expiry: returns (per_expiry DataFrame, totals Series).
+    The totals are kept apart so the index stays all Timestamps.
+    """
+    codes, expiries = pd.factorize(chain['expiry'], sort=True)
+    is_put = (chain['type'] == 'put').to_numpy()
+    # Bin (expiry, type) pairs: even bins are calls, odd bins puts
+    bins = codes * 2 + is_put
+    size = 2 * len(expiries)
+
+    def totals(column):
+        sums = np.bincount(bins, weights=chain[column].to_numpy(dtype=np.float64), minlength=size)
+        return sums[1::2], sums[0::2]
+
+    put_volume, call_volume = totals('volume')
+    put_oi, call_oi = totals('openInterest')
+    ratios = pd.DataFrame({
+        'Put Volume': put_volume,
+        'Call Volume': call_volume,
+        'Put OI': put_oi,
+        'Call OI': call_oi,
+    }, index=pd.DatetimeIndex(expiries, name='expiry'))
+    totals = ratios.sum()
+    for frame in (ratios, totals):
+        with np.errstate(divide='ignore', invalid='ignore'):
+            frame['P/C Volume'] = np.where(frame['Call Volume'] > 0, frame['Put Volume'] / frame['Call Volume'], np.nan)
+            frame['P/C OI'] = np.where(frame['Call OI'] > 0, frame['Put OI'] / frame['Call OI'], np.nan)
+    return ratios, totals
+
+
+def _cumulative_payout(keys, strikes, oi, query):
+    """
+    For contracts sorted by 'keys' (expiry code + scaled strike), the running sums of
+    OI and OI * strike up to each query key (inclusive), with a leading zero.
+    """
+    cum_oi = np.concatenate([[0.0], np.cumsum(oi)])
+    cum_oik = np.concatenate([[0.0], np.cumsum(oi * strikes)])
+    idx = np.searchsorted(keys, query, side='right')
+    return cum_oi, cum_oik, idx
+
+
+def max_pain(chain):
+    """
+    Max-pain strike per expiry: the settlement price (among listed strikes) at which
+    option holders' total intrinsic value, weighted by open interest, is smallest.
+    Evaluated for every expiry and candidate strike at once from sorted running sums,
+    O(n log n) for the whole chain. Returns a Series indexed by expiry.
+    """
+    codes, expiries = pd.factorize(chain['expiry'], sort=True)
+    strike = chain['strike'].to_numpy(dtype=np.float64)
+    oi = chain['openInterest'].to_numpy(dtype=np.float64)
+    is_call = (chain['type'] == 'call').to_numpy()
+
+    # One sortable key per (expiry, strike): the expiry code plus the strike squeezed into [0, 1)
+    scale = 1.0 / (np.nanmax(strike) * 2 + 1.0)
+    key = codes + strike * scale
+
+    # Candidate settlements: every listed (expiry, strike) pair
+    cand_key, first = np.unique(key, return_index=True)
+    cand_code, cand_strike = codes[first], strike[first]
+
+    pain = np.zeros(len(cand_key))
+    for calls in (True, False):
+        mask = is_call == calls
+        order = np.argsort(key[mask], kind='stable')
+        k, w, c = strike[mask][order], oi[mask][order], codes[mask][order]
+        cum_oi, cum_oik, idx = _cumulative_payout(key[mask][order], k, w, cand_key)
+        # Start and end of each candidate's expiry block among these contracts
+        start = np.searchsorted(c, cand_code, side='left')
+        end = np.searchsorted(c, cand_code, side='right')
+        below_oi, below_oik = cum_oi[idx] - cum_oi[start], cum_oik[idx] - cum_oik[start]
+        if calls:
+            # Calls struck below the settlement pay S - K
+            pain += cand_strike * below_oi - below_oik
+        else:
+            # Puts struck above the settlement pay K - S
+            above_oi, above_oik = cum_oi[end] - cum_oi[idx], cum_oik[end] - cum_oik[idx]
+            pain += above_oik - cand_strike * above_oi
+
+    # Lowest pain per expiry (ties go to the lower strike)
+    order = np.lexsort((cand_strike, pain, cand_code))
+    best = order[np.r_[True, cand_code[order][1:] != cand_code[order][:-1]]]
+    total_oi = np.bincount(codes, weights=oi, minlength=len(expiries))
+    values = np.where(total_oi[cand_code[best]] > 0, cand_strike[best], np.nan)
+    return pd.Series(values, index=pd.Index(expiries[cand_code[best]], name='expiry'), name='Max Pain')
+
+
+def iv_surface(chain, spot, min_iv=1e-3):
+    """
+    Implied volatility by strike (rows) and expiry (columns) from out-of-the-money
+    contracts: puts below spot, calls at or above it, as quoted skews are usually read.
+    """
+    strike = chain['strike'].to_numpy()
+    otm = np.where(chain['type'].to_numpy() == 'call', strike >= spot, strike < spot)
+    usable = otm & (chain['impliedVolatility'].to_numpy() > min_iv)
+    return (chain[usable].groupby(['strike', 'expiry'])['impliedVolatility'].mean()
+            .unstack('expiry'))
+
+
+@traced("options.analyze")
+def analyze(surface, rate=RISK_FREE_RATE, now=None):
+    """
+    Everything the Options tab shows, computed over the whole chain at once:
+    chain with Greeks, put/call ratios (per expiry and overall), max pain per
+    expiry and the IV surface.
+    """
+    spot = surface["spot"]
+    chain = surface["chain"]
+    if not np.isfinite(spot):
+        # No live quote: centre on the median listed strike
+        spot = float(chain['strike'].median())
+    put_call, put_call_all = put_call_ratios(chain)
+    return {
+        "spot": spot,
+        "chain": add_greeks(chain, spot, rate, now),
+        "put_call": put_call,
+        "put_call_all": put_call_all,
+        "max_pain": max_pain(chain),
+        "iv_surface": iv_surface(chain, spot),
+    }
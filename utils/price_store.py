@@ -0,0 +1,260 @@
+import json
+import os
+import re
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_STORE_DIR = os.environ.get("PRICE_STORE_DIR", ".price_store")
+
+# How long stored bars are considered fresh before the missing tail is fetched (seconds)
+REFRESH_SECONDS = {
+    "1m": 30, "2m": 60, "5m": 60, "15m": 120, "30m": 120,
+    "60m": 300, "90m": 300, "1h": 300,
+    "1d": 900, "5d": 3600, "1wk": 3600, "1mo": 3600, "3mo": 3600,
+}
+
+PERIOD_OFFSETS = {
+    "1d": pd.DateOffset(days=1),
+    "5d": pd.DateOffset(days=5),
+    "1mo": pd.DateOffset(months=1),
+    "3mo": pd.DateOffset(months=3),
+    "6mo": pd.DateOffset(months=6),
+    "1y": pd.DateOffset(years=1),
+    "2y": pd.DateOffset(years=2),
+    "5y": pd.DateOffset(years=5),
+    "10y": pd.DateOffset(years=10),
+}
+
+# Other "<n><unit>" periods are parsed; anything else is read as the whole history
+_PERIOD_RE = re.compile(r"^(\d+)(d|wk|mo|y)$")
+_PERIOD_UNITS = {"d": "days", "wk": "weeks", "mo": "months", "y": "years"}
+
+# Relative tolerance when checking that re-fetched bars still match stored ones
+ADJUSTMENT_TOLERANCE = 1e-4
+
+
+def period_offset(period):
+    """
+    DateOffset covered by a "<n>d/wk/mo/y" period, or None if it isn't one.
+    """
+    if period in PERIOD_OFFSETS:
+        return PERIOD_OFFSETS[period]
+    match = _PERIOD_RE.match(period or "")
+    if match is None:
+        return None
+    return pd.DateOffset(**{_PERIOD_UNITS[match.group(2)]: int(match.group(1))})
+
+
+def period_start(period, now=None):
+    """
+    Converts a yfinance style period ("5y", "1mo", "ytd", "max") to a start timestamp.
+    Returns None for "max" and for periods it can't read, i.e. the whole history.
+    """
+    now = pd.Timestamp.now(tz="UTC") if now is None else now
+    if period == "ytd":
+        return now.normalize().replace(month=1, day=1)
+    offset = period_offset(period)
+    return None if offset is None else now - offset
+
+
+def _period_rank(period):
+    # Longer periods rank higher, so a stored "5y" history also serves "2y" requests.
+    # "max" and unknown periods outrank everything: they are fetched in full.
+    if period is None:
+        return -1
+    if period == "ytd":
+        now = pd.Timestamp.now(tz="UTC")
+        return (now - period_start(period, now)).days
+    offset = period_offset(period)
+    if offset is None:
+        return float("inf")
+    base = pd.Timestamp("2000-01-01", tz="UTC")
+    return (base - (base - offset)).days
+
+
+def store_path(root, ticker, interval="1d"):
+    """
+    Folder holding the cached bars (and derived state) for one ticker/interval.
+    """
+    safe = "".join(c if c.isalnum() or c in "-_." else "_" for c in ticker.upper())
+    return os.path.join(root, safe, interval)
+
+
+class PriceStore:
+    """
+    On-disk OHLCV cache, one memory-mapped .npy file per ticker/interval.
+    History is downloaded once; later calls only fetch the bars after the
+    last stored one. If the provider re-adjusts past prices (splits, dividends)
+    the stored rows are dropped and the history is fetched again.
+
+    'fetch' is any callable fetch(ticker, interval, start=None, period=None)
+    returning a DataFrame indexed by date, so the store works offline against
+    a local stand-in source.
+    """
+    def __init__(self, fetch, root=DEFAULT_STORE_DIR, refresh_seconds=None):
+        self.fetch = fetch
+        self.root = root
+        self.refresh_seconds = refresh_seconds
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+
+    def get(self, ticker, period="2y", interval="1d"):
+        """
+        Returns bars for the last 'period', fetching only what is missing locally.
+        """
+        with self._lock(ticker, interval):
+            df, meta = self._read(ticker, interval)
+
+            if df.empty or _period_rank(period) > _period_rank(meta.get("period")):
+                df, meta = self._full_refresh(ticker, interval, period, stored=df, meta=meta)
+            elif self._is_stale(meta, interval):
+                df, meta = self._refresh_tail(ticker, interval, df, meta)
+
+        start = period_start(period)
+        if start is not None and not df.empty:
+            if df.index.tz is None:
+                start = start.tz_localize(None)
+            df = df[df.index >= start]
+        return df
+
+    def load(self, ticker, interval="1d"):
+        """
+        Returns everything stored for ticker/interval without touching the network.
+        """
+        return self._read(ticker, interval)[0]
+
+    def invalidate(self, ticker, interval="1d"):
+        with self._lock(ticker, interval):
+            for name in ("bars.npy", "meta.json", "indicators.npy", "indicator_state.json"):
+                path = os.path.join(self.path(ticker, interval), name)
+                if os.path.exists(path):
+                    os.remove(path)
+
+    def path(self, ticker, interval="1d"):
+        return store_path(self.root, ticker, interval)
+
+    # Refresh logic
+
+    def _full_refresh(self, ticker, interval, period, stored, meta):
+        # Never shrink what is stored: a "2y" request after a "5y" one keeps 5y
+        if _period_rank(meta.get("period")) > _period_rank(period):
+            period = meta["period"]
+        fresh = self.fetch(ticker, interval, period=period)
+        if fresh is None or fresh.empty:
+            return stored, meta
+        meta = {"period": period}
+        return self._write(ticker, interval, fresh, meta), meta
+
+    def _refresh_tail(self, ticker, interval, stored, meta):
+        if len(stored) < 2:
+            return self._full_refresh(ticker, interval, meta.get("period"), stored, meta)
+
+        # The last stored bar may still have been forming, so re-fetch from the one before it
+        # and use that completed bar to check the provider hasn't re-adjusted history.
+        anchor = stored.index[-2]
+        tail = self.fetch(ticker, interval, start=anchor)
+        if tail is None or tail.empty:
+            self._touch(ticker, interval, meta)
+            return stored, meta
+
+        if self._history_adjusted(stored, tail, anchor):
+            return self._full_refresh(ticker, interval, meta.get("period"), stored, meta)
+
+        merged = pd.concat([stored[stored.index < tail.index[0]], tail])
+        merged = merged[~merged.index.duplicated(keep="last")]
+        return self._write(ticker, interval, merged, meta), meta
+
+    @staticmethod
+    def _history_adjusted(stored, tail, anchor):
+        # A split/dividend on a new bar means earlier adjusted prices have changed.
+        # Only bars after the anchor count, and not ones already stored with the same
+        # action: otherwise an ex-dividend day near the end would force a full
+        # refetch on every refresh. The anchor check below catches back-adjustment.
+        after = tail[tail.index > anchor]
+        for column in ("Stock Splits", "Dividends"):
+            if column not in after.columns:
+                continue
+            actions = after[column].fillna(0)
+            actions = actions[actions != 0]
+            if column in stored.columns:
+                known = stored[column].reindex(actions.index).fillna(0)
+                actions = actions[~np.isclose(actions, known)]
+            if len(actions):
+                return True
+        if anchor not in tail.index:
+            return True
+        old = stored.at[anchor, "Close"]
+        new = tail.at[anchor, "Close"]
+        return not np.isclose(old, new, rtol=ADJUSTMENT_TOLERANCE, atol=0)
+
+    def _is_stale(self, meta, interval):
+        refresh = self.refresh_seconds
+        if refresh is None:
+            refresh = REFRESH_SECONDS.get(interval, 300)
+        return time.time() - meta.get("fetched_at", 0) > refresh
+
+    # Storage
+
+    def _read(self, ticker, interval):
+        folder = self.path(ticker, interval)
+        try:
+            with open(os.path.join(folder, "meta.json")) as f:
+                meta = json.load(f)
+            bars = np.load(os.path.join(folder, "bars.npy"), mmap_mode="r")
+        except (OSError, ValueError):
+            return pd.DataFrame(), {}
+
+        index = pd.DatetimeIndex(np.asarray(bars["ts"]), name=meta.get("index_name", "Date"))
+        if meta.get("tz"):
+            index = index.tz_localize("UTC").tz_convert(meta["tz"])
+        columns = [name for name in bars.dtype.names if name != "ts"]
+        data = {name: np.array(bars[name]) for name in columns}
+        return pd.DataFrame(data, index=index, columns=columns), meta
+
+    def _write(self, ticker, interval, df, meta):
+        df = df.sort_index()
+        df = df[~df.index.duplicated(keep="last")]
+        columns = [c for c in df.columns if pd.api.types.is_numeric_dtype(df[c])]
+        df = df[columns]
+
+        index = df.index
+        tz = str(index.tz) if index.tz is not None else None
+        if tz:
+            index = index.tz_convert("UTC").tz_localize(None)
+
+        dtype = [("ts", "<M8[ns]")] + [(c, "<f8") for c in columns]
+        bars = np.empty(len(df), dtype=dtype)
+        bars["ts"] = index.values.astype("datetime64[ns]")
+        for c in columns:
+            bars[c] = df[c].to_numpy(dtype="float64", na_value=np.nan)
+
+        folder = self.path(ticker, interval)
+        os.makedirs(folder, exist_ok=True)
+        meta = dict(meta, tz=tz, index_name=df.index.name or "Date", fetched_at=time.time(), rows=len(df))
+
+        # Write to temp files and swap in so concurrent readers never see a partial file
+        tmp = os.path.join(folder, f"bars.{os.getpid()}.{threading.get_ident()}.tmp.npy")
+        np.save(tmp, bars)
+        os.replace(tmp, os.path.join(folder, "bars.npy"))
+        self._write_meta(folder, meta)
+
+        return df.astype("float64")
+
+    def _touch(self, ticker, interval, meta):
+        meta["fetched_at"] = time.time()
+        self._write_meta(self.path(ticker, interval), meta)
+
+    @staticmethod
+    def _write_meta(folder, meta):
+        tmp = os.path.join(folder, f"meta.{os.getpid()}.{threading.get_ident()}.tmp")
+        with open(tmp, "w") as f:
+            json.dump(meta, f)
+        os.replace(tmp, os.path.join(folder, "meta.json"))
+
+    def _lock(self, ticker, interval):
+        key = (ticker.upper(), interval)
+        with self._locks_guard:
+            return self._locks.setdefault(key, threading.Lock())
@@ -0,0 +1,283 @@
+import contextvars
+import threading
+import zlib
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+# What option_chain() returns (the fields of yfinance's Options namedtuple we use)
+OptionChain = namedtuple("OptionChain", ["calls", "puts", "underlying"])
+
+# yf.Ticker objects shared by the calls of one FetchCoordinator (None outside of one)
+render_tickers = contextvars.ContextVar("render_tickers", default=None)
+
+
+class DataProvider:
+    """
+    Where market data comes from. utils.market_data calls these and does the
+    caching, coalescing and error handling; providers just fetch.
+    Errors are raised, not swallowed.
+    """
+    name = "base"
+
+    def history(self, ticker, interval="1d", start=None, period=None):
+        """
+        OHLCV bars indexed by date, from 'start' onwards or for a whole 'period'.
+        """
+        raise NotImplementedError
+
+    def info(self, ticker):
+        """
+        Fundamentals dict with yfinance's keys (longName, marketCap, trailingPE, ...).
+        """
+        raise NotImplementedError
+
+    def quote(self, ticker):
+        """
+        Latest quote: dict with last_price, previous_close and last_volume.
+        """
+        raise NotImplementedError
+
+    def option_expiries(self, ticker):
+        """
+        Listed expiries as 'YYYY-MM-DD' strings, nearest first.
+        """
+        raise NotImplementedError
+
+    def option_chain(self, ticker, expiry):
+        """
+        OptionChain(calls, puts, underlying) for one expiry.
+        """
+        raise NotImplementedError
+
+    def exchange_rate(self, currency):
+        """
+        Units of 'currency' per USD.
+        """
+        raise NotImplementedError
+
+
+class YahooProvider(DataProvider):
+    """
+    Live data from Yahoo Finance through yfinance.
+    """
+    name = "yahoo"
+
+    def _ticker(self, symbol):
+        """
+        yf.Ticker for 'symbol', reused across calls inside a FetchCoordinator.
+        """
+        import yfinance as yf  # deferred: only needed once something isn't served from a cache
+
+        shared = render_tickers.get()
+        if shared is None:
+            return yf.Ticker(symbol)
+        tickers, lock = shared
+        with lock:
+            if symbol not in tickers:
+                tickers[symbol] = yf.Ticker(symbol)
+            return tickers[symbol]
+
+    def history(self, ticker, interval="1d", start=None, period=None):
+        stock = self._ticker(ticker)
+        if start is not None:
+            return stock.history(start=start, interval=interval)
+        return stock.history(period=period or "max", interval=interval)
+
+    def info(self, ticker):
+        return self._ticker(ticker).info or {}
+
+    def quote(self, ticker):
+        fast_info = self._ticker(ticker).fast_info
+        return {
+            "last_price": fast_info.last_price,
+            "previous_close": fast_info.previous_close,
+            "last_volume": fast_info.last_volume,
+        }
+
+    def option_expiries(self, ticker):
+        return self._ticker(ticker).options
+
+    def option_chain(self, ticker, expiry):
+        return self._ticker(ticker).option_chain(expiry)
+
+    def exchange_rate(self, currency):
+        # Yahoo Finance symbols for currency are like 'EUR=X', 'INR=X'; fast_info is reliable for them
+        return self._ticker(f"{currency}=X").fast_info.last_price
+
+
+class SyntheticProvider(DataProvider):
+    """
+    Deterministic offline market: every ticker gets its own geometric Brownian
+    motion path (drift, volatility and starting price drawn from a seed derived
+    from the ticker), option chains priced with Black-Scholes on a volatility smile,
+    and fixed FX rates. The same seed always gives the same data, and a bar's values
+    don't depend on 'end', so histories can grow without changing the past.
+    """
+    name = "synthetic"
+
+    ORIGIN = pd.Timestamp("2000-01-03")
+    FX_RATES = {"USD": 1.0, "INR": 83.0, "EUR": 0.92, "GBP": 0.79, "CAD": 1.36}
+
+    def __init__(self, seed=0, end=None, tz="America/New_York", fx_rates=None, expiries=8):
+        self.seed = seed
+        self.end = pd.Timestamp(end) if end is not None else None
+        self.tz = tz
+        self.fx_rates = dict(self.FX_RATES, **(fx_rates or {}))
+        self.expiries = expiries
+        self._paths = {}
+        self._lock = threading.Lock()
+
+    def _rng(self, ticker, stream=0):
+        return np.random.default_rng([self.seed, zlib.crc32(ticker.upper().encode()), stream])
+
+    def _last_date(self):
+        end = self.end if self.end is not None else pd.Timestamp.now()
+        return end.normalize()
+
+    def bars(self, ticker):
+        """
+        The whole daily path from ORIGIN to the last date, cached per ticker.
+        """
+        last = self._last_date()
+        key = (ticker.upper(), last)
+        with self._lock:
+            df = self._paths.get(key)
+        if df is not None:
+            return df
+
+        index = pd.bdate_range(self.ORIGIN, last, name="Date")
+        n = len(index)
+        params = self._rng(ticker, 0)
+        drift = params.uniform(-0.02, 0.12)
+        vol = params.uniform(0.15, 0.6)
+        price0 = params.uniform(10, 200)
+        volume0 = params.uniform(5e5, 5e7)
+
+        # Chunked draws keep earlier bars identical however long the path gets
+        chunk, draws = 4096, []
+        for block in range(0, n, chunk):
+            rng = self._rng(ticker, 1 + block // chunk)
+            draws.append(rng.standard_normal((chunk, 4)))
+        z = np.concatenate(draws)[:n] if draws else np.zeros((0, 4))
+
+        dt = 1.0 / 252
+        log_ret = (drift - 0.5 * vol * vol) * dt + vol * np.sqrt(dt) * z[:, 0]
+        close = price0 * np.exp(np.cumsum(log_ret))
+        prev = np.concatenate([[price0], close[:-1]])
+        open_ = prev * np.exp(0.25 * vol * np.sqrt(dt) * z[:, 1])
+        spread = np.abs(z[:, 2]) * 0.5 * vol * np.sqrt(dt)
+        high = np.maximum(open_, close) * (1 + spread)
+        low = np.minimum(open_, close) * (1 - spread)
+        volume = np.round(volume0 * np.exp(0.3 * z[:, 3]))
+
+        df = pd.DataFrame({
+            "Open": open_, "High": high, "Low": low, "Close": close, "Volume": volume,
+            "Dividends": 0.0, "Stock Splits": 0.0,
+        }, index=index.tz_localize(self.tz) if self.tz else index)
+        with self._lock:
+            self._paths[key] = df
+        return df
+
+    def history(self, ticker, interval="1d", start=None, period=None):
+        from utils.price_store import period_start
+
+        df = self.bars(ticker)
+        if interval in ("1wk", "1mo", "3mo"):
+            rule = {"1wk": "W-FRI", "1mo": "ME", "3mo": "QE"}[interval]
+            df = df.resample(rule).agg({"Open": "first", "High": "max", "Low": "min", "Close": "last",
+                                        "Volume": "sum", "Dividends": "sum", "Stock Splits": "sum"}).dropna()
+        elif interval != "1d":
+            raise ValueError(f"synthetic data has no {interval} bars")
+
+        if start is None and period not in (None, "max"):
+            start = period_start(period, now=df.index[-1] if len(df) else None)
+        if start is not None:
+            start = pd.Timestamp(start)
+            if df.index.tz is not None and start.tz is None:
+                start = start.tz_localize(df.index.tz)
+            df = df[df.index >= start]
+        return df.copy()
+
+    def info(self, ticker):
+        df = self.bars(ticker)
+        year = df["Close"].iloc[-252:]
+        shares = self._rng(ticker, 0).uniform(5e7, 5e9)
+        price = float(df["Close"].iloc[-1])
+        return {
+            "symbol": ticker.upper(),
+            "longName": f"{ticker.upper()} Synthetic Corp.",
+            "longBusinessSummary": f"Simulated company for offline runs (seed {self.seed}).",
+            "sector": "Synthetic",
+            "industry": "Simulation",
+            "marketCap": price * shares,
+            "trailingPE": float(self._rng(ticker, 0).uniform(8, 60)),
+            "fiftyTwoWeekHigh": float(year.max()),
+            "fiftyTwoWeekLow": float(year.min()),
+            "currency": "USD",
+        }
+
+    def quote(self, ticker):
+        df = self.bars(ticker)
+        return {
+            "last_price": float(df["Close"].iloc[-1]),
+            "previous_close": float(df["Close"].iloc[-2]),
+            "last_volume": int(df["Volume"].iloc[-1]),
+        }
+
+    def option_expiries(self, ticker):
+        # Weekly Fridays after the last bar
+        fridays = pd.date_range(self._last_date() + pd.Timedelta(days=1), periods=self.expiries, freq="W-FRI")
+        return tuple(f"{d:%Y-%m-%d}" for d in fridays)
+
+    def option_chain(self, ticker, expiry):
+        from utils.options import black_scholes
+
+        if expiry not in self.option_expiries(ticker):
+            raise ValueError(f"no {expiry} expiry for {ticker}")
+        bars = self.bars(ticker)
+        spot = float(bars["Close"].iloc[-1])
+        expiry_ts = pd.Timestamp(expiry)
+        years = max((expiry_ts - self._last_date()).days, 1) / 365.0
+        rng = self._rng(ticker, 10_000 + zlib.crc32(expiry.encode()) % 10_000)
+
+        # Strikes on a 'nice' step around spot, +-40%
+        step = 10 ** np.floor(np.log10(spot)) / (4 if spot / 10 ** np.floor(np.log10(spot)) < 5 else 2)
+        strikes = np.arange(np.floor(spot * 0.6 / step), np.ceil(spot * 1.4 / step) + 1) * step
+        moneyness = np.log(strikes / spot)
+        base_vol = float(np.std(np.diff(np.log(bars["Close"].to_numpy()[-63:]))) * np.sqrt(252))
+        iv = np.maximum(base_vol * (1 + 1.5 * moneyness ** 2 - 0.3 * moneyness), 0.05)
+        # Open interest peaks at the money
+        oi_shape = np.exp(-(moneyness / 0.15) ** 2)
+
+        frames = []
+        for kind in ("call", "put"):
+            is_call = kind == "call"
+            price = black_scholes(spot, strikes, np.full(len(strikes), years), iv, is_call)["theoPrice"]
+            price = np.maximum(price, 0.01)
+            half_spread = np.maximum(price * 0.02, 0.01)
+            frames.append(pd.DataFrame({
+                "contractSymbol": [f"{ticker.upper()}{expiry_ts:%y%m%d}{kind[0].upper()}{int(k * 1000):08d}" for k in strikes],
+                "strike": strikes,
+                "lastPrice": np.round(price, 2),
+                "bid": np.round(price - half_spread, 2),
+                "ask": np.round(price + half_spread, 2),
+                "volume": np.round(oi_shape * rng.uniform(50, 5000, len(strikes))),
+                "openInterest": np.round(oi_shape * rng.uniform(500, 50000, len(strikes))),
+                "impliedVolatility": iv,
+                "inTheMoney": strikes < spot if is_call else strikes > spot,
+            }))
+        return OptionChain(frames[0], frames[1], {"regularMarketPrice": spot})
+
+    def exchange_rate(self, currency):
+        if currency not in self.fx_rates:
+            raise KeyError(f"no synthetic FX rate for {currency}")
+        return self.fx_rates[currency]
+
+
+PROVIDERS = {"yahoo": YahooProvider, "synthetic": SyntheticProvider}
+
+
+def make_provider(name, **kwargs):
+    return PROVIDERS[name](**kwargs)
@@ -0,0 +1,127 @@
+import json
+import os
+import threading
+
+import numpy as np
+
+from utils.model_store import ModelStore
+
+
+class MinMaxScaling:
+    """
+    Fitted min/max scaling, stored as plain arrays (one value per feature).
+    Same maths and scaler.json format as sklearn's MinMaxScaler, but transforming
+    a 100-value window is a single in-place multiply-add instead of a refit.
+    'ticker' records which series the parameters were fitted on (None = any).
+    """
+    def __init__(self, data_min, data_max, feature_range=(0, 1), ticker=None):
+        self.data_min = np.atleast_1d(np.asarray(data_min, dtype=np.float64))
+        self.data_max = np.atleast_1d(np.asarray(data_max, dtype=np.float64))
+        self.feature_range = tuple(float(v) for v in feature_range)
+        self.ticker = ticker
+        data_range = self.data_max - self.data_min
+        data_range[data_range == 0] = 1.0  # constant features, as sklearn does
+        lo, hi = self.feature_range
+        # scaled = x * scale + offset
+        self.scale = (hi - lo) / data_range
+        self.offset = lo - self.data_min * self.scale
+
+    @classmethod
+    def fit(cls, values, feature_range=(0, 1), ticker=None):
+        values = np.asarray(values, dtype=np.float64)
+        if values.ndim == 1:
+            values = values[:, np.newaxis]
+        return cls(np.nanmin(values, axis=0), np.nanmax(values, axis=0), feature_range, ticker)
+
+    @property
+    def low(self):
+        # Price that maps to 0 (first feature); x_scaled = (x - low) / span
+        return -self.offset[0] / self.scale[0]
+
+    @property
+    def span(self):
+        return 1.0 / self.scale[0]
+
+    def transform(self, x, out=None):
+        """
+        Scales x (last axis = features, or 1-D for a single feature). Pass out=x to
+        scale in place without allocating.
+        """
+        scale, offset = self._params(x)
+        out = np.multiply(x, scale, out=out)
+        out += offset
+        return out
+
+    def inverse_transform(self, y, out=None):
+        scale, offset = self._params(y)
+        out = np.subtract(y, offset, out=out)
+        out /= scale
+        return out
+
+    def _params(self, x):
+        if np.ndim(x) == 1 or np.shape(x)[-1] != len(self.scale):
+            return self.scale[0], self.offset[0]
+        return self.scale, self.offset
+
+    def to_dict(self):
+        params = {
+            "feature_range": list(self.feature_range),
+            "data_min": self.data_min.tolist(),
+            "data_max": self.data_max.tolist(),
+        }
+        if self.ticker:
+            params["ticker"] = self.ticker
+        return params
+
+    @classmethod
+    def from_dict(cls, params):
+        return cls(params["data_min"], params["data_max"],
+                   params.get("feature_range", (0, 1)), params.get("ticker"))
+
+    def save(self, path):
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.to_dict(), f, indent=2)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            return cls.from_dict(json.load(f))
+
+
+def scaler_path(model_path):
+    """
+    Where the scaling parameters of a model live: scaler.json inside a model store
+    version folder, otherwise a '<model>.scaler.json' sidecar next to the file.
+    """
+    if os.path.basename(model_path) == ModelStore.MODEL_FILE:
+        return os.path.join(os.path.dirname(model_path), ModelStore.SCALER_FILE)
+    return os.path.splitext(model_path)[0] + ".scaler.json"
+
+
+_loaded = {}  # path -> (mtime, MinMaxScaling)
+_loaded_lock = threading.Lock()
+
+
+def load_for_model(model_path):
+    """
+    Persisted scaling of a model artifact, or None if it was saved without one.
+    Parsed once per file version.
+    """
+    path = scaler_path(model_path)
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return None
+    with _loaded_lock:
+        cached = _loaded.get(path)
+        if cached and cached[0] == mtime:
+            return cached[1]
+    try:
+        scaling = MinMaxScaling.load(path)
+    except (OSError, ValueError, KeyError):
+        return None
+    with _loaded_lock:
+        _loaded[path] = (mtime, scaling)
+    return scaling
@@ -0,0 +1,159 @@
+import numpy as np
+import pandas as pd
+
+from utils.indicators import compute_indicators
+from utils.telemetry import traced
+
+# First bar (0-based, counted from each ticker's own start) where each column is defined
+WARMUP = {
+    'SMA_20': 19, 'SMA_50': 49, 'SMA_200': 199, 'RSI': 13,
+    'BB_Middle': 19, 'BB_Std': 19, 'BB_Upper': 19, 'BB_Lower': 19,
+}
+
+# Event labels, matching the check_signals wording
+EVENTS = {
+    'overbought': 'RSI Overbought (Potential Sell)',
+    'oversold': 'RSI Oversold (Potential Buy)',
+    'golden_cross': 'Golden Cross',
+    'death_cross': 'Death Cross',
+    'macd_bullish': 'MACD Bullish Crossover',
+    'macd_bearish': 'MACD Bearish Crossover',
+}
+
+
+def build_panel(frames, lookback=None):
+    """
+    Packs many tickers' closes into one (tickers, bars) array.
+    Rows are right-aligned so the last column is every ticker's latest bar; shorter
+    histories are padded on the left with their first close (so running sums stay
+    finite) and 'length' records how many bars are real. Tickers with missing
+    closes are dropped. 'lookback' keeps only the last N bars.
+    """
+    tickers, closes, dates = [], [], []
+    for ticker, df in frames.items():
+        if df is None or df.empty:
+            continue
+        close = df['Close'].to_numpy(dtype=np.float64)
+        if not np.isfinite(close).all():
+            continue
+        index = df.index
+        if getattr(index, 'tz', None) is not None:
+            index = index.tz_localize(None)
+        if lookback:
+            close, index = close[-lookback:], index[-lookback:]
+        tickers.append(ticker)
+        closes.append(close)
+        dates.append(np.asarray(index, dtype='datetime64[ns]'))
+
+    width = max((len(c) for c in closes), default=0)
+    panel = np.empty((len(tickers), width))
+    panel_dates = np.full((len(tickers), width), np.datetime64('NaT'), dtype='datetime64[ns]')
+    length = np.array([len(c) for c in closes], dtype=np.int64)
+    for i, (close, index) in enumerate(zip(closes, dates)):
+        pad = width - len(close)
+        panel[i, :pad] = close[0]
+        panel[i, pad:] = close
+        panel_dates[i, pad:] = index
+    return {'tickers': tickers, 'close': panel, 'dates': panel_dates, 'length': length}
+
+
+def panel_indicators(panel):
+    """
+    compute_indicators over the whole panel, with values that depend on padding
+    set to NaN, so every row matches add_technical_indicators on that ticker alone.
+    """
+    values = compute_indicators(panel['close'])
+    width = panel['close'].shape[1]
+    # Bar number of each column within its own ticker's history (negative = padding)
+    bar = np.arange(width) - (width - panel['length'])[:, np.newaxis]
+    return {column: np.where(bar >= WARMUP.get(column, 0), v, np.nan)
+            for column, v in values.items()}
+
+
+def signal_masks(values):
+    """
+    The check_signals rules as boolean (tickers, bars) arrays, evaluated at every bar.
+    State masks: overbought_zone, oversold_zone, bullish_trend, macd_above.
+    Event masks (true on the bar something happened): see EVENTS.
+    """
+    rsi, macd, signal = values['RSI'], values['MACD'], values['Signal_Line']
+    sma_50, sma_200 = values['SMA_50'], values['SMA_200']
+
+    def prev(a):
+        return np.concatenate([np.full(a.shape[:-1] + (1,), np.nan), a[..., :-1]], axis=-1)
+
+    with np.errstate(invalid='ignore'):
+        overbought = rsi > 70
+        oversold = rsi < 30
+        bullish = sma_50 > sma_200
+        p_macd, p_signal = prev(macd), prev(signal)
+        p_rsi, p_50, p_200 = prev(rsi), prev(sma_50), prev(sma_200)
+        return {
+            'overbought_zone': overbought,
+            'oversold_zone': oversold,
+            'bullish_trend': bullish,
+            'macd_above': macd > signal,
+            'overbought': overbought & (p_rsi <= 70),
+            'oversold': oversold & (p_rsi >= 30),
+            'golden_cross': bullish & (p_50 <= p_200),
+            'death_cross': (sma_50 < sma_200) & (p_50 >= p_200),
+            'macd_bullish': (macd > signal) & (p_macd <= p_signal),
+            'macd_bearish': (macd < signal) & (p_macd >= p_signal),
+        }
+
+
+@traced("screener.scan")
+def scan(frames, lookback=None, since=None, min_bars=200):
+    """
+    Runs the signal rules over every ticker's full history in one pass.
+    Returns (events, state):
+    - events: one row per signal (Ticker, Date, Signal, Close), newest first,
+      optionally only those on or after 'since'.
+    - state: the check_signals view of each ticker's latest bar plus a simple
+      Score (+1 per bullish condition, -1 per bearish one), best first. Tickers
+      with fewer than 'min_bars' bars are left out, as in check_signals.
+    """
+    panel = build_panel(frames, lookback=lookback)
+    if not panel['tickers']:
+        return (pd.DataFrame(columns=['Ticker', 'Date', 'Signal', 'Close']),
+                pd.DataFrame(columns=['Close', 'RSI', 'RSI_Status', 'Trend', 'MACD_Cross', 'Score']))
+
+    values = panel_indicators(panel)
+    masks = signal_masks(values)
+    tickers = np.array(panel['tickers'], dtype=object)
+
+    # Events: nonzero positions of every event mask
+    parts = []
+    for key, label in EVENTS.items():
+        rows, cols = np.nonzero(masks[key])
+        parts.append((rows, cols, np.full(len(rows), label, dtype=object)))
+    rows = np.concatenate([p[0] for p in parts])
+    cols = np.concatenate([p[1] for p in parts])
+    events = pd.DataFrame({
+        'Ticker': tickers[rows],
+        'Date': panel['dates'][rows, cols],
+        'Signal': np.concatenate([p[2] for p in parts]),
+        'Close': panel['close'][rows, cols],
+    })
+    if since is not None:
+        events = events[events['Date'] >= pd.Timestamp(since)]
+    events = events.sort_values(['Date', 'Ticker'], ascending=[False, True], ignore_index=True)
+
+    # Current state: last column of every mask
+    last = {key: m[:, -1].astype(int) for key, m in masks.items()}
+    state = pd.DataFrame({
+        'Close': panel['close'][:, -1],
+        'RSI': values['RSI'][:, -1],
+        'RSI_Status': np.select([last['overbought_zone'] == 1, last['oversold_zone'] == 1],
+                                ['Overbought (Potential Sell)', 'Oversold (Potential Buy)'], 'Neutral'),
+        'Trend': np.where(last['bullish_trend'] == 1, 'Bullish (Golden Cross Area)', 'Bearish'),
+        'MACD_Cross': np.select([last['macd_bullish'] == 1, last['macd_bearish'] == 1],
+                                ['Bullish Crossover', 'Bearish Crossover'], 'None'),
+        'Score': (last['oversold_zone'] - last['overbought_zone']
+                  + 2 * last['bullish_trend'] - 1
+                  + 2 * last['macd_above'] - 1
+                  + last['macd_bullish'] - last['macd_bearish']),
+    }, index=pd.Index(tickers, name='Ticker'))
+    state = state[panel['length'] >= min_bars]
+    state = state.sort_values(['Score', 'RSI'], ascending=[False, True])
+    return events, state
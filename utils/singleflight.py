@@ -0,0 +1,107 @@
+import functools
+import threading
+
+
+class _Call:
+    __slots__ = ("event", "result", "error", "waiters")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Merges identical in-flight calls: while fn is running for a key, other threads
+    (other Streamlit sessions) asking for the same key wait for that call and get
+    its result (or its exception) instead of starting their own. Nothing is kept
+    once the call finishes; caching is the TTL caches' job.
+    'clone' gives each waiter its own copy of mutable results (e.g. DataFrames).
+    """
+    def __init__(self, name=None, clone=None):
+        self.name = name
+        self.clone = clone
+        self._calls = {}
+        self._lock = threading.Lock()
+        self._counters = {"calls": 0, "executions": 0, "coalesced": 0, "errors": 0, "max_waiters": 0}
+
+    def do(self, key, fn):
+        with self._lock:
+            self._counters["calls"] += 1
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self._counters["executions"] += 1
+            else:
+                call.waiters += 1
+                self._counters["coalesced"] += 1
+                self._counters["max_waiters"] = max(self._counters["max_waiters"], call.waiters)
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return self.clone(call.result) if self.clone else call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            with self._lock:
+                self._counters["errors"] += 1
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+
+    def in_flight(self):
+        with self._lock:
+            return len(self._calls)
+
+    def stats(self):
+        """
+        Calls, upstream executions and how many calls were served by another's execution.
+        """
+        with self._lock:
+            stats = dict(self._counters, in_flight=len(self._calls), name=self.name)
+        stats["coalesce_rate"] = stats["coalesced"] / stats["calls"] if stats["calls"] else 0.0
+        return stats
+
+
+_groups = {}
+_groups_lock = threading.Lock()
+
+
+def get_group(name, clone=None):
+    with _groups_lock:
+        if name not in _groups:
+            _groups[name] = SingleFlight(name, clone=clone)
+        return _groups[name]
+
+
+def singleflight(name, clone=None):
+    """
+    Decorator coalescing concurrent calls with identical arguments into one.
+    """
+    def decorator(fn):
+        group = get_group(name, clone=clone)
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            key = (fn.__name__, args, tuple(sorted(kwargs.items())))
+            return group.do(key, lambda: fn(*args, **kwargs))
+
+        wrapper.group = group
+        return wrapper
+    return decorator
+
+
+def singleflight_stats():
+    with _groups_lock:
+        groups = list(_groups.values())
+    return {group.name: group.stats() for group in groups}
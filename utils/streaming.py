@@ -0,0 +1,486 @@
+import os
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from utils import telemetry
+from utils.indicator_engine import IndicatorState
+from utils.indicators import INDICATOR_COLUMNS
+from utils.telemetry import span
+
+# Bar length of the live stream (seconds), and how often the shared poller asks the feed for ticks
+BAR_SECONDS = int(os.environ.get("STREAM_BAR_SECONDS", "60"))
+POLL_SECONDS = float(os.environ.get("STREAM_POLL_SECONDS", "2"))
+# How often a live panel redraws (seconds)
+REFRESH_SECONDS = float(os.environ.get("STREAM_REFRESH_SECONDS", "2"))
+# Bars kept per symbol (a 6.5 hour session of 1 minute bars is 390)
+CAPACITY = 2000
+# A symbol no session has looked at for this long stops being polled
+IDLE_SECONDS = 120
+# Feed calls in flight at once
+POLL_WORKERS = 8
+
+OHLCV = ["Open", "High", "Low", "Close", "Volume"]
+BAR_DTYPE = np.dtype([("ts", "<M8[ns]")] + [(c, "<f8") for c in OHLCV + INDICATOR_COLUMNS])
+
+# Yahoo intraday intervals, by bar length in seconds
+YAHOO_INTERVALS = {60: "1m", 120: "2m", 300: "5m", 900: "15m", 1800: "30m", 3600: "60m"}
+
+_NO_TICKS = (np.empty(0, dtype=np.int64), np.empty(0), np.empty(0))
+
+
+def ticks_to_bars(ts, price, volume, bar_seconds=BAR_SECONDS):
+    """
+    OHLCV bars (indexed by bar start, UTC) from tick arrays; ts in epoch nanoseconds.
+    """
+    if len(ts) == 0:
+        return pd.DataFrame(columns=OHLCV, index=pd.DatetimeIndex([], tz="UTC", name="Datetime"))
+    bucket = ts // (bar_seconds * 10**9) * (bar_seconds * 10**9)
+    starts = np.flatnonzero(np.diff(bucket, prepend=bucket[0] - 1))
+    ends = np.append(starts[1:], len(ts)) - 1
+    return pd.DataFrame({
+        "Open": price[starts],
+        "High": np.maximum.reduceat(price, starts),
+        "Low": np.minimum.reduceat(price, starts),
+        "Close": price[ends],
+        "Volume": np.add.reduceat(volume, starts),
+    }, index=pd.DatetimeIndex(bucket[starts], tz="UTC", name="Datetime"))
+
+
+class RingBuffer:
+    """
+    The latest 'capacity' rows of a structured array, preallocated once.
+    'seq' counts every row ever appended, so readers can ask for what they
+    haven't seen yet. Not locked; SymbolStream guards it.
+    """
+    def __init__(self, capacity=CAPACITY, dtype=BAR_DTYPE):
+        self.rows = np.zeros(capacity, dtype=dtype)
+        self.capacity = capacity
+        self.seq = 0
+
+    def __len__(self):
+        return min(self.seq, self.capacity)
+
+    def append(self, row):
+        self.rows[self.seq % self.capacity] = row
+        self.seq += 1
+
+    def set_last(self, row):
+        self.rows[(self.seq - 1) % self.capacity] = row
+
+    def last(self):
+        return self.rows[(self.seq - 1) % self.capacity] if self.seq else None
+
+    def since(self, seq=0):
+        """
+        Copy of the rows numbered seq onwards (or the oldest still held), oldest first.
+        """
+        first = max(seq, self.seq - self.capacity)
+        if first >= self.seq:
+            return self.rows[:0].copy()
+        positions = np.arange(first, self.seq) % self.capacity
+        return self.rows[positions]
+
+
+class SymbolStream:
+    """
+    Live bars of one symbol, shared by every session watching it. Ticks update
+    the forming bar; when a bar closes its indicators are committed to an
+    IndicatorState in O(1), and the forming bar is evaluated on a copy of that
+    state (as IndicatorEngine does for daily bars). The last row of the buffer
+    is the forming bar while one is open.
+    """
+    def __init__(self, ticker, bar_seconds=BAR_SECONDS, capacity=CAPACITY):
+        self.ticker = ticker
+        self.bar_ns = bar_seconds * 10**9
+        self.buffer = RingBuffer(capacity)
+        self.state = IndicatorState()
+        self.closed = 0  # bars closed so far
+        self.forming = None  # [bucket, open, high, low, close, volume] of the open bar
+        self.ticks = 0
+        self.last_tick = None
+        self._lock = threading.Lock()
+        self._forecast_lock = threading.Lock()
+        self._forecast = (None, None)  # (closed bars it was made at, result)
+        # Set once backfilled; the poller leaves the stream alone until then
+        self.ready = threading.Event()
+
+    def backfill(self, bars, now_ns):
+        """
+        Seeds the stream with earlier bars (a DataFrame like ticks_to_bars returns).
+        A bar still open at 'now_ns' becomes the forming bar. Bars at or before
+        the newest one already held (including a forming bar) are dropped, so the
+        buffer stays in time order.
+        """
+        if bars is None or bars.empty:
+            return
+        index = bars.index if bars.index.tz is not None else bars.index.tz_localize("UTC")
+        ts = index.tz_convert("UTC").tz_localize(None).values.astype("datetime64[ns]").astype(np.int64)
+        values = bars[OHLCV].to_numpy(dtype=np.float64)
+        current = now_ns // self.bar_ns * self.bar_ns
+        with self._lock:
+            newest = self.buffer.last()["ts"].astype(np.int64) if self.buffer.seq else None
+            for bucket, (o, h, l, c, v) in zip(ts[-self.buffer.capacity:], values[-self.buffer.capacity:]):
+                if not np.isfinite(c) or (newest is not None and bucket <= newest):
+                    continue
+                if bucket >= current:
+                    self.forming = [bucket, o, h, l, c, v]
+                    self.buffer.append(self._row(self.forming, self.state.copy().update(c)))
+                else:
+                    self.buffer.append(self._row([bucket, o, h, l, c, v], self.state.update(c)))
+                    self.closed += 1
+
+    def on_ticks(self, ts, price, volume):
+        """
+        Folds new ticks (epoch ns, price, volume) into the bars.
+        """
+        if len(ts) == 0:
+            return
+        with self._lock:
+            for t, p, v in zip(ts.tolist(), price.tolist(), volume.tolist()):
+                if not np.isfinite(p):
+                    continue
+                bucket = t // self.bar_ns * self.bar_ns
+                if self.forming is not None and bucket < self.forming[0]:
+                    continue  # late tick for a bar that already closed
+                if self.forming is not None and bucket > self.forming[0]:
+                    self._close_forming()
+                if self.forming is None:
+                    if self.buffer.seq and bucket <= self.buffer.last()["ts"].astype(np.int64):
+                        continue
+                    self.forming = [bucket, p, p, p, p, v]
+                    self.buffer.append(self._row(self.forming, {}))
+                else:
+                    bar = self.forming
+                    bar[2], bar[3], bar[4], bar[5] = max(bar[2], p), min(bar[3], p), p, bar[5] + v
+            self.ticks += len(ts)
+            self.last_tick = int(ts[-1])
+            if self.forming is not None:
+                # One state copy per poll, not per tick
+                self.buffer.set_last(self._row(self.forming, self.state.copy().update(self.forming[4])))
+
+    def roll(self, now_ns):
+        """
+        Closes the forming bar once its time is up, even if no later tick arrived.
+        """
+        with self._lock:
+            if self.forming is not None and now_ns // self.bar_ns * self.bar_ns > self.forming[0]:
+                self._close_forming()
+
+    def _close_forming(self):
+        # Caller holds self._lock
+        self.buffer.set_last(self._row(self.forming, self.state.update(self.forming[4])))
+        self.forming = None
+        self.closed += 1
+
+    @staticmethod
+    def _row(bar, values):
+        return (np.datetime64(int(bar[0]), "ns"), *bar[1:6], *(values.get(c, np.nan) for c in INDICATOR_COLUMNS))
+
+    def updates(self, closed_seen):
+        """
+        What a viewer that has drawn 'closed_seen' closed bars is missing: the
+        later closed bars plus the forming one. Returns (rows, closed bars so far,
+        whether the last row is still forming).
+        """
+        with self._lock:
+            return self.buffer.since(closed_seen), self.closed, self.forming is not None
+
+    def frame(self, closed_only=False):
+        """
+        Bars with their indicators as a DataFrame (UTC index), as the batch
+        functions (charts, AIEngine) expect.
+        """
+        with self._lock:
+            rows = self.buffer.since(0)
+            if closed_only and self.forming is not None:
+                rows = rows[:-1]
+        return rows_to_frame(rows)
+
+    def forecast(self, predict):
+        """
+        predict(closed bars) re-run only when a bar has closed since the last call;
+        concurrent sessions wait for the one run and share its result.
+        """
+        with self._forecast_lock:
+            closed = self.closed
+            at, result = self._forecast
+            if at != closed:
+                frame = self.frame(closed_only=True)
+                result = predict(frame) if len(frame) else None
+                self._forecast = (closed, result)
+            return result
+
+    def stats(self):
+        with self._lock:
+            return {"bars": len(self.buffer), "closed": self.closed, "ticks": self.ticks,
+                    "last_tick": self.last_tick}
+
+
+def rows_to_frame(rows):
+    index = pd.DatetimeIndex(rows["ts"], name="Datetime").tz_localize("UTC")
+    return pd.DataFrame({c: rows[c] for c in OHLCV + INDICATOR_COLUMNS}, index=index)
+
+
+class Feed:
+    """
+    Where live ticks come from. ticks(ticker) returns what arrived since the
+    previous call as (epoch ns, price, volume) arrays; backfill() returns the
+    session's earlier bars if the source has them. A websocket client fits the
+    same shape: buffer messages as they arrive and hand them out from ticks().
+    """
+    clock = staticmethod(time.time)
+
+    def ticks(self, ticker):
+        raise NotImplementedError
+
+    def backfill(self, ticker, bar_seconds=BAR_SECONDS, bars=CAPACITY):
+        return None
+
+
+class QuoteFeed(Feed):
+    """
+    Polls a DataProvider's latest quote: one tick per poll, with the volume traded
+    since the previous poll.
+    """
+    def __init__(self, provider):
+        self.provider = provider
+        self._volumes = {}
+
+    def ticks(self, ticker):
+        quote = self.provider.quote(ticker)
+        price = quote.get("last_price")
+        if price is None or not np.isfinite(price):
+            return _NO_TICKS
+        day_volume = float(quote.get("last_volume") or 0)
+        previous = self._volumes.get(ticker)
+        self._volumes[ticker] = day_volume
+        volume = max(day_volume - previous, 0.0) if previous is not None else 0.0
+        return np.array([time.time_ns()]), np.array([float(price)]), np.array([volume])
+
+    def backfill(self, ticker, bar_seconds=BAR_SECONDS, bars=CAPACITY):
+        interval = YAHOO_INTERVALS.get(bar_seconds)
+        if interval is None:
+            return None
+        df = self.provider.history(ticker, interval=interval, period="5d" if bars > 390 else "1d")
+        return df[OHLCV].tail(bars) if df is not None and not df.empty else None
+
+
+class SyntheticFeed(Feed):
+    """
+    Local stand-in feed: a deterministic random walk of ticks every 'tick_seconds'
+    of wall clock (or of 'clock', for simulated time), starting from the provider's
+    last close. The ticks are the same however often they are polled.
+    """
+    BLOCK = 4096
+
+    def __init__(self, provider=None, seed=0, tick_seconds=1.0, vol=0.6, warmup_seconds=6.5 * 3600, clock=None):
+        self.provider = provider
+        self.seed = seed
+        self.tick_seconds = tick_seconds
+        # Annual volatility spread over the ticks of 252 trading days of 6.5 hours
+        self.sigma = vol * np.sqrt(tick_seconds / (252 * 6.5 * 3600))
+        self.warmup_ticks = int(warmup_seconds / tick_seconds)
+        if clock is not None:
+            self.clock = clock
+        self._cursors = {}  # ticker -> (last tick number, price)
+        self._lock = threading.Lock()
+
+    def _tick_number(self):
+        return int(self.clock() // self.tick_seconds)
+
+    def _start(self, ticker):
+        price = 100.0
+        if self.provider is not None:
+            try:
+                price = float(self.provider.quote(ticker)["last_price"])
+            except Exception as e:
+                telemetry.record_error("stream.feed", e)
+        return self._tick_number() - self.warmup_ticks, price
+
+    def _walk(self, ticker, until):
+        with self._lock:
+            cursor = self._cursors.get(ticker)
+            if cursor is None:
+                cursor = self._start(ticker)
+            k, price = cursor
+            if until <= k:
+                return _NO_TICKS
+            ks = np.arange(k + 1, until + 1, dtype=np.int64)
+            blocks = ks // self.BLOCK
+            draws = np.empty((len(ks), 2))
+            crc = zlib.crc32(ticker.upper().encode())
+            for block in np.unique(blocks):
+                rng = np.random.default_rng([self.seed, crc, int(block)])
+                z = rng.standard_normal((self.BLOCK, 2))
+                mask = blocks == block
+                draws[mask] = z[ks[mask] % self.BLOCK]
+            prices = price * np.exp(np.cumsum(self.sigma * draws[:, 0]))
+            volume = np.round(np.exp(6 + 0.5 * draws[:, 1]))
+            self._cursors[ticker] = (until, float(prices[-1]))
+        ts = (ks.astype(np.float64) * self.tick_seconds * 1e9).astype(np.int64)
+        return ts, prices, volume
+
+    def ticks(self, ticker):
+        return self._walk(ticker, self._tick_number())
+
+    def backfill(self, ticker, bar_seconds=BAR_SECONDS, bars=CAPACITY):
+        return ticks_to_bars(*self._walk(ticker, self._tick_number()), bar_seconds=bar_seconds).tail(bars)
+
+
+def make_feed(provider):
+    from utils.providers import SyntheticProvider
+    if isinstance(provider, SyntheticProvider):
+        return SyntheticFeed(provider, seed=provider.seed)
+    return QuoteFeed(provider)
+
+
+class StreamHub:
+    """
+    One background poller for every live symbol in the process. Sessions call
+    watch() on each redraw; a symbol is polled once per interval however many
+    sessions watch it, and dropped when nobody has watched it for 'idle_seconds'.
+    """
+    def __init__(self, feed, poll_seconds=POLL_SECONDS, bar_seconds=BAR_SECONDS, capacity=CAPACITY,
+                 idle_seconds=IDLE_SECONDS, workers=POLL_WORKERS):
+        self.feed = feed
+        self.poll_seconds = poll_seconds
+        self.bar_seconds = bar_seconds
+        self.capacity = capacity
+        self.idle_seconds = idle_seconds
+        self.workers = workers
+        self.polls = 0
+        self._streams = {}  # ticker -> SymbolStream
+        self._watchers = {}  # ticker -> {session: last watch time}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._pool = None
+
+    def watch(self, ticker, session=None):
+        """
+        The shared stream for 'ticker', started (and backfilled) on first watch.
+        """
+        ticker = ticker.upper()
+        with self._lock:
+            self._watchers.setdefault(ticker, {})[session] = time.monotonic()
+            stream = self._streams.get(ticker)
+            if stream is None:
+                stream = self._streams[ticker] = SymbolStream(ticker, self.bar_seconds, self.capacity)
+                new = True
+            else:
+                new = False
+            if self._thread is None:
+                self._start()
+        if new:
+            try:
+                with span("stream.backfill"):
+                    stream.backfill(self.feed.backfill(ticker, self.bar_seconds, self.capacity),
+                                    int(self.feed.clock() * 1e9))
+            except Exception as e:
+                telemetry.record_error("stream.backfill", e)
+            finally:
+                stream.ready.set()
+        return stream
+
+    def unwatch(self, ticker, session=None):
+        with self._lock:
+            self._watchers.get(ticker.upper(), {}).pop(session, None)
+
+    def watchers(self, ticker):
+        with self._lock:
+            return len(self._watchers.get(ticker.upper(), {}))
+
+    def _start(self):
+        # Caller holds self._lock
+        self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="stream-poll")
+        self._thread = threading.Thread(target=self._run, name="stream-hub", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.is_set():
+            started = time.monotonic()
+            try:
+                self.poll_once()
+            except Exception as e:
+                telemetry.record_error("stream.poll", e)
+            self._stop.wait(max(0.0, self.poll_seconds - (time.monotonic() - started)))
+
+    def _drop_idle(self):
+        now = time.monotonic()
+        with self._lock:
+            for ticker in list(self._streams):
+                sessions = self._watchers.get(ticker, {})
+                for session, seen in list(sessions.items()):
+                    if now - seen > self.idle_seconds:
+                        del sessions[session]
+                if not sessions:
+                    self._streams.pop(ticker)
+                    self._watchers.pop(ticker, None)
+            return dict(self._streams)
+
+    def poll_once(self):
+        """
+        One round: ticks for every watched symbol, then closes bars whose time is up.
+        """
+        # Streams still being backfilled are skipped: a tick first would put the
+        # forming bar ahead of the older backfilled ones
+        streams = {t: s for t, s in self._drop_idle().items() if s.ready.is_set()}
+        if not streams:
+            return
+        with span("stream.poll"):
+            def fetch(ticker):
+                try:
+                    return self.feed.ticks(ticker)
+                except Exception as e:
+                    telemetry.record_error("stream.feed", e)
+                    return _NO_TICKS
+
+            tickers = list(streams)
+            if self._pool is not None and len(tickers) > 1:
+                results = list(self._pool.map(fetch, tickers))
+            else:
+                results = [fetch(t) for t in tickers]
+            now_ns = int(self.feed.clock() * 1e9)
+            for ticker, ticks in zip(tickers, results):
+                streams[ticker].on_ticks(*ticks)
+                streams[ticker].roll(now_ns)
+            self.polls += 1
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.poll_seconds + 1)
+        if self._pool is not None:
+            self._pool.shutdown(wait=False)
+
+    def stats(self):
+        with self._lock:
+            streams = dict(self._streams)
+            watchers = {t: len(s) for t, s in self._watchers.items()}
+        return {
+            "symbols": len(streams),
+            "sessions": sum(watchers.values()),
+            "polls": self.polls,
+            "streams": {t: dict(s.stats(), watchers=watchers.get(t, 0)) for t, s in sorted(streams.items())},
+        }
+
+
+_hub = None
+_hub_lock = threading.Lock()
+
+
+def get_hub():
+    """
+    The process-wide StreamHub, fed from the current data provider.
+    """
+    global _hub
+    with _hub_lock:
+        if _hub is None:
+            from utils import market_data
+            _hub = StreamHub(make_feed(market_data.get_provider()))
+        return _hub
@@ -0,0 +1,406 @@
+import argparse
+import bisect
+import csv
+import os
+import re
+import threading
+from collections import namedtuple
+
+import numpy as np
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data")
+# Symbol universe (Symbol,Name,Exchange) and the index built from it
+SYMBOLS_CSV = os.environ.get("SYMBOLS_CSV", os.path.join(DATA_DIR, "symbols.csv"))
+SYMBOLS_INDEX = os.environ.get("SYMBOLS_INDEX", os.path.join(DATA_DIR, "symbols.npz"))
+INDEX_VERSION = 1
+
+# Names people type that aren't (part of) the listed company name
+ALIASES = {
+    "GOOGLE": "GOOG",
+    "FACEBOOK": "META",
+    "BERKSHIRE": "BRK-B",
+    "S&P 500": "^GSPC",
+    "DOW JONES": "^DJI",
+    "NASDAQ": "^IXIC",
+    "BITCOIN": "BTC-USD",
+    "ETHEREUM": "ETH-USD",
+}
+
+# Words dropped from company names before indexing ("NVIDIA Corporation" -> "NVIDIA")
+NAME_STOPWORDS = frozenset("""
+    THE INC INCORPORATED CORP CORPORATION CO COMPANY LTD LIMITED PLC LLC LP SA NV AG SE
+    HOLDINGS HOLDING GROUP CLASS COMMON STOCK SHARES ORDINARY ADS ADR
+""".split())
+
+# Key kinds, in the order they rank on an exact match
+SYMBOL, ALIAS, NAME, WORD = 0, 1, 2, 3
+# Scores for exact and prefix hits per key kind; fuzzy (trigram) hits score FUZZY * similarity
+EXACT_SCORE = (1.0, 0.98, 0.96, 0.75)
+PREFIX_SCORE = ((0.4, 0.3), (0.6, 0.35), (0.6, 0.35), (0.35, 0.3))  # base + weight * matched fraction
+FUZZY = 0.9
+MIN_SIMILARITY = 0.35
+MAX_PREFIX_SCAN = 64
+# Ticker-shaped queries this long may be read as a typo of a company name ("NVDIA");
+# shorter ones are too likely to be real tickers missing from the universe
+MIN_TYPO_LENGTH = 5
+TYPO_CANDIDATES = 4
+
+# Trigram alphabet: space, A-Z, 0-9
+_ALPHABET = " ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789"
+_CODES = {c: i for i, c in enumerate(_ALPHABET)}
+GRAM_SPACE = len(_ALPHABET) ** 3
+
+# Plain US tickers have at most 5 letters; longer ones need an exchange suffix or prefix
+_TICKER_RE = re.compile(r"^([A-Z0-9]{1,5}|[\^A-Z0-9][A-Z0-9]*[.\-=^][A-Z0-9.\-=^]*|\^[A-Z0-9]+)$")
+
+Match = namedtuple("Match", ["symbol", "name", "exchange", "score"])
+
+
+def normalize(text):
+    """
+    Upper case, '&' spelled out, everything but letters and digits turned into single spaces.
+    """
+    text = text.upper().replace("&", " AND ")
+    return " ".join(re.sub(r"[^A-Z0-9]+", " ", text).split())
+
+
+def core_name(name):
+    """
+    Normalized company name without legal suffixes and filler words.
+    """
+    words = normalize(name).split()
+    core = [w for w in words if w not in NAME_STOPWORDS and w != "AND"]
+    return " ".join(core or words)
+
+
+def trigrams(text):
+    """
+    Sorted unique trigram codes of a normalized string, padded with spaces.
+    """
+    codes = [_CODES[c] for c in f" {text} " if c in _CODES]
+    n = len(_ALPHABET)
+    return sorted({(a * n + b) * n + c for a, b, c in zip(codes, codes[1:], codes[2:])})
+
+
+def looks_like_ticker(text):
+    return bool(_TICKER_RE.match(text.strip().upper()))
+
+
+def read_symbols(path):
+    """
+    (symbol, name, exchange) rows from our CSV or from NASDAQ Trader's pipe-delimited
+    nasdaqlisted.txt / otherlisted.txt, in file order (earlier rows win ties).
+    """
+    with open(path, newline="", encoding="utf-8") as f:
+        first = f.readline()
+        f.seek(0)
+        delimiter = "|" if "|" in first else ","
+        rows = []
+        for row in csv.DictReader(f, delimiter=delimiter):
+            symbol = (row.get("Symbol") or row.get("ACT Symbol") or "").strip().upper()
+            name = (row.get("Name") or row.get("Security Name") or "").strip()
+            if not symbol or not name or symbol.startswith("FILE CREATION"):
+                continue
+            if row.get("Test Issue", "N") == "Y":
+                continue
+            exchange = (row.get("Exchange") or ("NASDAQ" if "Market Category" in row else "")).strip()
+            rows.append((symbol, name, exchange))
+    return rows
+
+
+def _blob(strings):
+    return np.frombuffer("\n".join(strings).encode("utf-8"), dtype=np.uint8)
+
+
+def _unblob(array):
+    text = array.tobytes().decode("utf-8")
+    return text.split("\n") if text else []
+
+
+class SymbolIndex:
+    """
+    In-memory symbol/company-name index:
+    - sorted keys (symbols, aliases, core names and name words) for exact and prefix
+      lookups by binary search,
+    - a trigram inverted index (CSR postings) over names and aliases for typos and
+      partial names, scored by Dice similarity in one bincount.
+    Build it from rows with build(), save it with save() and reload it with load()
+    (a few milliseconds, no parsing of the CSV).
+    """
+    def __init__(self, symbols, names, exchanges, keys, key_entry, key_kind,
+                 doc_entry, doc_grams, gram_offsets, gram_postings):
+        self.symbols = symbols
+        self.names = names
+        self.exchanges = exchanges
+        self.keys = keys
+        self.key_entry = key_entry
+        self.key_kind = key_kind
+        self.doc_entry = doc_entry
+        self.doc_grams = doc_grams
+        self.gram_offsets = gram_offsets
+        self.gram_postings = gram_postings
+        self._by_symbol = {s: i for i, s in enumerate(symbols)}
+
+    def __len__(self):
+        return len(self.symbols)
+
+    @classmethod
+    def build(cls, rows, aliases=None):
+        aliases = ALIASES if aliases is None else aliases
+        symbols, names, exchanges = [], [], []
+        seen = set()
+        for symbol, name, exchange in rows:
+            if symbol in seen:
+                continue
+            seen.add(symbol)
+            symbols.append(symbol)
+            names.append(name)
+            exchanges.append(exchange)
+        by_symbol = {s: i for i, s in enumerate(symbols)}
+
+        keys = {}  # (key, entry) -> best (lowest) kind
+        docs = []  # (entry, normalized text) for the trigram index
+
+        def add_key(key, entry, kind):
+            if key and kind < keys.get((key, entry), len(EXACT_SCORE)):
+                keys[(key, entry)] = kind
+
+        for i, (symbol, name) in enumerate(zip(symbols, names)):
+            add_key(normalize(symbol), i, SYMBOL)
+            core = core_name(name)
+            add_key(core, i, NAME)
+            for word in core.split()[1:]:
+                if len(word) > 1:
+                    add_key(word, i, WORD)
+            docs.append((i, core))
+        for alias, symbol in aliases.items():
+            if symbol in by_symbol:
+                add_key(normalize(alias), by_symbol[symbol], ALIAS)
+                docs.append((by_symbol[symbol], normalize(alias)))
+
+        ordered = sorted(keys.items(), key=lambda item: (item[0][0], item[1], item[0][1]))
+        grams = [trigrams(text) for _, text in docs]
+        counts = np.zeros(GRAM_SPACE, dtype=np.int64)
+        for doc_grams in grams:
+            counts[doc_grams] += 1
+        gram_offsets = np.zeros(GRAM_SPACE + 1, dtype=np.int32)
+        np.cumsum(counts, out=gram_offsets[1:])
+        gram_postings = np.empty(gram_offsets[-1], dtype=np.int32)
+        fill = gram_offsets[:-1].copy()
+        for doc, doc_grams in enumerate(grams):
+            gram_postings[fill[doc_grams]] = doc
+            fill[doc_grams] += 1
+
+        return cls(
+            symbols, names, exchanges,
+            keys=[key for (key, _), _ in ordered],
+            key_entry=np.array([entry for (_, entry), _ in ordered], dtype=np.int32),
+            key_kind=np.array([kind for _, kind in ordered], dtype=np.int8),
+            doc_entry=np.array([entry for entry, _ in docs], dtype=np.int32),
+            doc_grams=np.array([len(g) for g in grams], dtype=np.int16),
+            gram_offsets=gram_offsets,
+            gram_postings=gram_postings,
+        )
+
+    def save(self, path):
+        tmp = f"{path}.tmp.npz"
+        np.savez(tmp, version=np.int32(INDEX_VERSION),
+                 symbols=_blob(self.symbols), names=_blob(self.names), exchanges=_blob(self.exchanges),
+                 keys=_blob(self.keys), key_entry=self.key_entry, key_kind=self.key_kind,
+                 doc_entry=self.doc_entry, doc_grams=self.doc_grams,
+                 gram_offsets=self.gram_offsets, gram_postings=self.gram_postings)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            if int(data["version"]) != INDEX_VERSION:
+                raise ValueError(f"{path} was built by another index version")
+            return cls(
+                _unblob(data["symbols"]), _unblob(data["names"]), _unblob(data["exchanges"]),
+                keys=_unblob(data["keys"]), key_entry=data["key_entry"], key_kind=data["key_kind"],
+                doc_entry=data["doc_entry"], doc_grams=data["doc_grams"],
+                gram_offsets=data["gram_offsets"], gram_postings=data["gram_postings"],
+            )
+
+    def lookup(self, symbol):
+        """
+        Match for an exact listed symbol, or None.
+        """
+        i = self._by_symbol.get(symbol.strip().upper())
+        return None if i is None else Match(self.symbols[i], self.names[i], self.exchanges[i], 1.0)
+
+    def search(self, query, limit=8):
+        """
+        Ranked candidates for a ticker or (part of a) company name, best first.
+        Exact symbols beat exact names beat prefixes beat fuzzy (trigram) matches;
+        ties keep the universe's order.
+        """
+        raw = query.strip().upper()
+        q = normalize(query)
+        if not q:
+            return []
+        scores = {}
+
+        def offer(entry, score):
+            if score > scores.get(entry, 0.0):
+                scores[entry] = score
+
+        exact = self._by_symbol.get(raw)
+        if exact is not None:
+            offer(exact, EXACT_SCORE[SYMBOL])
+
+        # Exact and prefix hits: one binary search, then a short scan of the sorted keys
+        core = core_name(query)
+        for prefix in {q, core}:
+            lo = bisect.bisect_left(self.keys, prefix)
+            for i in range(lo, min(lo + MAX_PREFIX_SCAN, len(self.keys))):
+                key = self.keys[i]
+                if not key.startswith(prefix):
+                    break
+                kind = self.key_kind[i]
+                if len(key) == len(prefix):
+                    offer(int(self.key_entry[i]), EXACT_SCORE[kind])
+                else:
+                    base, weight = PREFIX_SCORE[kind]
+                    offer(int(self.key_entry[i]), base + weight * len(prefix) / len(key))
+
+        # Fuzzy hits: Dice similarity of trigram sets, counted for every document at once
+        grams = trigrams(core)
+        if grams:
+            starts, ends = self.gram_offsets[grams], self.gram_offsets[np.asarray(grams) + 1]
+            postings = np.concatenate([self.gram_postings[s:e] for s, e in zip(starts, ends)])
+            if len(postings):
+                shared = np.bincount(postings, minlength=len(self.doc_entry))
+                similarity = 2.0 * shared / (self.doc_grams + len(grams))
+                candidates = np.flatnonzero(similarity >= MIN_SIMILARITY)
+                # Only the best few documents can make the result list
+                top = limit * 4
+                if len(candidates) > top:
+                    candidates = candidates[np.argpartition(similarity[candidates], -top)[-top:]]
+                for doc in candidates:
+                    offer(int(self.doc_entry[doc]), FUZZY * float(similarity[doc]))
+
+        best = sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:limit]
+        return [Match(self.symbols[i], self.names[i], self.exchanges[i], round(score, 4))
+                for i, score in best]
+
+    def resolve(self, query, min_score=0.45):
+        """
+        Best symbol for a query. A ticker-shaped query is taken as a ticker unless
+        it is a listed symbol, names a company or alias exactly ("APPLE") or is a
+        one-letter typo of one ("NVDIA"); prefix and fuzzy hits never replace it,
+        since the universe can't list every real ticker. Anything else resolves to
+        the best candidate scoring at least 'min_score', else None.
+        """
+        raw = query.strip().upper()
+        if raw in self._by_symbol:
+            return raw
+        matches = self.search(query, limit=TYPO_CANDIDATES)
+        if looks_like_ticker(raw):
+            if matches and matches[0].score >= EXACT_SCORE[NAME]:
+                return matches[0].symbol
+            q = normalize(query)
+            if len(q) >= MIN_TYPO_LENGTH:
+                for match in matches:
+                    if any(_one_edit(q, name) for name in self._name_keys(match.symbol)):
+                        return match.symbol
+            return raw
+        if matches and matches[0].score >= min_score:
+            return matches[0].symbol
+        return None
+
+    def _name_keys(self, symbol):
+        i = self._by_symbol[symbol]
+        core = core_name(self.names[i])
+        aliases = [normalize(alias) for alias, target in ALIASES.items() if target == symbol]
+        return [core, core.split()[0]] + aliases
+
+
+def _one_edit(a, b):
+    """
+    True if a and b differ by one insertion, deletion, substitution or swap of neighbours.
+    """
+    if a == b or abs(len(a) - len(b)) > 1:
+        return False
+    i = 0
+    while i < min(len(a), len(b)) and a[i] == b[i]:
+        i += 1
+    if len(a) == len(b):
+        return a[i + 1:] == b[i + 1:] or (a[i + 2:] == b[i + 2:] and a[i:i + 2] == b[i:i + 2][::-1])
+    return a[i:] == b[i + 1:] if len(a) < len(b) else a[i + 1:] == b[i:]
+
+
+def build_index(sources=None, out=SYMBOLS_INDEX, aliases=None):
+    """
+    Builds the index from one or more symbol files (our CSV first, then e.g. NASDAQ
+    Trader listings) and saves it to 'out'.
+    """
+    rows = []
+    for path in sources or [SYMBOLS_CSV]:
+        rows.extend(read_symbols(path))
+    index = SymbolIndex.build(rows, aliases)
+    if out:
+        index.save(out)
+    return index
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_index():
+    """
+    The process-wide index: loaded from SYMBOLS_INDEX, or rebuilt from SYMBOLS_CSV
+    when the saved index is missing, outdated or older than the CSV.
+    """
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = _load_or_build()
+    return _index
+
+
+def _load_or_build():
+    try:
+        if os.path.getmtime(SYMBOLS_INDEX) >= os.path.getmtime(SYMBOLS_CSV):
+            return SymbolIndex.load(SYMBOLS_INDEX)
+    except (OSError, ValueError, KeyError):
+        pass
+    if not os.path.exists(SYMBOLS_CSV):
+        return SymbolIndex.build([])
+    index = SymbolIndex.build(read_symbols(SYMBOLS_CSV))
+    try:
+        index.save(SYMBOLS_INDEX)
+    except OSError:
+        pass  # read-only deployment: keep the in-memory index
+    return index
+
+
+def search(query, limit=8):
+    return get_index().search(query, limit)
+
+
+def resolve(query):
+    return get_index().resolve(query)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build or query the local symbol index.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build = sub.add_parser("build", help="Build the index from symbol files")
+    build.add_argument("sources", nargs="*", default=[SYMBOLS_CSV],
+                       help="Symbol,Name,Exchange CSVs or NASDAQ Trader listing files")
+    build.add_argument("--out", default=SYMBOLS_INDEX)
+    query = sub.add_parser("search", help="Show ranked matches for a query")
+    query.add_argument("query")
+    query.add_argument("--limit", type=int, default=8)
+    args = parser.parse_args()
+
+    if args.command == "build":
+        index = build_index(args.sources, args.out)
+        print(f"Indexed {len(index)} symbols ({len(index.keys)} keys) -> {args.out}")
+    else:
+        for match in search(args.query, args.limit):
+            print(f"{match.score:5.2f}  {match.symbol:10s} {match.name} ({match.exchange})")
@@ -0,0 +1,363 @@
+import bisect
+import contextlib
+import contextvars
+import cProfile
+import functools
+import io
+import json
+import logging
+import os
+import pstats
+import sys
+import threading
+import time
+
+log = logging.getLogger(__name__)
+
+# Upper bounds (seconds) of the latency histogram buckets, Prometheus style
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+ENABLED = os.environ.get("TELEMETRY", "1").lower() not in ("0", "false", "no")
+
+# Spans of the render (or job) currently being traced in this context, if any
+_current_trace = contextvars.ContextVar("telemetry_trace", default=None)
+_depth = contextvars.ContextVar("telemetry_depth", default=0)
+
+
+class Histogram:
+    """
+    Fixed-bucket latency histogram with count, sum and max.
+    """
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last bucket is +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+        self.max = max(self.max, seconds)
+
+    def quantile(self, q):
+        """
+        Upper bound of the bucket holding the q-th quantile (inf past the last bucket).
+        """
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "avg": self.sum / self.count if self.count else 0.0,
+            "max": self.max,
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "buckets": dict(zip([str(b) for b in self.buckets] + ["+Inf"], self.counts)),
+        }
+
+
+class Trace:
+    """
+    Spans recorded during one render: (name, depth, start offset, seconds, error).
+    """
+    def __init__(self, name):
+        self.name = name
+        self.start = time.perf_counter()
+        self.seconds = None
+        self.spans = []
+        self.token = None
+        self._lock = threading.Lock()
+
+    def add(self, name, depth, start, seconds, error=None):
+        with self._lock:
+            self.spans.append((name, depth, start - self.start, seconds, error))
+
+    def finish(self):
+        self.seconds = time.perf_counter() - self.start
+        return self
+
+    def breakdown(self):
+        """
+        Total seconds and call count per stage, slowest first.
+        """
+        totals = {}
+        with self._lock:
+            spans = list(self.spans)
+        for name, _, _, seconds, _ in spans:
+            total, calls = totals.get(name, (0.0, 0))
+            totals[name] = (total + seconds, calls + 1)
+        return sorted(((n, s, c) for n, (s, c) in totals.items()), key=lambda row: -row[1])
+
+
+class Telemetry:
+    """
+    Process-wide stage latencies and error counters (all sessions and threads).
+    """
+    def __init__(self):
+        self._histograms = {}
+        self._errors = {}  # (stage, error type) -> count
+        self._lock = threading.Lock()
+
+    def observe(self, stage, seconds):
+        with self._lock:
+            histogram = self._histograms.get(stage)
+            if histogram is None:
+                histogram = self._histograms[stage] = Histogram()
+            histogram.observe(seconds)
+
+    def error(self, stage, exc):
+        key = (stage, type(exc).__name__)
+        with self._lock:
+            self._errors[key] = self._errors.get(key, 0) + 1
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+            self._errors.clear()
+
+    def stages(self):
+        with self._lock:
+            return {stage: h.to_dict() for stage, h in sorted(self._histograms.items())}
+
+    def errors(self):
+        with self._lock:
+            return {f"{stage}:{kind}": count for (stage, kind), count in sorted(self._errors.items())}
+
+    def _raw(self):
+        with self._lock:
+            histograms = {stage: (h.buckets, list(h.counts), h.count, h.sum) for stage, h in self._histograms.items()}
+            return histograms, dict(self._errors)
+
+
+_telemetry = Telemetry()
+
+
+def get_telemetry():
+    return _telemetry
+
+
+@contextlib.contextmanager
+def span(stage):
+    """
+    Times a block as 'stage': recorded in the stage's latency histogram and, while a
+    render is being traced, in its trace. Exceptions are counted and re-raised.
+    """
+    if not ENABLED:
+        yield
+        return
+    depth = _depth.get()
+    token = _depth.set(depth + 1)
+    start = time.perf_counter()
+    error = None
+    try:
+        yield
+    except BaseException as e:
+        error = type(e).__name__
+        _telemetry.error(stage, e)
+        raise
+    finally:
+        seconds = time.perf_counter() - start
+        _depth.reset(token)
+        _telemetry.observe(stage, seconds)
+        trace = _current_trace.get()
+        if trace is not None:
+            trace.add(stage, depth, start, seconds, error)
+
+
+def traced(stage=None):
+    """
+    Decorator running the function inside span(stage) (default: module.function).
+    """
+    def decorator(fn):
+        name = stage or f"{fn.__module__.rsplit('.', 1)[-1]}.{fn.__name__}"
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def record_error(stage, exc):
+    """
+    Counts (and logs) an exception that was handled, e.g. a failed fetch that falls
+    back to an empty value, so it still shows up in the error counters.
+    """
+    _telemetry.error(stage, exc)
+    log.warning("%s failed: %s: %s", stage, type(exc).__name__, exc)
+
+
+def start_trace(name="render"):
+    """
+    Starts collecting the spans of this render (threads started through
+    FetchCoordinator inherit it). Pass the result to finish_trace().
+    """
+    trace = Trace(name)
+    trace.token = _current_trace.set(trace)
+    return trace
+
+
+def finish_trace(trace):
+    _current_trace.reset(trace.token)
+    trace.finish()
+    _telemetry.observe(trace.name, trace.seconds)
+    return trace
+
+
+@contextlib.contextmanager
+def trace_render(name="render"):
+    trace = start_trace(name)
+    try:
+        yield trace
+    finally:
+        finish_trace(trace)
+
+
+class Profile:
+    """
+    cProfile over one render (only the thread that started it). Python allows one
+    active profiler per process, so a render started while another is being
+    profiled just isn't profiled.
+    """
+    def __init__(self):
+        self.profiler = cProfile.Profile()
+        try:
+            self.profiler.enable()
+        except ValueError:
+            self.profiler = None
+
+    def stop(self, sort="cumulative", limit=40):
+        """
+        Stops profiling and returns the report text.
+        """
+        if self.profiler is None:
+            return "Not profiled: another render was being profiled at the same time."
+        self.profiler.disable()
+        out = io.StringIO()
+        stats = pstats.Stats(self.profiler, stream=out)
+        stats.strip_dirs().sort_stats(sort).print_stats(limit)
+        return out.getvalue()
+
+
+def snapshot():
+    """
+    Everything there is to know about this process's performance, as plain data:
+    stage latencies, error counters, cache hit rates, coalesced calls, loaded models
+    and live streams.
+    """
+    from utils import cache, singleflight
+
+    data = {
+        "time": time.time(),
+        "stages": _telemetry.stages(),
+        "errors": _telemetry.errors(),
+        "caches": cache.cache_stats(),
+        "singleflight": singleflight.singleflight_stats(),
+    }
+    ai_engine = sys.modules.get("utils.ai_engine")  # only once models are in use
+    if ai_engine is not None:
+        data["models"] = ai_engine.get_registry().stats()
+    streaming = sys.modules.get("utils.streaming")
+    if streaming is not None and streaming._hub is not None:
+        data["streams"] = streaming.get_hub().stats()
+    return data
+
+
+def to_json(indent=None):
+    return json.dumps(snapshot(), indent=indent, default=str)
+
+
+def log_json(path):
+    """
+    Appends one JSON snapshot line to 'path' (JSON-lines log).
+    """
+    with open(path, "a") as f:
+        f.write(to_json() + "\n")
+
+
+def prometheus_text():
+    """
+    Snapshot in the Prometheus text exposition format.
+    """
+    from utils import cache, singleflight
+
+    lines = []
+    histograms, errors = _telemetry._raw()
+    lines.append("# TYPE app_stage_seconds histogram")
+    for stage, (buckets, counts, count, total) in sorted(histograms.items()):
+        cumulative = 0
+        for bound, n in zip(buckets, counts):
+            cumulative += n
+            lines.append(f'app_stage_seconds_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+        lines.append(f'app_stage_seconds_bucket{{stage="{stage}",le="+Inf"}} {count}')
+        lines.append(f'app_stage_seconds_sum{{stage="{stage}"}} {total}')
+        lines.append(f'app_stage_seconds_count{{stage="{stage}"}} {count}')
+
+    lines.append("# TYPE app_errors_total counter")
+    for (stage, kind), count in sorted(errors.items()):
+        lines.append(f'app_errors_total{{stage="{stage}",type="{kind}"}} {count}')
+
+    for metric in ("hits", "stale_hits", "misses", "evictions", "errors"):
+        lines.append(f"# TYPE app_cache_{metric}_total counter")
+        for name, stats in sorted(cache.cache_stats().items()):
+            lines.append(f'app_cache_{metric}_total{{cache="{name}"}} {stats[metric]}')
+    lines.append("# TYPE app_cache_entries gauge")
+    for name, stats in sorted(cache.cache_stats().items()):
+        lines.append(f'app_cache_entries{{cache="{name}"}} {stats["size"]}')
+
+    for metric in ("calls", "executions", "coalesced"):
+        lines.append(f"# TYPE app_singleflight_{metric}_total counter")
+        for name, stats in sorted(singleflight.singleflight_stats().items()):
+            lines.append(f'app_singleflight_{metric}_total{{group="{name}"}} {stats[metric]}')
+    return "\n".join(lines) + "\n"
+
+
+_server = None
+_server_lock = threading.Lock()
+
+
+def start_http_server(port, host="127.0.0.1"):
+    """
+    Serves /metrics (Prometheus) and /metrics.json from a background thread.
+    Local only by default: the JSON lists watched tickers, model paths and errors,
+    so listening on other interfaces (host="0.0.0.0") has to be asked for.
+    Once per process; later calls return the running server.
+    """
+    global _server
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.startswith("/metrics.json"):
+                body, kind = to_json().encode(), "application/json"
+            elif self.path.startswith("/metrics"):
+                body, kind = prometheus_text().encode(), "text/plain; version=0.0.4"
+            else:
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", kind)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass  # scrapes would flood the app's output
+
+    with _server_lock:
+        if _server is None:
+            _server = ThreadingHTTPServer((host, port), MetricsHandler)
+            threading.Thread(target=_server.serve_forever, name="telemetry-http", daemon=True).start()
+        return _server
@@ -0,0 +1,481 @@
+import hashlib
+import json
+import logging
+import math
+import os
+import queue
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+from utils.indicators import INDICATOR_COLUMNS, compute_indicators
+from utils.model_store import data_fingerprint
+from utils.scaling import MinMaxScaling
+
+log = logging.getLogger(__name__)
+
+DEFAULT_FEATURE_DIR = os.environ.get("FEATURE_CACHE_DIR", ".feature_cache")
+PACK_VERSION = 1
+
+# Named feature sets; the first column is always the target (Close)
+FEATURE_SETS = {
+    "close": ["Close"],
+    "ohlcv": ["Close", "Open", "High", "Low", "Volume"],
+    # BB_Middle is SMA_20 again
+    "indicators": ["Close", "Volume"] + [c for c in INDICATOR_COLUMNS if c != "BB_Middle"],
+}
+
+# Defaults for the training stream
+SHUFFLE_BUFFER = 10_000  # windows (8 bytes each)
+PREFETCH = 4  # batches prepared ahead of the model
+BLOCK = 256  # consecutive windows taken from one ticker at a time
+CYCLE = 16  # tickers read in turn while filling the shuffle buffer
+
+
+def resolve_features(features):
+    """
+    Column list for a feature set name, a comma separated string or a list.
+    Close is moved (or added) to the front since it is the target.
+    """
+    if isinstance(features, str):
+        features = FEATURE_SETS.get(features) or [c.strip() for c in features.split(",") if c.strip()]
+    columns = [c for c in features if c != "Close"]
+    return ["Close"] + list(dict.fromkeys(columns))
+
+
+def feature_matrix(df, features):
+    """
+    (rows, features) float32 matrix for one ticker, plus its dates. Leading rows
+    where an indicator is still warming up are dropped; later gaps are forward filled.
+    """
+    df = df[df["Close"].notna()]
+    close = df["Close"].to_numpy(dtype=np.float64)
+    indicators = None
+    if any(c in INDICATOR_COLUMNS for c in features):
+        indicators = compute_indicators(close)
+
+    matrix = np.empty((len(df), len(features)), dtype=np.float32)
+    for j, column in enumerate(features):
+        if indicators is not None and column in indicators:
+            matrix[:, j] = indicators[column]
+        else:
+            matrix[:, j] = df[column].to_numpy(dtype=np.float64, na_value=np.nan)
+
+    finite = np.isfinite(matrix).all(axis=1)
+    start = int(np.argmax(finite)) if finite.any() else len(matrix)
+    matrix = matrix[start:]
+    if not np.isfinite(matrix).all():
+        matrix = pd.DataFrame(matrix).ffill().to_numpy(dtype=np.float32)
+    return matrix, df.index[start:]
+
+
+def _pack_key(tickers, features, years):
+    text = json.dumps([PACK_VERSION, features, years, sorted(tickers)])
+    return hashlib.sha1(text.encode()).hexdigest()[:12]
+
+
+def _load_history(store, ticker, years):
+    df = store.get(ticker, period="max")
+    if years and not df.empty:
+        df = df[df.index >= df.index[-1] - pd.DateOffset(years=years)]
+    return df
+
+
+class FeaturePack:
+    """
+    Precomputed features of many tickers in one memory-mapped float32 file:
+
+        <root>/<key>/features.bin   (rows, features) float32, tickers back to back
+        <root>/<key>/dates.npy      bar dates (datetime64[ns])
+        <root>/<key>/meta.json      tickers, offsets, lengths, data fingerprints
+
+    Nothing is loaded up front; windows are read from the page cache as batches need them.
+    """
+    def __init__(self, folder):
+        self.folder = folder
+        with open(os.path.join(folder, "meta.json")) as f:
+            self.meta = json.load(f)
+        self.features = self.meta["features"]
+        self.tickers = self.meta["tickers"]
+        self.offsets = np.array(self.meta["offsets"], dtype=np.int64)
+        self.lengths = np.array(self.meta["lengths"], dtype=np.int64)
+        self.data = np.memmap(os.path.join(folder, "features.bin"), dtype=np.float32, mode="r",
+                              shape=(self.meta["rows"], len(self.features)))
+        self.dates = np.load(os.path.join(folder, "dates.npy"), mmap_mode="r")
+
+    def __len__(self):
+        return len(self.tickers)
+
+    @property
+    def n_features(self):
+        return len(self.features)
+
+    def rows(self, i):
+        return self.data[self.offsets[i]:self.offsets[i] + self.lengths[i]]
+
+    def nbytes(self):
+        return self.data.size * self.data.itemsize + self.dates.size * self.dates.itemsize
+
+
+def build_feature_pack(tickers, features="close", years=20, root=DEFAULT_FEATURE_DIR, store=None,
+                       rebuild=False, min_rows=250):
+    """
+    Returns the FeaturePack for these tickers and features, computing it only when
+    the stored one is missing or any ticker's data changed since it was written.
+    Histories come from the on-disk price store (fetching what's missing) and are
+    processed one ticker at a time, so memory stays at one ticker's worth.
+    """
+    if store is None:
+        from utils import market_data
+        store = market_data.price_store
+    features = resolve_features(features)
+    tickers = [t.upper() for t in dict.fromkeys(tickers)]
+    folder = os.path.join(root, _pack_key(tickers, features, years))
+
+    # Cheap first pass: fingerprints only (bars are memory-mapped by the store)
+    fingerprints = {}
+    for ticker in tickers:
+        df = _load_history(store, ticker, years)
+        if len(df) >= min_rows:
+            fingerprints[ticker] = data_fingerprint(df.index.values, df["Close"].to_numpy())
+        else:
+            log.warning("%s: not enough history (%d rows), left out of training", ticker, len(df))
+    if not fingerprints:
+        raise ValueError("no ticker has enough history to train on")
+
+    if not rebuild:
+        try:
+            pack = FeaturePack(folder)
+            if pack.meta.get("fingerprints") == fingerprints:
+                return pack
+        except (OSError, ValueError, KeyError):
+            pass
+
+    os.makedirs(folder, exist_ok=True)
+    names, lengths, all_dates = [], [], []
+    tmp = os.path.join(folder, f"features.{os.getpid()}.tmp")
+    with open(tmp, "wb") as out:
+        for ticker in fingerprints:
+            matrix, dates = feature_matrix(_load_history(store, ticker, years), features)
+            if len(matrix) < min_rows:
+                continue
+            out.write(np.ascontiguousarray(matrix).tobytes())
+            names.append(ticker)
+            lengths.append(len(matrix))
+            index = dates.tz_convert("UTC").tz_localize(None) if dates.tz is not None else dates
+            all_dates.append(index.values.astype("datetime64[ns]"))
+    if not names:
+        os.remove(tmp)
+        raise ValueError("no ticker has enough history to train on")
+
+    os.replace(tmp, os.path.join(folder, "features.bin"))
+    np.save(os.path.join(folder, "dates.npy"), np.concatenate(all_dates))
+    offsets = np.concatenate([[0], np.cumsum(lengths)[:-1]])
+    meta = {
+        "version": PACK_VERSION,
+        "features": features,
+        "years": years,
+        "tickers": names,
+        "offsets": [int(o) for o in offsets],
+        "lengths": [int(n) for n in lengths],
+        "rows": int(sum(lengths)),
+        "fingerprints": fingerprints,
+        "created_at": time.time(),
+    }
+    # meta.json last: a pack without it (or with stale meta) is never used
+    with open(os.path.join(folder, "meta.tmp"), "w") as f:
+        json.dump(meta, f)
+    os.replace(os.path.join(folder, "meta.tmp"), os.path.join(folder, "meta.json"))
+    return FeaturePack(folder)
+
+
+class TrainingData:
+    """
+    Time-ordered train/validation split of every window in a FeaturePack.
+    Each ticker is cut at one row: training windows only have targets before it,
+    validation windows only after it. The cut is either a shared date ('val_start')
+    or the last 'val_fraction' of each ticker's windows. Scaling is fitted per
+    ticker on the training rows only and applied to each batch as it is gathered.
+    """
+    def __init__(self, pack, window=100, horizon=1, val_fraction=0.3, val_start=None):
+        self.pack = pack
+        self.window = window
+        self.horizon = horizon
+        self.n_features = pack.n_features
+
+        n_windows = np.maximum(pack.lengths - window - horizon + 1, 0)
+        if val_start is not None:
+            cutoff = np.datetime64(pd.Timestamp(val_start).tz_localize(None), "ns")
+            cut = np.array([np.searchsorted(pack.dates[o:o + n], cutoff)
+                            for o, n in zip(pack.offsets, pack.lengths)], dtype=np.int64)
+        else:
+            # First (1 - val_fraction) of the windows train; validation starts at the first
+            # window whose targets all come after the last training target
+            cut = (n_windows * (1 - val_fraction)).astype(np.int64) + window + horizon - 1
+        n_train = np.clip(cut - window - horizon + 1, 0, n_windows)
+        val_first = np.where(n_train > 0, np.clip(cut - window, 0, n_windows), n_windows)
+
+        # Ranges of global window starts (row offsets into pack.data)
+        self.train_ranges = np.stack([pack.offsets, pack.offsets + n_train], axis=1)
+        self.val_ranges = np.stack([pack.offsets + val_first, pack.offsets + n_windows], axis=1)
+
+        self.scale = np.ones((len(pack), self.n_features), dtype=np.float32)
+        self.offset = np.zeros((len(pack), self.n_features), dtype=np.float32)
+        self.scalers = {}
+        for i, ticker in enumerate(pack.tickers):
+            if n_train[i] == 0:
+                continue
+            rows = pack.rows(i)[:n_train[i] + window + horizon - 1]
+            scaler = MinMaxScaling.fit(rows, feature_range=(0, 1), ticker=ticker)
+            self.scalers[ticker] = scaler
+            self.scale[i], self.offset[i] = scaler.scale, scaler.offset
+
+    def scaler(self, ticker):
+        return self.scalers.get(ticker.upper())
+
+    def train(self, batch_size=32, shuffle_buffer=SHUFFLE_BUFFER, prefetch=PREFETCH, seed=0):
+        return WindowStream(self, self.train_ranges, batch_size, shuffle_buffer, prefetch, seed)
+
+    def validation(self, batch_size=32, prefetch=PREFETCH):
+        return WindowStream(self, self.val_ranges, batch_size, 0, prefetch)
+
+
+class WindowStream:
+    """
+    Batches of scaled (x, y) windows read straight from the pack. Window starts
+    are drawn from a few tickers in turn through a bounded shuffle buffer, and a
+    background thread gathers the next 'prefetch' batches while the model trains.
+    Each pass (epoch) reshuffles. Counts samples, time spent waiting for batches
+    and peak memory for report().
+    """
+    def __init__(self, data, ranges, batch_size=32, shuffle_buffer=0, prefetch=PREFETCH, seed=0):
+        self.data = data
+        self.ranges = ranges[ranges[:, 1] > ranges[:, 0]]
+        self.batch_size = batch_size
+        self.shuffle_buffer = shuffle_buffer
+        self.prefetch = prefetch
+        self.seed = seed
+        self.epochs = 0
+        self.stats = {"samples": 0, "batches": 0, "seconds": 0.0, "gather_seconds": 0.0, "wait_seconds": 0.0}
+        self._lock = threading.Lock()
+
+        pack = data.pack
+        window, horizon = data.window, data.horizon
+        self.window, self.horizon, self.n_features = window, horizon, data.n_features
+        if pack.data.shape[0] >= window + horizon:
+            # Strided views over the memmap: gathering copies only the requested windows
+            self._x_view = sliding_window_view(pack.data, window, axis=0).transpose(0, 2, 1)
+            self._y_view = sliding_window_view(pack.data[window:, 0], horizon)
+
+    @property
+    def samples(self):
+        return int((self.ranges[:, 1] - self.ranges[:, 0]).sum())
+
+    def __len__(self):
+        return math.ceil(self.samples / self.batch_size)
+
+    def __iter__(self):
+        return self.epoch()
+
+    def gather(self, starts):
+        """
+        Scaled float32 batch for these global window starts.
+        """
+        starts = np.sort(starts)  # neighbouring windows share pages
+        ticker = np.searchsorted(self.data.pack.offsets, starts, side="right") - 1
+        x = self._x_view[starts]
+        x *= self.data.scale[ticker][:, np.newaxis, :]
+        x += self.data.offset[ticker][:, np.newaxis, :]
+        y = self._y_view[starts]
+        y = y * self.data.scale[ticker, :1] + self.data.offset[ticker, :1]
+        return x, y.astype(np.float32, copy=False)
+
+    def _chunks(self, rng):
+        # CYCLE tickers at a time, BLOCK consecutive windows from each in turn
+        order = rng.permutation(len(self.ranges)) if rng is not None else np.arange(len(self.ranges))
+        for g in range(0, len(order), CYCLE):
+            positions = [list(self.ranges[i]) for i in order[g:g + CYCLE]]
+            while positions:
+                for pos in positions:
+                    stop = min(pos[0] + BLOCK, pos[1])
+                    yield np.arange(pos[0], stop, dtype=np.int64)
+                    pos[0] = stop
+                positions = [pos for pos in positions if pos[0] < pos[1]]
+
+    def _batches_of_starts(self):
+        batch = self.batch_size
+        if self.shuffle_buffer <= batch:
+            pending = np.empty(0, dtype=np.int64)
+            for chunk in self._chunks(None):
+                pending = np.concatenate([pending, chunk])
+                while len(pending) >= batch:
+                    yield pending[:batch]
+                    pending = pending[batch:]
+            if len(pending):
+                yield pending
+            return
+
+        # Like tf.data's shuffle: a batch is drawn at random from the buffer and its
+        # slots are refilled from the stream
+        rng = np.random.default_rng([self.seed, self.epochs])
+        capacity = max(self.shuffle_buffer, batch)
+        buffer = np.empty(capacity, dtype=np.int64)
+        size = 0
+        for chunk in self._chunks(rng):
+            while len(chunk):
+                take = min(capacity - size, len(chunk))
+                buffer[size:size + take] = chunk[:take]
+                size += take
+                chunk = chunk[take:]
+                if size == capacity:
+                    picks = rng.choice(size, batch, replace=False)
+                    yield buffer[picks].copy()
+                    keep = np.ones(size, dtype=bool)
+                    keep[picks] = False
+                    buffer[:size - batch] = buffer[:size][keep]
+                    size -= batch
+        rest = rng.permutation(buffer[:size])
+        for i in range(0, size, batch):
+            yield rest[i:i + batch]
+
+    def _gathered(self):
+        for starts in self._batches_of_starts():
+            start = time.perf_counter()
+            batch = self.gather(starts)
+            with self._lock:
+                self.stats["gather_seconds"] += time.perf_counter() - start
+            yield batch
+
+    def epoch(self):
+        """
+        One pass over every window, as (x, y) batches.
+        """
+        started = time.perf_counter()
+        try:
+            batches = prefetched(self._gathered(), self.prefetch)
+            while True:
+                waited = time.perf_counter()
+                try:
+                    x, y = next(batches)
+                except StopIteration:
+                    break
+                with self._lock:
+                    self.stats["wait_seconds"] += time.perf_counter() - waited
+                    self.stats["samples"] += len(x)
+                    self.stats["batches"] += 1
+                yield x, y
+        finally:
+            self.epochs += 1
+            with self._lock:
+                self.stats["seconds"] += time.perf_counter() - started
+
+    def to_tf_dataset(self):
+        """
+        tf.data pipeline for model.fit; every epoch of fit is a new, reshuffled pass.
+        """
+        import tensorflow as tf
+
+        signature = (
+            tf.TensorSpec(shape=(None, self.window, self.n_features), dtype=tf.float32),
+            tf.TensorSpec(shape=(None, self.horizon), dtype=tf.float32),
+        )
+        dataset = tf.data.Dataset.from_generator(self.epoch, output_signature=signature)
+        return dataset.apply(tf.data.experimental.assert_cardinality(len(self)))
+
+    def memory_bound(self):
+        """
+        Bytes the stream itself holds at most: the shuffle buffer plus batches in flight.
+        """
+        batch_bytes = self.batch_size * (self.window * self.n_features + self.horizon) * 4
+        return self.shuffle_buffer * 8 + (self.prefetch + 2) * batch_bytes
+
+    def report(self):
+        """
+        Throughput and memory so far. 'samples_per_sec' is what the consumer got
+        (training included), 'input_samples_per_sec' what gathering alone could deliver,
+        'wait_seconds' how long the consumer sat waiting for input.
+        """
+        with self._lock:
+            stats = dict(self.stats)
+        seconds, gather = stats["seconds"], stats["gather_seconds"]
+        return dict(
+            stats,
+            epochs=self.epochs,
+            samples_per_sec=stats["samples"] / seconds if seconds else 0.0,
+            input_samples_per_sec=stats["samples"] / gather if gather else 0.0,
+            stream_mb=self.memory_bound() / 1e6,
+            pack_mb=self.data.pack.nbytes() / 1e6,
+            peak_rss_mb=peak_rss_mb(),
+        )
+
+
+class _Failure:
+    def __init__(self, exc):
+        self.exc = exc
+
+
+def prefetched(iterator, size):
+    """
+    Runs 'iterator' on a background thread, up to 'size' items ahead of the consumer.
+    Errors are re-raised in the consumer; abandoning the generator stops the thread.
+    """
+    if size <= 0:
+        yield from iterator
+        return
+    items = queue.Queue(maxsize=size)
+    stop = threading.Event()
+    done = object()
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                items.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def worker():
+        try:
+            for item in iterator:
+                if not put(item):
+                    return
+        except BaseException as e:
+            put(_Failure(e))
+            return
+        put(done)
+
+    threading.Thread(target=worker, name="training-prefetch", daemon=True).start()
+    try:
+        while True:
+            item = items.get()
+            if item is done:
+                return
+            if isinstance(item, _Failure):
+                raise item.exc
+            yield item
+    finally:
+        stop.set()
+
+
+def peak_rss_mb():
+    """
+    Peak resident memory of this process in MB (None where the OS doesn't report it).
+    """
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak / (1024 * 1024) if os.uname().sysname == "Darwin" else peak / 1024
+
+
+def format_report(report):
+    return (f"{report['samples']:,} samples in {report['seconds']:.1f}s "
+            f"({report['samples_per_sec']:,.0f} samples/s; input alone {report['input_samples_per_sec']:,.0f}/s, "
+            f"waited {report['wait_seconds']:.1f}s) | stream {report['stream_mb']:.1f} MB, "
+            f"pack {report['pack_mb']:.1f} MB on disk, peak RSS {report['peak_rss_mb'] or 0:.0f} MB")
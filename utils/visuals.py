@@ -1,19 +1,144 @@
+import numpy as np
+import pandas as pd
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 
-def create_stock_chart(df, ticker, show_indicators=True):
+from utils.cache import TTLCache
+from utils.telemetry import traced
+
+# Above this many bars the candles are merged into coarser (weekly/monthly) bars
+MAX_CANDLES = 1500
+# Line overlays are min/max decimated to about this many points
+MAX_LINE_POINTS = 2000
+# Line traces with more points than this are drawn with WebGL
+WEBGL_THRESHOLD = 1000
+
+# Coarser bar sizes tried in order when there are too many bars to draw: (label, rule, nominal length)
+RESAMPLE_RULES = [
+    ("1h", pd.offsets.Hour(), pd.Timedelta(hours=1)),
+    ("1d", pd.offsets.Day(), pd.Timedelta(days=1)),
+    ("1wk", pd.offsets.Week(weekday=4), pd.Timedelta(days=7)),
+    ("1mo", pd.offsets.MonthEnd(), pd.Timedelta(days=30)),
+    ("3mo", pd.offsets.QuarterEnd(), pd.Timedelta(days=91)),
+]
+
+# Built figures, keyed by ticker, visible range and settings
+_figure_cache = TTLCache(ttl=300, max_entries=32, name="figures")
+
+def resample_ohlc(df, rule):
+    """
+    Merges bars into 'rule' sized bars (first open, max high, min low, last close,
+    summed volume, last value of every other column).
+    """
+    agg = {c: 'last' for c in df.columns}
+    agg.update({'Open': 'first', 'High': 'max', 'Low': 'min', 'Close': 'last', 'Volume': 'sum'})
+    agg = {c: how for c, how in agg.items() if c in df.columns}
+    return df.resample(rule).agg(agg).dropna(subset=['Close'])
+
+def downsample_ohlc(df, max_points=MAX_CANDLES):
+    """
+    Returns (df, bar label): df unchanged if it fits in max_points, otherwise merged
+    into the finest bar size from RESAMPLE_RULES that does.
+    """
+    if len(df) <= max_points or not isinstance(df.index, pd.DatetimeIndex):
+        return df, None
+    spacing = pd.Series(df.index).diff().median()
+    # Already as coarse as the coarsest rule (e.g. long monthly history): drawn as is
+    resampled, label = df, None
+    for rule_label, rule, length in RESAMPLE_RULES:
+        # Only bar sizes coarser than the data's own spacing help
+        if length <= spacing:
+            continue
+        resampled, label = resample_ohlc(df, rule), rule_label
+        if len(resampled) <= max_points:
+            break
+    return resampled, label
+
+def minmax_decimate(x, y, max_points=MAX_LINE_POINTS):
+    """
+    Keeps the min and max of each bucket so spikes survive decimation.
+    Vectorised; NaNs (e.g. indicator warm-up) are preserved as gaps.
+    """
+    y = np.asarray(y, dtype=np.float64)
+    n = len(y)
+    buckets = max_points // 2
+    if n <= max_points or buckets == 0:
+        return x, y
+    size = n // buckets
+    body = y[:buckets * size].reshape(buckets, size)
+    lo = np.argmin(np.where(np.isnan(body), np.inf, body), axis=1)
+    hi = np.argmax(np.where(np.isnan(body), -np.inf, body), axis=1)
+    offsets = np.arange(buckets) * size
+    keep = np.sort(np.concatenate([offsets + lo, offsets + hi]))
+    keep = np.unique(np.concatenate([keep, np.arange(buckets * size, n)]))
+    return x[keep], y[keep]
+
+def _line(x, y, **kwargs):
+    x, y = minmax_decimate(x, y)
+    trace = go.Scattergl if len(y) > WEBGL_THRESHOLD else go.Scatter
+    return trace(x=x, y=y, mode='lines', **kwargs)
+
+@traced("chart.stock")
+def create_stock_chart(df, ticker, show_indicators=True, start=None, end=None,
+                       max_points=MAX_CANDLES, price_label='Price (USD)', price_scale=1.0):
     """
     Creates a professional Candlestick chart with Volume and Indicators.
+    Only the [start, end] range is drawn; long ranges are merged into weekly/monthly
+    candles, overlays are decimated and switch to WebGL when dense.
+    df is in the base currency; price_scale (an FX rate) is applied to the finished
+    figure, so switching currency only rescales a cached chart.
+    Figures are cached, so treat the returned figure as read-only.
     """
     if df.empty:
         return go.Figure()
 
+    if start is not None or end is not None:
+        df = df.loc[_bound(df.index, start):_bound(df.index, end)]
+        if df.empty:
+            return go.Figure()
+
+    key = (ticker, len(df), df.index[0], df.index[-1], float(df['Close'].iloc[-1]),
+           show_indicators, max_points)
+    base = _figure_cache.get_or_load(
+        key, lambda: _build_stock_chart(df, ticker, show_indicators, max_points))
+    return _figure_cache.get_or_load(
+        key + (price_scale, price_label), lambda: _scale_prices(base, price_scale, price_label))
+
+def _bound(index, value):
+    if value is None:
+        return None
+    value = pd.Timestamp(value)
+    if index.tz is not None and value.tz is None:
+        value = value.tz_localize(index.tz)
+    return value
+
+def _scale_prices(fig, price_scale, price_label):
+    """
+    Copy of a stock chart with every price trace (row 1) multiplied by price_scale.
+    """
+    fig = go.Figure(fig)
+    for trace in fig.data:
+        if trace.yaxis not in (None, 'y'):
+            continue  # volume
+        if trace.type == 'candlestick':
+            for field in ('open', 'high', 'low', 'close'):
+                setattr(trace, field, np.asarray(getattr(trace, field), dtype=np.float64) * price_scale)
+        else:
+            trace.y = np.asarray(trace.y, dtype=np.float64) * price_scale
+    fig.update_layout(yaxis_title=price_label)
+    return fig
+
+@traced("chart.stock.build")
+def _build_stock_chart(df, ticker, show_indicators, max_points):
+    df, bar_label = downsample_ohlc(df, max_points)
+    x = df.index
+
     # Create subplots: Price on Row 1, Volume on Row 2
     fig = make_subplots(rows=2, cols=1, shared_xaxes=True, 
                         vertical_spacing=0.05, row_heights=[0.7, 0.3])
 
     # Candlestick
-    fig.add_trace(go.Candlestick(x=df.index,
+    fig.add_trace(go.Candlestick(x=x,
                                  open=df['Open'],
                                  high=df['High'],
                                  low=df['Low'],
@@ -23,22 +148,25 @@ def create_stock_chart(df, ticker, show_indicators=True):
 
     # Moving Averages
     if show_indicators:
+        x_values = x.to_numpy()
         if 'SMA_50' in df.columns:
-            fig.add_trace(go.Scatter(x=df.index, y=df['SMA_50'], line=dict(color='orange', width=1), name='SMA 50'), row=1, col=1)
+            fig.add_trace(_line(x_values, df['SMA_50'], line=dict(color='orange', width=1), name='SMA 50'), row=1, col=1)
         if 'SMA_200' in df.columns:
-            fig.add_trace(go.Scatter(x=df.index, y=df['SMA_200'], line=dict(color='blue', width=1), name='SMA 200'), row=1, col=1)
+            fig.add_trace(_line(x_values, df['SMA_200'], line=dict(color='blue', width=1), name='SMA 200'), row=1, col=1)
         if 'BB_Upper' in df.columns:
-            fig.add_trace(go.Scatter(x=df.index, y=df['BB_Upper'], line=dict(color='gray', width=1, dash='dot'), showlegend=False), row=1, col=1)
-            fig.add_trace(go.Scatter(x=df.index, y=df['BB_Lower'], line=dict(color='gray', width=1, dash='dot'), fill='tonexty', fillcolor='rgba(128,128,128,0.1)', name='Bollinger Bands'), row=1, col=1)
+            fig.add_trace(_line(x_values, df['BB_Upper'], line=dict(color='gray', width=1, dash='dot'), showlegend=False), row=1, col=1)
+            fig.add_trace(_line(x_values, df['BB_Lower'], line=dict(color='gray', width=1, dash='dot'), fill='tonexty', fillcolor='rgba(128,128,128,0.1)', name='Bollinger Bands'), row=1, col=1)
 
     # Volume
-    colors = ['green' if row['Open'] - row['Close'] >= 0 else 'red' for index, row in df.iterrows()]
-    fig.add_trace(go.Bar(x=df.index, y=df['Volume'], marker_color=colors, name='Volume'), row=2, col=1)
+    colors = np.where(df['Open'].to_numpy() - df['Close'].to_numpy() >= 0, 'green', 'red')
+    fig.add_trace(go.Bar(x=x, y=df['Volume'], marker_color=colors, name='Volume'), row=2, col=1)
 
     # Layout
+    title = f'{ticker} Professional Analysis'
+    if bar_label:
+        title += f' ({bar_label} bars)'
     fig.update_layout(
-        title=f'{ticker} Professional Analysis',
-        yaxis_title='Price (USD)',
+        title=title,
         xaxis_rangeslider_visible=False,
         height=600,
         template="plotly_dark",
@@ -47,19 +175,20 @@ def create_stock_chart(df, ticker, show_indicators=True):
     
     return fig
 
-def create_prediction_chart(history_df, pred_df, ticker):
+@traced("chart.prediction")
+def create_prediction_chart(history_df, pred_df, ticker, price_scale=1.0):
     """
-    Overlays AI predictions on recent history.
+    Overlays AI predictions on recent history (both in the base currency, scaled by price_scale).
     """
     fig = go.Figure()
     
     # Historical Data (Last 100 points for context)
     recent_history = history_df.tail(100)
-    fig.add_trace(go.Scatter(x=recent_history.index, y=recent_history['Close'], 
+    fig.add_trace(go.Scatter(x=recent_history.index, y=recent_history['Close'] * price_scale, 
                              mode='lines', name='Historical Data'))
     
     # Prediction
-    fig.add_trace(go.Scatter(x=pred_df.index, y=pred_df['Predicted Price'], 
+    fig.add_trace(go.Scatter(x=pred_df.index, y=pred_df['Predicted Price'] * price_scale, 
                              mode='lines+markers', line=dict(color='cyan', width=2), name='AI Forecast'))
     
     fig.update_layout(
@@ -68,3 +197,98 @@ def create_prediction_chart(history_df, pred_df, ticker):
         height=500
     )
     return fig
+
+@traced("chart.iv_smile")
+def create_iv_smile_chart(chain, spot, expiry, price_scale=1.0):
+    """
+    Implied volatility by strike for one expiry (calls and puts), with spot marked.
+    """
+    fig = go.Figure()
+    for kind, color in (('call', '#00ff00'), ('put', '#ff4b4b')):
+        side = chain[(chain['type'] == kind) & (chain['impliedVolatility'] > 1e-3)].sort_values('strike')
+        fig.add_trace(go.Scatter(x=side['strike'] * price_scale, y=side['impliedVolatility'] * 100,
+                                 mode='lines+markers', name=f'{kind.title()} IV', line=dict(color=color)))
+    fig.add_vline(x=spot * price_scale, line_dash='dash', line_color='white', annotation_text='Spot')
+    fig.update_layout(title=f'IV Smile ({expiry})', template="plotly_dark", height=400,
+                      xaxis_title='Strike', yaxis_title='Implied Volatility (%)')
+    return fig
+
+@traced("chart.iv_surface")
+def create_iv_surface_chart(surface, ticker, price_scale=1.0):
+    """
+    Heatmap of the out-of-the-money IV surface (strike x expiry).
+    """
+    fig = go.Figure(go.Heatmap(
+        x=[f'{e:%Y-%m-%d}' for e in surface.columns],
+        y=surface.index * price_scale,
+        z=surface.to_numpy() * 100,
+        colorscale='Viridis',
+        colorbar=dict(title='IV %'),
+    ))
+    fig.update_layout(title=f'{ticker} Implied Volatility Surface', template="plotly_dark", height=500,
+                      xaxis_title='Expiry', yaxis_title='Strike')
+    return fig
+
+# Live intraday chart: traces whose points are appended as bars arrive
+LIVE_MAX_POINTS = 390
+
+def _live_columns(rows, price_scale):
+    # Values of each live trace, in trace order (see create_live_chart)
+    price = {c: np.asarray(rows[c], dtype=np.float64) * price_scale
+             for c in ('Open', 'High', 'Low', 'Close', 'SMA_20', 'BB_Upper', 'BB_Lower')}
+    # Same colouring as create_stock_chart
+    colors = np.where(price['Open'] - price['Close'] >= 0, 'green', 'red')
+    return [
+        {'open': price['Open'], 'high': price['High'], 'low': price['Low'], 'close': price['Close']},
+        {'y': price['SMA_20']},
+        {'y': price['BB_Upper']},
+        {'y': price['BB_Lower']},
+        {'y': np.asarray(rows['Volume'], dtype=np.float64), 'marker.color': colors},
+    ]
+
+@traced("chart.live.build")
+def create_live_chart(rows, ticker, price_scale=1.0, price_label='Price (USD)'):
+    """
+    Intraday candles with SMA 20, Bollinger Bands and volume, from streamed bar rows
+    (a structured array or DataFrame with OHLCV and indicator columns, base currency).
+    Later bars are added with extend_live_chart instead of rebuilding.
+    """
+    x = pd.DatetimeIndex(rows['ts'] if isinstance(rows, np.ndarray) else rows.index)
+    cols = _live_columns(rows, price_scale)
+    fig = make_subplots(rows=2, cols=1, shared_xaxes=True, vertical_spacing=0.05, row_heights=[0.75, 0.25])
+    fig.add_trace(go.Candlestick(x=x, name=f'{ticker} Live', **cols[0]), row=1, col=1)
+    fig.add_trace(go.Scatter(x=x, y=cols[1]['y'], mode='lines', line=dict(color='orange', width=1),
+                             name='SMA 20'), row=1, col=1)
+    fig.add_trace(go.Scatter(x=x, y=cols[2]['y'], mode='lines', line=dict(color='gray', width=1, dash='dot'),
+                             showlegend=False), row=1, col=1)
+    fig.add_trace(go.Scatter(x=x, y=cols[3]['y'], mode='lines', line=dict(color='gray', width=1, dash='dot'),
+                             fill='tonexty', fillcolor='rgba(128,128,128,0.1)', name='Bollinger Bands'), row=1, col=1)
+    fig.add_trace(go.Bar(x=x, y=cols[4]['y'], marker_color=cols[4]['marker.color'], name='Volume'), row=2, col=1)
+    fig.update_layout(title=f'{ticker} Intraday (live)', xaxis_rangeslider_visible=False, height=550,
+                      template="plotly_dark", margin=dict(l=20, r=20, t=50, b=20), yaxis_title=price_label,
+                      uirevision=ticker)  # keeps the user's zoom across redraws
+    return fig
+
+@traced("chart.live.extend")
+def extend_live_chart(fig, rows, replace_last=False, price_scale=1.0, max_points=LIVE_MAX_POINTS):
+    """
+    Appends streamed bar rows to a create_live_chart figure in place, first dropping
+    its last point when that was a bar still forming (replace_last). Keeps the
+    newest max_points bars.
+    """
+    if len(rows) == 0 and not replace_last:
+        return fig
+    x_new = pd.DatetimeIndex(rows['ts']).to_numpy()
+    cols = _live_columns(rows, price_scale)
+    drop = 1 if replace_last else 0
+    with fig.batch_update():
+        for trace, values in zip(fig.data, cols):
+            kept = max(len(trace.x) - drop, 0)
+            start = max(kept + len(x_new) - max_points, 0)
+            trace.x = np.concatenate([np.asarray(trace.x)[start:kept], x_new])
+            for field, new in values.items():
+                if field == 'marker.color':
+                    trace.marker.color = np.concatenate([np.asarray(trace.marker.color)[start:kept], new])
+                else:
+                    setattr(trace, field, np.concatenate([np.asarray(getattr(trace, field), dtype=np.float64)[start:kept], new]))
+    return fig
@@ -0,0 +1,64 @@
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+
+def make_windows(series, window=100, horizon=1, target=0):
+    """
+    Builds (x, y) training windows as zero-copy views of 'series'.
+    series: (T,) or (T, features) array.
+    x: (n, window, features), the 'window' rows before each label.
+    y: (n, horizon), the next 'horizon' values of the 'target' column.
+    """
+    series = np.asarray(series)
+    if series.ndim == 1:
+        series = series[:, np.newaxis]
+    n = len(series) - window - horizon + 1
+    if n <= 0:
+        empty = np.empty((0, window, series.shape[1]), dtype=series.dtype)
+        return empty, np.empty((0, horizon), dtype=series.dtype)
+
+    # (T - window + 1, features, window) -> (n, window, features), still a view
+    x = sliding_window_view(series, window, axis=0).transpose(0, 2, 1)[:n]
+    y = sliding_window_view(series[window:, target], horizon)[:n]
+    return x, y
+
+
+class WindowDataset:
+    """
+    Windows over many tickers without materialising them.
+    All series are packed once into one contiguous array (about the raw data size);
+    a window is just a start offset into it, so the dataset costs 8 bytes per window
+    plus the raw data. Batches are gathered on demand.
+    """
+    def __init__(self, arrays, window=100, horizon=1, target=0, dtype=np.float32):
+        arrays = [np.asarray(a, dtype=dtype) for a in arrays]
+        arrays = [a[:, np.newaxis] if a.ndim == 1 else a for a in arrays]
+        self.window = window
+        self.horizon = horizon
+        self.target = target
+        self.n_features = arrays[0].shape[1] if arrays else 1
+
+        lengths = np.array([len(a) for a in arrays], dtype=np.int64)
+        offsets = np.concatenate([[0], np.cumsum(lengths)[:-1]]) if len(arrays) else lengths
+        self.data = np.concatenate(arrays) if arrays else np.empty((0, self.n_features), dtype=dtype)
+
+        # Start offsets of every window that stays inside its own ticker
+        per_ticker = np.maximum(lengths - window - horizon + 1, 0)
+        self.ticker_ids = np.repeat(np.arange(len(arrays)), per_ticker)
+        self.starts = np.concatenate(
+            [offset + np.arange(count) for offset, count in zip(offsets, per_ticker)]
+        ).astype(np.int64) if len(arrays) else np.empty(0, dtype=np.int64)
+
+        if len(self.data) >= window + horizon:
+            self._x_view = sliding_window_view(self.data, window, axis=0).transpose(0, 2, 1)
+            self._y_view = sliding_window_view(self.data[window:, target], horizon)
+
+    def __len__(self):
+        return len(self.starts)
+
+    def gather(self, indices):
+        """
+        Copies the windows at 'indices' into a fresh (len(indices), window, features) batch.
+        """
+        starts = self.starts[indices]
+        return self._x_view[starts], self._y_view[starts]